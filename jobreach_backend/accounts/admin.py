@@ -1,14 +1,14 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Resume, ContactList, GeneratedEmail
+from .models import CustomUser, Resume, ContactList, GeneratedEmail, EmailTemplate
 
 admin.site.register(CustomUser, UserAdmin)
 
 
 @admin.register(Resume)
 class ResumeAdmin(admin.ModelAdmin):
-    list_display = ['user', 'original_filename', 'uploaded_at']
-    list_filter = ['uploaded_at']
+    list_display = ['user', 'original_filename', 'parse_status', 'uploaded_at']
+    list_filter = ['parse_status', 'uploaded_at']
     search_fields = ['user__username', 'original_filename']
     readonly_fields = ['uploaded_at']
 
@@ -27,10 +27,18 @@ class ContactListAdmin(admin.ModelAdmin):
 
 @admin.register(GeneratedEmail)
 class GeneratedEmailAdmin(admin.ModelAdmin):
-    list_display = ['user', 'recipient_name', 'recipient_email', 'recipient_company', 'generated_at']
-    list_filter = ['generated_at', 'recipient_company']
+    list_display = ['user', 'recipient_name', 'recipient_email', 'recipient_company', 'status', 'generated_at']
+    list_filter = ['status', 'generated_at', 'recipient_company']
     search_fields = ['user__username', 'recipient_name', 'recipient_email', 'recipient_company']
     readonly_fields = ['generated_at']
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('user', 'resume', 'contact_list')
+
+
+@admin.register(EmailTemplate)
+class EmailTemplateAdmin(admin.ModelAdmin):
+    list_display = ['name', 'template_type', 'is_active', 'created_at']
+    list_filter = ['template_type', 'is_active']
+    search_fields = ['name', 'subject_template']
+    readonly_fields = ['created_at']
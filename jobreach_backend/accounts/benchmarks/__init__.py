@@ -0,0 +1,5 @@
+"""
+Benchmark harness for the generation and send pipelines.
+
+Run with ``python manage.py benchmark``; see accounts/management/commands/benchmark.py.
+"""
@@ -0,0 +1,131 @@
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _FakeServer:
+    """Base class for local HTTP servers that stand in for external APIs."""
+
+    handler_class = None
+
+    def __init__(self, latency_ms: float = 0):
+        self.latency = latency_ms / 1000
+        self.request_count = 0
+        self._counter = itertools.count(1)
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def next_id(self):
+        return next(self._counter)
+
+    def start(self):
+        handler = type('Handler', (self.handler_class,), {'fake': self})
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    fake = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate_latency(self):
+        self.fake.request_count += 1
+        if self.fake.latency:
+            time.sleep(self.fake.latency)
+
+
+class _CompletionHandler(_JSONHandler):
+    def do_POST(self):
+        self._read_body()
+        self._simulate_latency()
+        if not self.path.endswith('/chat/completions'):
+            self._send_json({'error': {'message': 'Not found'}}, status=404)
+            return
+
+        completion_id = self.fake.next_id()
+        content = (
+            f"SUBJECT: Benchmark outreach #{completion_id}\n"
+            "BODY: Dear Hiring Manager,\n\n"
+            "I am reaching out about engineering opportunities on your team.\n\n"
+            "Best regards,\nBenchmark"
+        )
+        self._send_json({
+            'id': f'chatcmpl-{completion_id}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': 'gpt-3.5-turbo',
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': {'prompt_tokens': 400, 'completion_tokens': 120, 'total_tokens': 520},
+        })
+
+
+class FakeCompletionServer(_FakeServer):
+    """OpenAI-compatible chat completions endpoint with configurable latency."""
+
+    handler_class = _CompletionHandler
+
+    @property
+    def base_url(self):
+        return f"{self.url}/v1"
+
+
+class _GmailHandler(_JSONHandler):
+    def do_POST(self):
+        self._read_body()
+        self._simulate_latency()
+        if not self.path.split('?')[0].endswith('/messages/send'):
+            self._send_json({'error': {'message': 'Not found'}}, status=404)
+            return
+        message_id = f'stub-{self.fake.next_id()}'
+        self._send_json({'id': message_id, 'threadId': message_id, 'labelIds': ['SENT']})
+
+    def do_GET(self):
+        self._simulate_latency()
+        self._send_json({'emailAddress': 'bench@example.com', 'messagesTotal': 0, 'threadsTotal': 0})
+
+
+class StubGmailServer(_FakeServer):
+    """Minimal Gmail API endpoint that accepts every message."""
+
+    handler_class = _GmailHandler
@@ -0,0 +1,87 @@
+import os
+import random
+
+import docx
+
+
+RESUME_LINES = [
+    "Senior Software Engineer with 6 years of experience building web platforms.",
+    "Python, Django and PostgreSQL services handling millions of requests per day.",
+    "React and TypeScript frontends with a focus on accessibility and performance.",
+    "Deployed containerized workloads on AWS using Docker and Kubernetes.",
+    "Led migrations to CI/CD pipelines and mentored junior engineers.",
+    "Built data pipelines and machine learning features with scikit-learn.",
+]
+
+
+def _pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def make_pdf(path, pages: int, lines_per_page: int = 40):
+    """Write a text-only PDF with the given number of pages."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages object, filled in once the page ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+
+    for page in range(pages):
+        lines = [RESUME_LINES[(page + i) % len(RESUME_LINES)] for i in range(lines_per_page)]
+        stream = "BT /F1 10 Tf 14 TL 50 780 Td " + " ".join(
+            f"({_pdf_escape(line)}) '" for line in lines
+        ) + " ET"
+        stream = stream.encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+
+    with open(path, 'wb') as f:
+        f.write(output)
+    return path
+
+
+def make_docx(path, paragraphs: int):
+    """Write a DOCX resume with the given number of paragraphs."""
+    document = docx.Document()
+    for i in range(paragraphs):
+        document.add_paragraph(RESUME_LINES[i % len(RESUME_LINES)])
+    document.save(path)
+    return path
+
+
+def make_contacts_csv(path, rows: int, domains: int = 300, seed: int = 42):
+    """Write a contacts CSV in the format ContactListUploadView accepts."""
+    rng = random.Random(seed)
+    positions = ['HR Manager', 'Recruiter', 'Engineering Manager', 'Talent Partner', '']
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write("name,email,company,position\n")
+        for i in range(rows):
+            domain = rng.randrange(domains)
+            f.write(f"Contact {i},contact{i}@company{domain}.com,Company {domain},{rng.choice(positions)}\n")
+    return path
+
+
+def fixture_path(directory, name):
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, name)
@@ -0,0 +1,103 @@
+import json
+import math
+import threading
+import time
+from typing import Dict, List
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class BenchmarkResult:
+    """Latency samples for one benchmark case, plus how many items each sample processed."""
+
+    def __init__(self, name: str, items_per_sample: int = 1, unit: str = 'items'):
+        self.name = name
+        self.items_per_sample = items_per_sample
+        self.unit = unit
+        self.samples = []
+
+    def measure(self, func, *args, **kwargs):
+        """Time a single call and record it as a sample."""
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.samples.append(time.perf_counter() - start)
+        return result
+
+    def summary(self) -> Dict:
+        total_time = sum(self.samples)
+        total_items = self.items_per_sample * len(self.samples)
+        return {
+            'samples': len(self.samples),
+            'items_per_sample': self.items_per_sample,
+            'unit': self.unit,
+            'throughput': total_items / total_time if total_time else 0.0,
+            'p50_ms': percentile(self.samples, 50) * 1000,
+            'p95_ms': percentile(self.samples, 95) * 1000,
+            'p99_ms': percentile(self.samples, 99) * 1000,
+        }
+
+
+class ConcurrentBenchmarkResult(BenchmarkResult):
+    """
+    Samples recorded by several client threads at once. Throughput is items
+    over the wall-clock time of the whole run, not the sum of the samples.
+    """
+
+    def __init__(self, name: str, items_per_sample: int = 1, unit: str = 'items'):
+        super().__init__(name, items_per_sample, unit)
+        self.wall_time = 0.0
+        self._lock = threading.Lock()
+
+    def measure(self, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        with self._lock:
+            self.samples.append(time.perf_counter() - start)
+        return result
+
+    def summary(self) -> Dict:
+        summary = super().summary()
+        total_items = self.items_per_sample * len(self.samples)
+        summary['throughput'] = total_items / self.wall_time if self.wall_time else 0.0
+        return summary
+
+
+def load_baseline(path) -> Dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, summaries: Dict):
+    with open(path, 'w') as f:
+        json.dump(summaries, f, indent=2, sort_keys=True)
+
+
+def compare(summary: Dict, baseline: Dict, tolerance: float) -> Dict:
+    """
+    Compare a summary against its baseline entry.
+    A case regresses when p50 latency grows, or throughput drops, by more than `tolerance`.
+    """
+    if not baseline:
+        return {'status': 'new'}
+
+    p50_change = (summary['p50_ms'] - baseline['p50_ms']) / baseline['p50_ms'] if baseline['p50_ms'] else 0.0
+    throughput_change = (
+        (summary['throughput'] - baseline['throughput']) / baseline['throughput']
+        if baseline['throughput'] else 0.0
+    )
+    regressed = p50_change > tolerance or throughput_change < -tolerance
+    return {
+        'status': 'regressed' if regressed else 'ok',
+        'p50_change': p50_change,
+        'throughput_change': throughput_change,
+    }
@@ -0,0 +1,576 @@
+import base64
+import os
+import threading
+import time
+from contextlib import contextmanager
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.db import close_old_connections, connection, connections
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from ..document_worker import parse_document
+from ..email_generation import GENERATION_MODE_AI, CSVParser, DocumentParser, EmailGenerationService
+from ..email_models import UserProfile
+from ..email_verification import EmailVerifier, StaticResolver
+from ..fast_serializers import FastJSONRenderer
+from ..generation_runs import GenerationWorker, start_run
+from ..gmail_service import GmailService
+from ..mime import EncodedAttachment, render_raw
+from ..models import ContactList, GeneratedEmail, GenerationRun, Resume
+from ..serializers import GeneratedEmailSerializer, generated_email_rows
+from ..skills import extract_skill_profile
+from ..views import ContactListUploadView
+from .fakes import FakeCompletionServer, StubGmailServer
+from .fixtures import fixture_path, make_contacts_csv, make_docx, make_pdf
+from .stats import BenchmarkResult, ConcurrentBenchmarkResult
+
+
+class BenchmarkContext:
+    """Options and shared fixtures handed to every suite."""
+
+    def __init__(self, user, workdir, iterations=5, csv_rows=(1000, 10000, 100000),
+                 contacts=50, latency_ms=50, send_batch=50, clients=(1, 4, 8), log=print):
+        self.user = user
+        self.workdir = workdir
+        self.iterations = iterations
+        self.csv_rows = csv_rows
+        self.contacts = contacts
+        self.latency_ms = latency_ms
+        self.send_batch = send_batch
+        self.clients = clients
+        self.log = log
+        self._resume = None
+        self._contact_list = None
+
+    def path(self, name):
+        return fixture_path(self.workdir, name)
+
+    def client(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client
+
+    def resume(self):
+        """A parsed Resume record backed by a generated PDF."""
+        if self._resume is None:
+            pdf_path = make_pdf(self.path('bench_resume.pdf'), pages=2)
+            text = DocumentParser.extract_resume_text(pdf_path)
+            with open(pdf_path, 'rb') as f:
+                self._resume = Resume.objects.create(
+                    user=self.user,
+                    file=File(f, name='bench_resume.pdf'),
+                    original_filename='bench_resume.pdf',
+                    parse_status=Resume.PARSE_READY,
+                    extracted_text=text,
+                    skills=extract_skill_profile(text),
+                )
+        return self._resume
+
+    def contact_list(self):
+        """A validated ContactList record with `contacts` rows."""
+        if self._contact_list is None:
+            csv_path = make_contacts_csv(self.path('bench_contacts.csv'), self.contacts)
+            with open(csv_path, 'rb') as f:
+                self._contact_list = ContactList.objects.create(
+                    user=self.user,
+                    file=File(f, name='bench_contacts.csv'),
+                    original_filename='bench_contacts.csv',
+                    is_validated=True,
+                )
+        return self._contact_list
+
+
+def bench_document_parser(ctx):
+    """DocumentParser on PDF and DOCX resumes of increasing size, inline and sandboxed."""
+    results = []
+
+    for pages in (1, 10, 50):
+        path = make_pdf(ctx.path(f'resume_{pages}p.pdf'), pages=pages)
+
+        inline = BenchmarkResult(f'document_parser.pdf.{pages}_pages', unit='documents')
+        sandboxed = BenchmarkResult(f'document_parser.pdf.{pages}_pages.sandboxed', unit='documents')
+        parse_document(path)  # Warm up the worker pool
+        for _ in range(ctx.iterations):
+            inline.measure(DocumentParser.extract_resume_text, path)
+            sandboxed.measure(parse_document, path)
+        results.extend([inline, sandboxed])
+
+    for paragraphs in (50, 500, 5000):
+        path = make_docx(ctx.path(f'resume_{paragraphs}p.docx'), paragraphs=paragraphs)
+        result = BenchmarkResult(f'document_parser.docx.{paragraphs}_paragraphs', unit='documents')
+        for _ in range(ctx.iterations):
+            result.measure(DocumentParser.extract_resume_text, path)
+        results.append(result)
+
+    return results
+
+
+def bench_csv(ctx):
+    """CSVParser.parse_csv_contacts and validate_csv_format across contact list sizes."""
+    results = []
+    view = ContactListUploadView()
+
+    for rows in ctx.csv_rows:
+        path = make_contacts_csv(ctx.path(f'contacts_{rows}.csv'), rows)
+
+        parse = BenchmarkResult(f'csv_parser.{rows}_rows', items_per_sample=rows, unit='rows')
+        validate = BenchmarkResult(f'validate_csv_format.{rows}_rows', items_per_sample=rows, unit='rows')
+        for _ in range(ctx.iterations):
+            parse.measure(CSVParser.parse_csv_contacts, path)
+            with open(path, 'rb') as f:
+                validate.measure(view.validate_csv_format, f)
+        results.extend([parse, validate])
+
+    return results
+
+
+def bench_generation_service(ctx):
+    """EmailGenerationService end to end against a local fake completion server."""
+    resume = ctx.resume()
+    contact_list = ctx.contact_list()
+    result = BenchmarkResult(
+        f'generation_service.{ctx.contacts}_contacts.{ctx.latency_ms:g}ms_latency',
+        items_per_sample=ctx.contacts, unit='emails'
+    )
+
+    with FakeCompletionServer(latency_ms=ctx.latency_ms) as server:
+        with override_settings(OPENAI_API_KEY='sk-benchmark', OPENAI_BASE_URL=server.base_url, DEBUG=False):
+            for _ in range(ctx.iterations):
+                service = EmailGenerationService(sender=ctx.user)
+                generated = result.measure(
+                    service.generate_emails_for_contact_list,
+                    resume.file.path, contact_list.file.path,
+                    resume_text=resume.extracted_text, skill_profile=resume.skills
+                )
+                if not all(item['success'] for item in generated):
+                    ctx.log("  warning: some completions failed")
+        ctx.log(f"  fake completion server handled {server.request_count} requests")
+
+    return [result]
+
+
+def bench_generation_view(ctx):
+    """EmailGenerationView in template mode, isolating request handling and DB persistence."""
+    resume = ctx.resume()
+    contact_list = ctx.contact_list()
+    client = ctx.client()
+    payload = {
+        'resume_id': resume.id,
+        'contact_list_id': contact_list.id,
+        'generation_mode': 'template',
+    }
+    result = BenchmarkResult(
+        f'generation_view.template.{ctx.contacts}_contacts', items_per_sample=ctx.contacts, unit='emails'
+    )
+
+    for _ in range(ctx.iterations):
+        GeneratedEmail.objects.filter(user=ctx.user).delete()
+        response = result.measure(client.post, '/api/accounts/generate-emails/', payload, format='json')
+        if response.status_code != 201:
+            raise RuntimeError(f"generate-emails returned {response.status_code}: {response.content[:200]}")
+
+    return [result]
+
+
+def bench_email_verification(ctx):
+    """EmailVerifier over contact lists sharing 300 domains, against a stub resolver with simulated latency."""
+    results = []
+
+    for rows in ctx.csv_rows:
+        addresses = [f'contact{i}@company{i % 300}.com' for i in range(rows)]
+        result = BenchmarkResult(f'email_verification.{rows}_addresses', items_per_sample=rows, unit='addresses')
+        for _ in range(ctx.iterations):
+            resolver = StaticResolver(latency_ms=ctx.latency_ms)
+            # cache_ttl=0 disables the result cache so every sample pays for its lookups
+            result.measure(EmailVerifier(resolver=resolver, cache_ttl=0).verify_many, addresses)
+        ctx.log(f"  {rows} addresses: {resolver.lookup_count} domain lookups per run")
+        results.append(result)
+
+    return results
+
+
+def bench_serialization(ctx):
+    """Rendering the generated-email list as JSON: GeneratedEmailSerializer vs the row fast path."""
+    results = []
+    resume = ctx.resume()
+    contact_list = ctx.contact_list()
+    statuses = [status for status, _ in GeneratedEmail.STATUS_CHOICES]
+
+    for rows in (100, 1000, 10000):
+        GeneratedEmail.objects.filter(user=ctx.user).delete()
+        GeneratedEmail.objects.bulk_create([
+            GeneratedEmail(
+                user=ctx.user,
+                resume=resume,
+                contact_list=contact_list,
+                recipient_name=f'Contact {i}',
+                recipient_email=f'serialize{i}@company{i % 30}.com',
+                recipient_domain=f'company{i % 30}.com',
+                recipient_company=f'Company {i % 30}',
+                recipient_position='Engineer',
+                email_subject='Benchmark subject',
+                email_body='Benchmark body\n' * 20,
+                status=statuses[i % len(statuses)],
+            )
+            for i in range(rows)
+        ], batch_size=1000)
+        emails = GeneratedEmail.objects.filter(user=ctx.user).order_by('-generated_at')
+
+        def with_serializer():
+            return JSONRenderer().render(GeneratedEmailSerializer(emails, many=True).data)
+
+        def with_fast_path():
+            return FastJSONRenderer().render(generated_email_rows.serialize(emails))
+
+        if GeneratedEmailSerializer(emails, many=True).data != generated_email_rows.serialize(emails):
+            raise RuntimeError("Fast serialization path output differs from GeneratedEmailSerializer")
+
+        cases = [('serializer', with_serializer), ('fast_path', with_fast_path)]
+        per_row = {}
+        for label, func in cases:
+            result = BenchmarkResult(f'serialization.{label}.{rows}_rows', items_per_sample=rows, unit='rows')
+            for _ in range(ctx.iterations):
+                result.measure(func)
+            per_row[label] = sum(result.samples) / len(result.samples) / rows * 1e6
+            results.append(result)
+        ctx.log(f"  {rows} rows: {per_row['serializer']:.1f}us/row with the serializer, "
+                f"{per_row['fast_path']:.1f}us/row on the fast path")
+
+    GeneratedEmail.objects.filter(user=ctx.user).delete()
+    return results
+
+
+def bench_resume_attachment(ctx):
+    """Attaching a ~2MB resume PDF to a send batch: read and encoded per message vs one shared EncodedAttachment."""
+    path = make_pdf(ctx.path('resume_attachment.pdf'), pages=700)
+    recipients = [f'contact{i}@company{i % 30}.com' for i in range(ctx.send_batch)]
+    body = 'Benchmark body\n' * 20
+
+    def per_message():
+        for recipient in recipients:
+            with open(path, 'rb') as f:
+                attachment = MIMEApplication(f.read(), 'pdf', Name='resume.pdf')
+            message = MIMEMultipart()
+            message['to'] = recipient
+            message['subject'] = 'Benchmark subject'
+            message.attach(MIMEText(body, 'plain'))
+            message.attach(attachment)
+            base64.urlsafe_b64encode(message.as_bytes())
+
+    # Messages are pre-rendered at authorization time, so only the attaching is measured
+    raws = [render_raw(recipient, 'Benchmark subject', body) for recipient in recipients]
+
+    def shared():
+        attachment = EncodedAttachment.from_file(path, 'resume.pdf', 'application/pdf')
+        for raw in raws:
+            attachment.attach_to(raw)
+
+    results = []
+    for label, func in [('per_message', per_message), ('shared', shared)]:
+        result = BenchmarkResult(f'resume_attachment.{label}.{ctx.send_batch}_emails',
+                                 items_per_sample=ctx.send_batch, unit='emails')
+        for _ in range(ctx.iterations):
+            result.measure(func)
+        results.append(result)
+    ctx.log(f"  attachment size: {os.path.getsize(path) / 2 ** 20:.1f} MB")
+    return results
+
+
+def _create_sendable_emails(ctx, iteration, user=None):
+    resume = ctx.resume()
+    contact_list = ctx.contact_list()
+    emails = GeneratedEmail.objects.bulk_create([
+        GeneratedEmail(
+            user=user or ctx.user,
+            resume=resume,
+            contact_list=contact_list,
+            recipient_name=f'Contact {i}',
+            recipient_email=f'send{iteration}-{i}@company{i % 30}.com',
+            recipient_domain=f'company{i % 30}.com',
+            recipient_company=f'Company {i % 30}',
+            email_subject='Benchmark subject',
+            email_body='Benchmark body\n' * 20,
+            status=GeneratedEmail.STATUS_VERIFIED,
+        )
+        for i in range(ctx.send_batch)
+    ])
+    return [email.id for email in emails]
+
+
+def _authorize_gmail(user):
+    """Give `user` stored Gmail credentials and an unlimited send quota. Call with the stub Gmail settings active."""
+    from google.oauth2.credentials import Credentials
+
+    UserProfile.objects.update_or_create(user=user, defaults={'daily_email_limit': 10 ** 9})
+    GmailService()._store_user_credentials(user.id, Credentials(
+        token='benchmark-token',
+        refresh_token='benchmark-refresh',
+        token_uri='https://oauth2.googleapis.com/token',
+        client_id='benchmark',
+        client_secret='benchmark',
+        scopes=GmailService.SCOPES,
+    ))
+
+
+def bench_send_view(ctx):
+    """EmailSendView against a local stub of the Gmail API."""
+    client = ctx.client()
+    result = BenchmarkResult(
+        f'send_view.{ctx.send_batch}_emails.{ctx.latency_ms:g}ms_latency',
+        items_per_sample=ctx.send_batch, unit='emails'
+    )
+
+    with StubGmailServer(latency_ms=ctx.latency_ms) as server:
+        with override_settings(GMAIL_API_ENDPOINT=server.url + '/',
+                               GOOGLE_CLIENT_ID='benchmark', GOOGLE_CLIENT_SECRET='benchmark'):
+            _authorize_gmail(ctx.user)
+
+            for iteration in range(ctx.iterations):
+                email_ids = _create_sendable_emails(ctx, iteration)
+                response = result.measure(
+                    client.post, '/api/accounts/send-emails/', {'email_ids': email_ids}, format='json'
+                )
+                data = response.json()
+                if response.status_code != 200 or data.get('sent_count') != len(email_ids):
+                    raise RuntimeError(f"send-emails returned {response.status_code}: {data}")
+        ctx.log(f"  stub Gmail server handled {server.request_count} requests")
+
+    return [result]
+
+
+# Database settings the concurrency suite compares, per backend vendor. OPTIONS are merged
+# into the configured ones; the other keys replace the configured values.
+DATABASE_CONFIGS = {
+    'sqlite': {
+        # Django's defaults: rollback journal, deferred transactions, 5 second lock timeout
+        'rollback_journal': {'OPTIONS': {'timeout': 5, 'transaction_mode': None,
+                                         'init_command': 'PRAGMA journal_mode=DELETE'}},
+        'wal': {'OPTIONS': {'timeout': 20, 'transaction_mode': 'IMMEDIATE',
+                            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL'}},
+    },
+    'postgresql': {
+        'per_request': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+        'persistent': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True},
+        'pool': {'CONN_MAX_AGE': 0, 'OPTIONS': {'pool': {'min_size': 2, 'max_size': 16}}},
+    },
+}
+
+
+def _pool_available():
+    from importlib.util import find_spec
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+    return is_psycopg3 and find_spec('psycopg_pool') is not None
+
+
+@contextmanager
+def _database_config(overrides):
+    """Reconnect with `overrides` applied to the default database's settings, restoring them afterwards."""
+    settings_dict = connection.settings_dict
+    saved = {key: settings_dict.get(key) for key in overrides}
+    connections.close_all()
+    for key, value in overrides.items():
+        settings_dict[key] = {**(saved[key] or {}), **value} if key == 'OPTIONS' else value
+    try:
+        connection.ensure_connection()  # Per-connection setup (journal mode) runs before any client connects
+        yield
+    finally:
+        connections.close_all()
+        if hasattr(connection, 'close_pool'):
+            connection.close_pool()
+        settings_dict.update(saved)
+
+
+def _run_clients(result, clients, requests_per_client, request):
+    """
+    Call request(client, n) for n in range(requests_per_client) from `clients`
+    threads at once, and return how many calls failed. Connections are
+    released around each call as Django's request handler does, so
+    CONN_MAX_AGE and pooling behave as they would in a server.
+    """
+    barrier = threading.Barrier(clients)
+    failures = []
+
+    def run(client):
+        try:
+            barrier.wait()
+            for n in range(requests_per_client):
+                close_old_connections()
+                try:
+                    result.measure(request, client, n)
+                except Exception as e:
+                    failures.append(e)
+                finally:
+                    close_old_connections()
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=run, args=(client,)) for client in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result.wall_time = time.perf_counter() - start
+    return failures
+
+
+def bench_concurrency(ctx):
+    """
+    Generation (template mode) and send endpoints under N parallel clients,
+    one user each, for each database configuration of the current backend.
+    """
+    vendor = connection.vendor
+    configs = DATABASE_CONFIGS.get(vendor)
+    if not configs:
+        ctx.log(f"  no configurations to compare for {vendor}")
+        return []
+    if vendor == 'sqlite' and connection.is_in_memory_db():
+        ctx.log("  skipped: needs a file-based SQLite database")
+        return []
+
+    resume = ctx.resume()
+    contact_list = ctx.contact_list()
+    users, apis, payloads = [], [], []
+    for i in range(max(ctx.clients)):
+        user = get_user_model().objects.create_user(username=f'benchmark-client-{i}', password='benchmark-password',
+                                                    full_name=f'Benchmark Client {i}')
+        client_resume = Resume.objects.create(
+            user=user, file=resume.file.name, original_filename=resume.original_filename,
+            parse_status=Resume.PARSE_READY, extracted_text=resume.extracted_text, skills=resume.skills,
+        )
+        client_list = ContactList.objects.create(
+            user=user, file=contact_list.file.name, original_filename=contact_list.original_filename,
+            is_validated=True,
+        )
+        api = APIClient()
+        api.force_authenticate(user)
+        users.append(user)
+        apis.append(api)
+        payloads.append({'resume_id': client_resume.id, 'contact_list_id': client_list.id,
+                         'generation_mode': 'template'})
+
+    def generate(client, n):
+        response = apis[client].post('/api/accounts/generate-emails/', payloads[client], format='json')
+        if response.status_code != 201:
+            raise RuntimeError(f"generate-emails returned {response.status_code}: {response.content[:200]}")
+
+    results = []
+    with StubGmailServer(latency_ms=ctx.latency_ms) as server:
+        with override_settings(GMAIL_API_ENDPOINT=server.url + '/',
+                               GOOGLE_CLIENT_ID='benchmark', GOOGLE_CLIENT_SECRET='benchmark'):
+            for user in users:
+                _authorize_gmail(user)
+
+            for name, overrides in configs.items():
+                if name == 'pool' and not _pool_available():
+                    ctx.log("  pool: skipped (needs psycopg 3 with psycopg[pool])")
+                    continue
+
+                with _database_config(overrides):
+                    for clients in ctx.clients:
+                        generation = ConcurrentBenchmarkResult(
+                            f'concurrency.{vendor}.{name}.generation.{clients}_clients',
+                            items_per_sample=ctx.contacts, unit='emails'
+                        )
+                        failed = _run_clients(generation, clients, ctx.iterations, generate)
+
+                        # Emails for every send request, created up front so only sending is timed
+                        batches = [[_create_sendable_emails(ctx, f'{name}-{clients}-{client}-{n}', users[client])
+                                    for n in range(ctx.iterations)] for client in range(clients)]
+
+                        def send(client, n):
+                            email_ids = batches[client][n]
+                            response = apis[client].post('/api/accounts/send-emails/', {'email_ids': email_ids},
+                                                         format='json')
+                            if response.status_code != 200 or response.json().get('sent_count') != len(email_ids):
+                                raise RuntimeError(f"send-emails returned {response.status_code}: "
+                                                   f"{response.content[:200]}")
+
+                        sending = ConcurrentBenchmarkResult(
+                            f'concurrency.{vendor}.{name}.send.{clients}_clients',
+                            items_per_sample=ctx.send_batch, unit='emails'
+                        )
+                        failed += _run_clients(sending, clients, ctx.iterations, send)
+
+                        if failed:
+                            ctx.log(f"  {name}, {clients} clients: {len(failed)} requests failed "
+                                    f"(first: {failed[0]})")
+                        results.extend([generation, sending])
+                GeneratedEmail.objects.filter(user__in=users).delete()
+        ctx.log(f"  stub Gmail server handled {server.request_count} requests")
+
+    return results
+
+
+def _drain_run(workers, batch_size):
+    """Run `workers` GenerationWorkers in threads until none of them finds anything left to do."""
+    def work():
+        worker = GenerationWorker(batch_size=batch_size)
+        try:
+            while worker.run_once():
+                pass
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=work) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def bench_generation_workers(ctx):
+    """
+    One AI generation run drained by 1..N generation workers against the fake
+    completion server. Throughput should grow with the workers until the
+    completion server or the database is the bottleneck.
+    """
+    if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        ctx.log("  skipped: needs a file-based SQLite database")
+        return []
+
+    resume = ctx.resume()
+    contact_list = ctx.contact_list()
+    results = []
+    with FakeCompletionServer(latency_ms=ctx.latency_ms) as server:
+        with override_settings(OPENAI_API_KEY='sk-benchmark', OPENAI_BASE_URL=server.base_url, DEBUG=False):
+            for workers in ctx.clients:
+                result = BenchmarkResult(
+                    f'generation_workers.{workers}_workers.{ctx.contacts}_contacts.{ctx.latency_ms:g}ms_latency',
+                    items_per_sample=ctx.contacts, unit='emails'
+                )
+                # Small enough batches that every worker gets a share of the run
+                batch_size = max(ctx.contacts // (workers * 4), 1)
+                for _ in range(ctx.iterations):
+                    run = start_run(ctx.user, resume, contact_list, GENERATION_MODE_AI)
+                    result.measure(_drain_run, workers, batch_size)
+                    run.refresh_from_db()
+                    if run.status != GenerationRun.STATUS_COMPLETE:
+                        ctx.log(f"  warning: run finished as {run.status}")
+                    GeneratedEmail.objects.filter(user=ctx.user).delete()
+                results.append(result)
+        ctx.log(f"  fake completion server handled {server.request_count} requests")
+
+    return results
+
+
+# Suite name -> function, in the order they run by default
+SUITES = {
+    'parse': bench_document_parser,
+    'csv': bench_csv,
+    'generation': bench_generation_service,
+    'generation_view': bench_generation_view,
+    'verification': bench_email_verification,
+    'serialization': bench_serialization,
+    'send': bench_send_view,
+    'attachment': bench_resume_attachment,
+    'concurrency': bench_concurrency,
+    'generation_workers': bench_generation_workers,
+}
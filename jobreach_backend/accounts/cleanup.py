@@ -0,0 +1,160 @@
+import logging
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .storage import content_addressed_storage, upload_storage
+from .tasks import enqueue
+
+logger = logging.getLogger(__name__)
+
+# Directories under MEDIA_ROOT holding uploaded files; anything in them that no row refers to is an orphan
+MEDIA_DIRS = ('resumes', 'csv_files', 'hr_contacts', content_addressed_storage.BLOB_DIR)
+
+
+def bulk_delete(queryset, batch_size=None):
+    """
+    Delete every row of `queryset` in batches of up to BULK_DELETE_BATCH_SIZE
+    rows, each committed on its own, so a large set doesn't hold the database
+    write lock for the whole delete. For models without delete signals or
+    cascades (GeneratedEmail, GenerationTask) Django deletes each batch with a
+    single DELETE, without loading the rows.
+    """
+    batch_size = batch_size or getattr(settings, 'BULK_DELETE_BATCH_SIZE', 5000)
+    model, using = queryset.model, queryset.db
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic(using=using):
+            deleted += model._base_manager.using(using).filter(pk__in=ids).delete()[0]
+
+
+def release_files(names):
+    """Background task: drop stored upload files (blobs only go once their last reference does)."""
+    storage = upload_storage()
+    for name in names:
+        try:
+            storage.delete(name)
+        except OSError as e:
+            logger.warning(f"Could not delete {name}: {e}")
+
+
+def delete_upload(instance):
+    """
+    Delete a Resume or ContactList and every email generated from it. The
+    emails and generation tasks go in raw batches first, and the file is
+    released in the background after the row is gone.
+    """
+    from .models import GeneratedEmail, GenerationTask, Resume
+
+    field = 'resume' if isinstance(instance, Resume) else 'contact_list'
+    bulk_delete(GeneratedEmail.objects.filter(**{field: instance}))
+    bulk_delete(GenerationTask.objects.filter(**{f'run__{field}': instance}))
+
+    name = instance.file.name
+    with transaction.atomic():
+        instance.delete()  # Also removes any emails generated since the batches ran
+        if name:
+            enqueue(release_files, [name])
+
+
+def expire_upload_sessions(dry_run=False):
+    """Remove chunked uploads idle for CHUNKED_UPLOAD_EXPIRY_HOURS, with their partial files."""
+    from .models import UploadSession
+    from .uploads import discard, temp_path
+
+    cutoff = timezone.now() - timedelta(hours=getattr(settings, 'CHUNKED_UPLOAD_EXPIRY_HOURS', 24))
+    expired = list(UploadSession.objects.filter(updated_at__lt=cutoff))
+    if not dry_run:
+        for session in expired:
+            discard(temp_path(session))
+        UploadSession.objects.filter(id__in=[session.id for session in expired]).delete()
+    return len(expired)
+
+
+def purge_send_requests(dry_run=False):
+    """Remove stored send results older than SEND_IDEMPOTENCY_TTL_HOURS (keys that can no longer be replayed)."""
+    from .models import SendRequest
+
+    cutoff = timezone.now() - timedelta(hours=getattr(settings, 'SEND_IDEMPOTENCY_TTL_HOURS', 24))
+    expired = SendRequest.objects.filter(created_at__lt=cutoff)
+    if dry_run:
+        return expired.count()
+    return bulk_delete(expired)
+
+
+def _referenced_names():
+    from .email_models import UserProfile
+    from .models import ContactList, FileBlob, Resume
+
+    names = set()
+    for model, field in ((Resume, 'file'), (ContactList, 'file'),
+                         (UserProfile, 'resume_file'), (UserProfile, 'hr_contacts_file')):
+        names.update(model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                     .values_list(field, flat=True).iterator())
+    names.update(FileBlob.objects.values_list('name', flat=True).iterator())
+    return names
+
+
+def release_unreferenced_blobs(min_age, dry_run=False):
+    """
+    Delete blobs that no resume or contact list uses any more but whose
+    reference was never released (an upload that failed after the file was
+    stored, or a row deleted outside the API). Only blobs older than
+    `min_age` are considered, so uploads still being saved are left alone.
+    """
+    from .models import ContactList, FileBlob, Resume
+
+    used = set(Resume.objects.filter(file__startswith=f'{content_addressed_storage.BLOB_DIR}/')
+               .values_list('file', flat=True).iterator())
+    used.update(ContactList.objects.filter(file__startswith=f'{content_addressed_storage.BLOB_DIR}/')
+                .values_list('file', flat=True).iterator())
+
+    stale = [name for name in FileBlob.objects.filter(created_at__lt=timezone.now() - min_age)
+             .values_list('name', flat=True).iterator() if name not in used]
+    if not dry_run:
+        for name in stale:
+            content_addressed_storage.purge(name)
+    return len(stale)
+
+
+def sweep_orphan_files(min_age, dry_run=False):
+    """
+    Delete files in the upload directories that no row refers to, such as
+    files whose background release never ran, or partial chunked uploads with
+    no session. Files younger than `min_age` may belong to an upload in
+    progress and are kept.
+    """
+    from .models import UploadSession
+    from .uploads import upload_dir
+
+    media_root = os.path.abspath(settings.MEDIA_ROOT)
+    uploads = os.path.abspath(upload_dir())
+    referenced = {os.path.join(media_root, name) for name in _referenced_names()}
+    referenced.update(os.path.join(uploads, f'{session_id}.part')
+                      for session_id in UploadSession.objects.values_list('id', flat=True).iterator())
+
+    cutoff = time.time() - min_age.total_seconds()
+    directories = [os.path.join(media_root, directory) for directory in MEDIA_DIRS] + [uploads]
+    removed = 0
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                path = os.path.join(os.path.abspath(root), filename)
+                if path in referenced:
+                    continue
+                try:
+                    if os.stat(path).st_mtime > cutoff:
+                        continue
+                    if not dry_run:
+                        os.remove(path)
+                except FileNotFoundError:
+                    continue
+                removed += 1
+    return removed
@@ -0,0 +1,157 @@
+import atexit
+import logging
+import multiprocessing
+import signal
+import threading
+
+from django.conf import settings
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - resource limits are POSIX only
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+# Parse statuses returned in the result dictionary
+PARSE_OK = 'ok'
+PARSE_TIMEOUT = 'timeout'
+PARSE_MEMORY_EXCEEDED = 'memory_exceeded'
+PARSE_ERROR = 'error'
+
+
+class _CPULimitExceeded(Exception):
+    """Raised inside a worker when it receives SIGXCPU."""
+
+
+def _raise_cpu_limit_exceeded(signum, frame):
+    # Linux repeats SIGXCPU every second until the hard limit; only the first
+    # one should interrupt the job, not the reporting of its result.
+    signal.signal(signal.SIGXCPU, signal.SIG_IGN)
+    raise _CPULimitExceeded()
+
+
+def _apply_limits(cpu_seconds, memory_mb):
+    """Apply per-job CPU-time and address-space limits to the current worker."""
+    if resource is None:
+        return
+
+    if cpu_seconds:
+        # The soft limit delivers SIGXCPU so the job can report a clean timeout;
+        # the hard limit kills the worker if it ignores the signal.
+        signal.signal(signal.SIGXCPU, _raise_cpu_limit_exceeded)
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _parse_in_worker(file_path):
+    """Worker entry point: extract text and return a picklable result dictionary."""
+    from .email_generation import DocumentParser
+
+    try:
+        text = DocumentParser.extract_resume_text(file_path)
+        return {'status': PARSE_OK, 'text': text, 'error': None}
+    except _CPULimitExceeded:
+        return {'status': PARSE_TIMEOUT, 'text': '', 'error': "Document parsing exceeded the CPU time limit"}
+    except MemoryError:
+        return {'status': PARSE_MEMORY_EXCEEDED, 'text': '', 'error': "Document parsing exceeded the memory limit"}
+    except Exception as e:
+        # DocumentParser wraps every failure in ValueError; surface the limits
+        if isinstance(e.__context__, MemoryError):
+            return {'status': PARSE_MEMORY_EXCEEDED, 'text': '', 'error': "Document parsing exceeded the memory limit"}
+        if isinstance(e.__context__, _CPULimitExceeded):
+            return {'status': PARSE_TIMEOUT, 'text': '', 'error': "Document parsing exceeded the CPU time limit"}
+        return {'status': PARSE_ERROR, 'text': '', 'error': str(e)}
+
+
+class DocumentParserPool:
+    """
+    Pool of sandboxed subprocesses for parsing untrusted resume documents.
+
+    Every job runs in a fresh worker process (maxtasksperchild=1) so that the
+    CPU-time and memory limits apply per document, and a crashed or killed
+    worker is simply replaced by the pool.
+    """
+
+    def __init__(self, processes=None, cpu_seconds=None, memory_mb=None, timeout=None):
+        self.processes = processes or getattr(settings, 'DOCUMENT_PARSER_WORKERS', 2)
+        self.cpu_seconds = cpu_seconds or getattr(settings, 'DOCUMENT_PARSER_CPU_SECONDS', 10)
+        self.memory_mb = memory_mb or getattr(settings, 'DOCUMENT_PARSER_MEMORY_MB', 512)
+        self.timeout = timeout or getattr(settings, 'DOCUMENT_PARSER_TIMEOUT', 30)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_context(self):
+        methods = multiprocessing.get_all_start_methods()
+        if 'forkserver' in methods:
+            context = multiprocessing.get_context('forkserver')
+            # Import the parsers once in the fork server instead of once per job
+            context.set_forkserver_preload(['accounts.document_worker', 'accounts.email_generation'])
+            return context
+        return multiprocessing.get_context('spawn')
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = self._get_context().Pool(
+                    processes=self.processes,
+                    initializer=_apply_limits,
+                    initargs=(self.cpu_seconds, self.memory_mb),
+                    maxtasksperchild=1,
+                )
+            return self._pool
+
+    def parse(self, file_path):
+        """
+        Parse a resume in a sandboxed worker.
+        Returns a dictionary with 'status', 'text' and 'error' keys.
+        """
+        async_result = self._get_pool().apply_async(_parse_in_worker, (file_path,))
+        try:
+            return async_result.get(timeout=self.timeout)
+        except multiprocessing.TimeoutError:
+            # A worker killed by its hard limit never reports back, so the
+            # wall-clock timeout also covers that case.
+            logger.warning(f"Document parsing timed out after {self.timeout}s: {file_path}")
+            return {
+                'status': PARSE_TIMEOUT,
+                'text': '',
+                'error': f"Document parsing timed out after {self.timeout} seconds"
+            }
+        except Exception as e:
+            return {'status': PARSE_ERROR, 'text': '', 'error': f"Document parsing worker failed: {str(e)}"}
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.terminate()
+                self._pool.join()
+                self._pool = None
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_parser_pool():
+    """Return the process-wide document parser pool, creating it on first use."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = DocumentParserPool()
+            atexit.register(_default_pool.close)
+        return _default_pool
+
+
+def parse_document(file_path):
+    """
+    Extract text from a resume, sandboxed unless DOCUMENT_PARSER_SANDBOX is off.
+    Returns a dictionary with 'status', 'text' and 'error' keys.
+    """
+    if not getattr(settings, 'DOCUMENT_PARSER_SANDBOX', True):
+        return _parse_in_worker(file_path)
+    return get_parser_pool().parse(file_path)
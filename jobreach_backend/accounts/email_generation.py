@@ -1,12 +1,20 @@
 import csv
 import io
 import os
-from typing import List, Dict, Tuple
+from typing import Callable, Iterator, List, Dict, Tuple
 import PyPDF2
 import docx
 import openai
 from django.conf import settings
 from django.core.files.storage import default_storage
+from .document_worker import parse_document, PARSE_OK
+from .skills import extract_skill_profile, top_skill_names
+from .email_templates import TemplateEngine
+from .tracing import span, increment
+
+# Generation modes: OpenAI completions, or zero-cost rendering of an EmailTemplate
+GENERATION_MODE_AI = 'ai'
+GENERATION_MODE_TEMPLATE = 'template'
 
 
 class DocumentParser:
@@ -64,8 +72,11 @@ class CSVParser:
     @staticmethod
     def parse_csv_contacts(file_path: str) -> List[Dict[str, str]]:
         """Parse CSV file and return list of contact dictionaries."""
-        contacts = []
-        
+        return list(CSVParser.iter_csv_contacts(file_path))
+    
+    @staticmethod
+    def iter_csv_contacts(file_path: str) -> Iterator[Dict[str, str]]:
+        """Yield contact dictionaries one row at a time, for lists too large to hold in memory."""
         try:
             with open(file_path, 'r', encoding='utf-8') as csvfile:
                 # Try to detect delimiter
@@ -91,7 +102,7 @@ class CSVParser:
                         continue  # Skip rows without email
                     
                     # Standardize field names
-                    standardized_contact = {
+                    yield {
                         'name': contact.get('name') or contact.get('full_name', ''),
                         'email': contact.get('email', ''),
                         'company': contact.get('company') or contact.get('organization', ''),
@@ -99,18 +110,17 @@ class CSVParser:
                         'row_number': row_num
                     }
                     
-                    contacts.append(standardized_contact)
-                    
         except Exception as e:
             raise ValueError(f"Error parsing CSV file: {str(e)}")
-        
-        return contacts
 
 
 class EmailGenerator:
     """Utility class for generating personalized emails using OpenAI."""
     
-    def __init__(self):
+    def __init__(self, template_engine: TemplateEngine = None):
+        # Renders the fallback email when OpenAI isn't available
+        self.template_engine = template_engine or TemplateEngine()
+        
         api_key = getattr(settings, 'OPENAI_API_KEY', None)
         
         # Check if we should use test mode
@@ -125,47 +135,54 @@ class EmailGenerator:
             print("🧪 EmailGenerator running in TEST MODE - using mock responses")
             return
         
-        # Real OpenAI setup using legacy API
+        # Real OpenAI setup (OPENAI_BASE_URL points at a compatible server when set)
         try:
-            import openai
-            openai.api_key = api_key
-            self.client = openai
-            self._use_legacy_api = True
+            self.client = openai.OpenAI(
+                api_key=api_key,
+                base_url=getattr(settings, 'OPENAI_BASE_URL', None) or None,
+                timeout=getattr(settings, 'OPENAI_TIMEOUT', 60)
+            )
             print("✅ OpenAI client initialized successfully")
         except Exception as e:
             print(f"⚠️ OpenAI initialization failed: {e}")
             print("🧪 Falling back to TEST MODE")
             self.test_mode = True
     
-    def generate_personalized_email(self, resume_text: str, contact: Dict[str, str]) -> Tuple[str, str]:
+    def generate_personalized_email(self, resume_text: str, contact: Dict[str, str],
+                                    skill_profile: List[Dict] = None) -> Tuple[str, str]:
         """
         Generate a personalized email for a contact using resume text.
+        Pass the resume's precomputed skill_profile to avoid rescanning the resume.
         Returns tuple of (subject, body).
         """
+        if skill_profile is None:
+            skill_profile = extract_skill_profile(resume_text)
+        
         # Test mode - return mock emails
         if self.test_mode:
-            return self._generate_mock_email(resume_text, contact)
+            return self._generate_mock_email(resume_text, contact, skill_profile)
         
         try:
             # Create the prompt for OpenAI
-            prompt = self._create_email_prompt(resume_text, contact)
+            prompt = self._create_email_prompt(resume_text, contact, skill_profile)
             
-            # Call OpenAI API using legacy API
-            response = self.client.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a professional email writer helping job seekers create personalized outreach emails. Generate professional, concise emails that highlight relevant skills and express genuine interest in opportunities."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_tokens=500,
-                temperature=0.7
-            )
+            # Call OpenAI chat completions API
+            with span('openai_completion'):
+                response = self.client.chat.completions.create(
+                    model="gpt-3.5-turbo",
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "You are a professional email writer helping job seekers create personalized outreach emails. Generate professional, concise emails that highlight relevant skills and express genuine interest in opportunities."
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    max_tokens=500,
+                    temperature=0.7
+                )
             email_content = response.choices[0].message.content.strip()
             
             # Parse the response
@@ -176,61 +193,35 @@ class EmailGenerator:
         except Exception as e:
             # Fallback to mock email if OpenAI fails
             print(f"⚠️ OpenAI failed ({str(e)}), using mock email")
-            return self._generate_mock_email(resume_text, contact)
+            return self._generate_mock_email(resume_text, contact, skill_profile)
     
-    def _generate_mock_email(self, resume_text: str, contact: Dict[str, str]) -> Tuple[str, str]:
+    def _generate_mock_email(self, resume_text: str, contact: Dict[str, str],
+                             skill_profile: List[Dict] = None) -> Tuple[str, str]:
         """Generate a mock professional email for testing purposes."""
         
-        name = contact.get('name', 'Hiring Manager')
-        company = contact.get('company', 'your company')
-        position = contact.get('position', 'available positions')
-        
-        # Extract some skills from resume for personalization
-        skills = []
-        resume_lower = resume_text.lower()
-        if 'python' in resume_lower:
-            skills.append('Python')
-        if 'javascript' in resume_lower or 'react' in resume_lower:
-            skills.append('JavaScript/React')
-        if 'django' in resume_lower:
-            skills.append('Django')
-        if 'aws' in resume_lower or 'cloud' in resume_lower:
-            skills.append('cloud technologies')
-        if not skills:
-            skills = ['software development', 'full-stack development']
-        
-        subject = f"Software Engineer Opportunity - Interest in {company}"
-        
-        body = f"""Dear {name},
-
-I hope this email finds you well. I am writing to express my strong interest in {position} opportunities at {company}.
-
-With my experience in {', '.join(skills[:2])}, I believe I would be a valuable addition to your team. I have a proven track record in software development and am particularly drawn to {company}'s innovative approach in the industry.
-
-I would welcome the opportunity to discuss how my skills and experience align with your team's needs. I have attached my resume for your review and would be happy to provide any additional information.
-
-Thank you for your time and consideration. I look forward to hearing from you.
-
-Best regards,
-John Smith
-john.smith@email.com
-(555) 123-4567"""
-        
-        return subject, body
+        if skill_profile is None:
+            skill_profile = extract_skill_profile(resume_text)
+        return self.template_engine.render(contact, skill_profile)
     
-    def _create_email_prompt(self, resume_text: str, contact: Dict[str, str]) -> str:
+    def _create_email_prompt(self, resume_text: str, contact: Dict[str, str],
+                             skill_profile: List[Dict] = None) -> str:
         """Create the prompt for OpenAI based on resume and contact info."""
         
         # Truncate resume text if too long (keep first 2000 characters)
         if len(resume_text) > 2000:
             resume_text = resume_text[:2000] + "..."
         
+        key_skills = ', '.join(top_skill_names(skill_profile, 8)) or 'Not detected'
+        
         prompt = f"""
 Based on the following resume and contact information, write a professional email reaching out for job opportunities.
 
 RESUME INFORMATION:
 {resume_text}
 
+KEY SKILLS (most prominent first):
+{key_skills}
+
 CONTACT INFORMATION:
 - Name: {contact.get('name', 'Hiring Manager')}
 - Email: {contact.get('email', '')}
@@ -293,53 +284,106 @@ Make the email personal and engaging while maintaining professionalism.
 class EmailGenerationService:
     """Main service class for coordinating email generation process."""
     
-    def __init__(self):
+    def __init__(self, sender=None, template=None, mode: str = GENERATION_MODE_AI):
+        """
+        sender: the CustomUser sending the emails, used for the signature.
+        template: an EmailTemplate for template mode and the mock fallback.
+        mode: GENERATION_MODE_AI or GENERATION_MODE_TEMPLATE.
+        """
         self.document_parser = DocumentParser()
         self.csv_parser = CSVParser()
-        self.email_generator = EmailGenerator()
+        self.template_engine = TemplateEngine(template=template, sender=sender)
+        self.mode = mode
+        self.email_generator = (
+            EmailGenerator(self.template_engine) if mode == GENERATION_MODE_AI else None
+        )
     
-    def generate_emails_for_contact_list(self, resume_file_path: str, csv_file_path: str) -> List[Dict]:
+    def prepare_resume(self, resume_file_path: str, resume_text: str = None,
+                       skill_profile: List[Dict] = None) -> Tuple[str, List[Dict]]:
+        """
+        Return the resume's (text, skill profile), extracting the text in a
+        sandboxed worker process unless it was already parsed at upload time.
+        Raises ValueError if the resume can't be parsed.
+        """
+        if resume_text is None:
+            with span('resume_parse'):
+                parse_result = parse_document(resume_file_path)
+            if parse_result['status'] != PARSE_OK:
+                raise ValueError(parse_result['error'])
+            resume_text = parse_result['text']
+        
+        # Scan the resume for skills once, not once per contact
+        if skill_profile is None:
+            skill_profile = extract_skill_profile(resume_text)
+        return resume_text, skill_profile
+    
+    def generate_for_contact(self, contact: Dict[str, str], resume_text: str,
+                             skill_profile: List[Dict]) -> Dict:
+        """Generate the email for one contact. Failures are reported in the result, not raised."""
+        try:
+            with span('generate_email', mode=self.mode):
+                if self.mode == GENERATION_MODE_TEMPLATE:
+                    subject, body = self.template_engine.render(contact, skill_profile)
+                else:
+                    subject, body = self.email_generator.generate_personalized_email(
+                        resume_text, contact, skill_profile
+                    )
+            
+            result = {
+                'contact': contact,
+                'subject': subject,
+                'body': body,
+                'success': True,
+                'error': None
+            }
+            
+        except Exception as e:
+            result = {
+                'contact': contact,
+                'subject': f"Interest in Opportunities at {contact.get('company', 'your company')}",
+                'body': f"Dear {contact.get('name', 'Hiring Manager')},\n\nI hope this email finds you well...",
+                'success': False,
+                'error': str(e)
+            }
+        
+        increment('jobreach_emails_generated_total', mode=self.mode,
+                  outcome='success' if result['success'] else 'failure')
+        return result
+    
+    def generate_emails_for_contact_list(self, resume_file_path: str, csv_file_path: str,
+                                         resume_text: str = None,
+                                         skill_profile: List[Dict] = None,
+                                         start_after_row: int = 0,
+                                         on_result: Callable[[Dict], None] = None) -> List[Dict]:
         """
         Generate personalized emails for all contacts in a CSV file using a resume.
+        Pass resume_text and skill_profile when the resume was already parsed at upload time.
+        To resume an interrupted run, pass the CSV row it had reached as start_after_row;
+        contacts up to that row are skipped. on_result is called with each result as soon
+        as it is generated, so the caller can save it before moving on; an exception it
+        raises stops generation and is chained as the __cause__ of the ValueError raised.
         Returns list of generated email data.
         """
-        results = []
-        
         try:
-            # Extract resume text
-            resume_text = self.document_parser.extract_resume_text(resume_file_path)
+            resume_text, skill_profile = self.prepare_resume(resume_file_path, resume_text, skill_profile)
             
             # Parse CSV contacts
-            contacts = self.csv_parser.parse_csv_contacts(csv_file_path)
+            with span('contact_parse'):
+                contacts = self.csv_parser.parse_csv_contacts(csv_file_path)
             
             if not contacts:
                 raise ValueError("No valid contacts found in CSV file")
             
             # Generate email for each contact
+            results = []
             for contact in contacts:
-                try:
-                    subject, body = self.email_generator.generate_personalized_email(resume_text, contact)
-                    
-                    result = {
-                        'contact': contact,
-                        'subject': subject,
-                        'body': body,
-                        'success': True,
-                        'error': None
-                    }
-                    
-                except Exception as e:
-                    result = {
-                        'contact': contact,
-                        'subject': f"Interest in Opportunities at {contact.get('company', 'your company')}",
-                        'body': f"Dear {contact.get('name', 'Hiring Manager')},\n\nI hope this email finds you well...",
-                        'success': False,
-                        'error': str(e)
-                    }
-                
+                if contact['row_number'] <= start_after_row:
+                    continue
+                result = self.generate_for_contact(contact, resume_text, skill_profile)
+                if on_result is not None:
+                    on_result(result)
                 results.append(result)
-            
             return results
             
         except Exception as e:
-            raise ValueError(f"Error in email generation process: {str(e)}")
+            raise ValueError(f"Error in email generation process: {str(e)}") from e
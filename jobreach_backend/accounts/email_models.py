@@ -1,7 +1,7 @@
 # Add these to your existing models.py
 from django.db import models
 from django.contrib.auth import get_user_model
-from datetime import date
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -15,13 +15,13 @@ class UserProfile(models.Model):
     gmail_refresh_token = models.TextField(null=True, blank=True)
     
     def can_send_emails(self, count):
-        """Check if user can send specified number of emails today"""
-        today = date.today()
-        if self.last_email_date != today:
-            self.emails_sent_today = 0
-            self.last_email_date = today
-            self.save()
-        return self.emails_sent_today + count <= self.daily_email_limit
+        """
+        Check if user can send specified number of emails today.
+        Read-only: reserve sends through accounts.quota.SendQuota.
+        """
+        today = timezone.localdate()
+        sent_today = self.emails_sent_today if self.last_email_date == today else 0
+        return sent_today + count <= self.daily_email_limit
     
     def __str__(self):
         return f"{self.user.username}'s Profile"
@@ -57,6 +57,17 @@ class EmailTemplate(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    def clean(self):
+        """Reject templates with placeholders the template engine can't render."""
+        from django.core.exceptions import ValidationError
+        from .email_templates import CompiledTemplate
+        
+        for field in ('subject_template', 'body_template'):
+            try:
+                CompiledTemplate(getattr(self, field))
+            except ValueError as e:
+                raise ValidationError({field: str(e)})
+    
     def __str__(self):
         return f"{self.name} ({self.template_type})"
 
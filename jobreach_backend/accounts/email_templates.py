@@ -0,0 +1,109 @@
+from string import Formatter
+from typing import Dict, List, Tuple
+
+from .skills import top_skill_names
+
+
+# Placeholders available to EmailTemplate subject/body templates, e.g. "Dear {name},"
+TEMPLATE_FIELDS = {
+    'name', 'email', 'company', 'position', 'skills', 'top_skill',
+    'sender_name', 'sender_email', 'sender_signature',
+}
+
+DEFAULT_SUBJECT_TEMPLATE = "Software Engineer Opportunity - Interest in {company}"
+
+DEFAULT_BODY_TEMPLATE = """Dear {name},
+
+I hope this email finds you well. I am writing to express my strong interest in {position} opportunities at {company}.
+
+With my experience in {skills}, I believe I would be a valuable addition to your team. I have a proven track record in software development and am particularly drawn to {company}'s innovative approach in the industry.
+
+I would welcome the opportunity to discuss how my skills and experience align with your team's needs. I have attached my resume for your review and would be happy to provide any additional information.
+
+Thank you for your time and consideration. I look forward to hearing from you.
+
+Best regards,
+{sender_signature}"""
+
+
+class CompiledTemplate:
+    """
+    A subject or body template parsed once into literal text and placeholders.
+    Rendering is a single join, so it can be reused across thousands of contacts.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self._parts = []  # (literal, field name or None)
+
+        for literal, field_name, format_spec, conversion in Formatter().parse(source):
+            if field_name is not None:
+                if field_name not in TEMPLATE_FIELDS:
+                    raise ValueError(
+                        f"Unknown template placeholder '{{{field_name}}}'. "
+                        f"Available: {', '.join(sorted(TEMPLATE_FIELDS))}"
+                    )
+                if format_spec or conversion:
+                    raise ValueError(f"Format options are not supported in placeholder '{{{field_name}}}'")
+            self._parts.append((literal, field_name))
+
+    def render(self, context: Dict[str, str]) -> str:
+        return ''.join(
+            literal + context[field_name] if field_name else literal
+            for literal, field_name in self._parts
+        )
+
+
+def get_sender_details(user) -> Dict[str, str]:
+    """Build the signature fields for a sender from their CustomUser record."""
+    if user is None:
+        return {'sender_name': '', 'sender_email': '', 'sender_signature': ''}
+
+    sender_name = user.full_name or user.get_full_name() or user.username
+    signature_lines = [sender_name]
+    if user.email:
+        signature_lines.append(user.email)
+
+    return {
+        'sender_name': sender_name,
+        'sender_email': user.email or '',
+        'sender_signature': '\n'.join(signature_lines),
+    }
+
+
+class TemplateEngine:
+    """
+    Renders personalized emails from an EmailTemplate without calling an LLM.
+    Templates are compiled once per engine; per-contact work is a dict build and a join.
+    """
+
+    def __init__(self, template=None, sender=None):
+        """
+        template: an EmailTemplate instance, or None for the built-in default.
+        sender: the CustomUser whose signature closes the email.
+        """
+        subject_source = template.subject_template if template else DEFAULT_SUBJECT_TEMPLATE
+        body_source = template.body_template if template else DEFAULT_BODY_TEMPLATE
+
+        self.template = template
+        self.subject = CompiledTemplate(subject_source)
+        self.body = CompiledTemplate(body_source)
+        self.sender_details = get_sender_details(sender)
+
+    def build_context(self, contact: Dict[str, str], skill_profile: List[Dict] = None) -> Dict[str, str]:
+        skills = top_skill_names(skill_profile, 2) or ['software development', 'full-stack development']
+        context = {
+            'name': contact.get('name') or 'Hiring Manager',
+            'email': contact.get('email') or '',
+            'company': contact.get('company') or 'your company',
+            'position': contact.get('position') or 'available positions',
+            'skills': ', '.join(skills),
+            'top_skill': skills[0],
+        }
+        context.update(self.sender_details)
+        return context
+
+    def render(self, contact: Dict[str, str], skill_profile: List[Dict] = None) -> Tuple[str, str]:
+        """Render (subject, body) for a single contact."""
+        context = self.build_context(contact, skill_profile)
+        return self.subject.render(context), self.body.render(context)
@@ -0,0 +1,273 @@
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.utils.module_loading import import_string
+
+try:
+    import dns.exception
+    import dns.name
+    import dns.resolver
+except ImportError:  # pragma: no cover - dnspython is optional
+    dns = None
+
+logger = logging.getLogger(__name__)
+
+
+# Verification outcomes
+ADDRESS_VALID = 'valid'
+ADDRESS_INVALID_SYNTAX = 'invalid_syntax'
+ADDRESS_DISPOSABLE = 'disposable'
+ADDRESS_NO_MX = 'no_mx'
+ADDRESS_UNKNOWN = 'unknown'  # The domain lookup failed or timed out; not evidence the address is bad
+
+ADDRESS_CHECK_CHOICES = [
+    (ADDRESS_VALID, 'Valid'),
+    (ADDRESS_INVALID_SYNTAX, 'Invalid syntax'),
+    (ADDRESS_DISPOSABLE, 'Disposable domain'),
+    (ADDRESS_NO_MX, 'No mail server'),
+    (ADDRESS_UNKNOWN, 'Unknown'),
+]
+
+# Outcomes that still allow an email to be marked verified
+PASSING_CHECKS = (ADDRESS_VALID, ADDRESS_UNKNOWN)
+
+REASONS = {
+    ADDRESS_VALID: "Address looks deliverable",
+    ADDRESS_INVALID_SYNTAX: "Address is not a valid email address",
+    ADDRESS_DISPOSABLE: "Address uses a disposable email domain",
+    ADDRESS_NO_MX: "Domain has no mail server",
+    ADDRESS_UNKNOWN: "Domain could not be checked",
+}
+
+# Well-known throwaway mailbox providers; extend with the DISPOSABLE_EMAIL_DOMAINS setting
+DISPOSABLE_DOMAINS = frozenset([
+    '10minutemail.com', '33mail.com', 'burnermail.io', 'discard.email', 'dispostable.com',
+    'emailondeck.com', 'fakeinbox.com', 'getairmail.com', 'getnada.com', 'grr.la',
+    'guerrillamail.com', 'guerrillamail.net', 'guerrillamailblock.com', 'mailcatch.com',
+    'maildrop.cc', 'mailinator.com', 'mailnesia.com', 'mintemail.com', 'moakt.com',
+    'mohmal.com', 'mytemp.email', 'sharklasers.com', 'spamgourmet.com', 'tempail.com',
+    'temp-mail.org', 'tempmail.com', 'tempr.email', 'throwawaymail.com', 'trashmail.com',
+    'trashmail.net', 'yopmail.com',
+])
+
+
+class DomainLookupError(Exception):
+    """A resolver could not determine whether a domain accepts mail."""
+
+
+class DNSPythonResolver:
+    """
+    MX lookups with dnspython, falling back to the A record (implicit MX) when there
+    is no MX. A null MX ("MX 0 .", RFC 7505) means the domain accepts no mail.
+    """
+
+    def __init__(self, timeout=5.0):
+        if dns is None:
+            raise ImportError("The 'dnspython' resolver requires the dnspython package")
+        self.resolver = dns.resolver.Resolver()
+        self.timeout = timeout
+
+    def accepts_mail(self, domain):
+        try:
+            answer = self.resolver.resolve(domain, 'MX', lifetime=self.timeout)
+            return any(record.exchange != dns.name.root for record in answer)
+        except dns.resolver.NXDOMAIN:
+            return False
+        except dns.resolver.NoAnswer:
+            try:
+                return bool(self.resolver.resolve(domain, 'A', lifetime=self.timeout))
+            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+                return False
+            except dns.exception.DNSException as e:
+                raise DomainLookupError(str(e))
+        except dns.exception.DNSException as e:
+            raise DomainLookupError(str(e))
+
+
+class SocketResolver:
+    """
+    Standard-library fallback: a domain accepts mail if it resolves at all.
+    Can't see MX records, so it only catches domains that don't exist.
+
+    getaddrinfo() has no timeout of its own, so it runs in a daemon thread that is
+    abandoned after `timeout` seconds.
+    """
+
+    def __init__(self, timeout=5.0):
+        self.timeout = timeout
+
+    def accepts_mail(self, domain):
+        outcome = {}
+
+        def resolve():
+            try:
+                outcome['addresses'] = socket.getaddrinfo(domain, 25, proto=socket.IPPROTO_TCP)
+            except socket.gaierror as e:
+                outcome['error'] = e
+
+        thread = threading.Thread(target=resolve, name='email-verify-socket', daemon=True)
+        thread.start()
+        thread.join(self.timeout)
+        if thread.is_alive():
+            raise DomainLookupError(f"Lookup timed out after {self.timeout}s")
+        error = outcome.get('error')
+        if error is not None:
+            if error.errno in (socket.EAI_NONAME, getattr(socket, 'EAI_NODATA', socket.EAI_NONAME)):
+                return False
+            raise DomainLookupError(str(error))
+        return bool(outcome['addresses'])
+
+
+class AcceptAllResolver:
+    """Skips network lookups entirely (offline development)."""
+
+    def __init__(self, timeout=None):
+        pass
+
+    def accepts_mail(self, domain):
+        return True
+
+
+class StaticResolver:
+    """
+    Answers from a fixed {domain: accepts_mail} mapping, optionally with simulated
+    latency. Used by tests and benchmarks; counts the lookups it serves.
+    """
+
+    def __init__(self, records=None, default=True, latency_ms=0, timeout=None):
+        self.records = {domain.lower(): value for domain, value in (records or {}).items()}
+        self.default = default
+        self.latency = latency_ms / 1000
+        self.lookup_count = 0
+        self._lock = threading.Lock()
+
+    def accepts_mail(self, domain):
+        with self._lock:
+            self.lookup_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+        value = self.records.get(domain, self.default)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
+RESOLVER_BACKENDS = {
+    'dnspython': DNSPythonResolver,
+    'socket': SocketResolver,
+    'off': AcceptAllResolver,
+}
+
+
+def get_resolver():
+    """Build the resolver named by EMAIL_VERIFICATION_RESOLVER ('auto' prefers dnspython)."""
+    backend = getattr(settings, 'EMAIL_VERIFICATION_RESOLVER', 'auto')
+    timeout = getattr(settings, 'EMAIL_VERIFICATION_TIMEOUT', 5.0)
+    if backend == 'auto':
+        backend = 'dnspython' if dns is not None else 'socket'
+    resolver_class = RESOLVER_BACKENDS.get(backend) or import_string(backend)
+    return resolver_class(timeout=timeout)
+
+
+def _result(email, status):
+    return {'email': email, 'status': status, 'reason': REASONS[status]}
+
+
+class EmailVerifier:
+    """
+    Checks addresses for valid syntax, disposable domains and a mail server.
+
+    Domain lookups are the expensive part, so each distinct domain is looked up
+    once per batch, concurrently, and the answer is cached for
+    EMAIL_VERIFICATION_CACHE_TTL seconds: verifying a contact list costs one
+    lookup per company domain, not one per contact.
+    """
+
+    CACHE_PREFIX = 'email_domain_check:'
+
+    def __init__(self, resolver=None, cache_ttl=None, workers=None, timeout=None):
+        self.resolver = resolver or get_resolver()
+        self.cache_ttl = cache_ttl if cache_ttl is not None else getattr(settings, 'EMAIL_VERIFICATION_CACHE_TTL', 86400)
+        self.workers = workers or getattr(settings, 'EMAIL_VERIFICATION_WORKERS', 16)
+        self.timeout = timeout or getattr(settings, 'EMAIL_VERIFICATION_TIMEOUT', 5.0)
+        self.disposable_domains = DISPOSABLE_DOMAINS | {
+            domain.lower() for domain in getattr(settings, 'DISPOSABLE_EMAIL_DOMAINS', ())
+        }
+
+    @staticmethod
+    def normalize(email):
+        """Return (email, domain), or None if the address isn't syntactically valid."""
+        email = (email or '').strip()
+        try:
+            validate_email(email)
+        except ValidationError:
+            return None
+        return email, email.rpartition('@')[2].lower()
+
+    def verify(self, email):
+        return self.verify_many([email])[email]
+
+    def verify_many(self, emails):
+        """Verify a batch of addresses. Returns {email: {'email', 'status', 'reason'}}."""
+        results = {}
+        pending = {}  # domain -> emails waiting on its lookup
+
+        for email in emails:
+            if email in results:
+                continue
+            normalized = self.normalize(email)
+            if normalized is None:
+                results[email] = _result(email, ADDRESS_INVALID_SYNTAX)
+            elif normalized[1] in self.disposable_domains:
+                results[email] = _result(email, ADDRESS_DISPOSABLE)
+            else:
+                pending.setdefault(normalized[1], []).append(email)
+
+        for domain, accepts_mail in self.check_domains(pending).items():
+            status = ADDRESS_UNKNOWN if accepts_mail is None else ADDRESS_VALID if accepts_mail else ADDRESS_NO_MX
+            for email in pending[domain]:
+                results[email] = _result(email, status)
+
+        return results
+
+    def check_domains(self, domains):
+        """Return {domain: True/False/None} (None when the lookup failed), using the cache first."""
+        domains = list(domains)
+        cached = cache.get_many([self.CACHE_PREFIX + domain for domain in domains])
+        answers = {domain: cached[self.CACHE_PREFIX + domain] for domain in domains
+                   if self.CACHE_PREFIX + domain in cached}
+
+        missing = [domain for domain in domains if domain not in answers]
+        if missing:
+            looked_up = self._lookup_concurrently(missing)
+            cache.set_many({self.CACHE_PREFIX + domain: value for domain, value in looked_up.items()
+                            if value is not None}, timeout=self.cache_ttl)
+            answers.update(looked_up)
+        return answers
+
+    def _lookup(self, domain):
+        try:
+            return self.resolver.accepts_mail(domain)
+        except DomainLookupError as e:
+            logger.warning(f"Mail server lookup for {domain} failed: {e}")
+            return None
+
+    def _lookup_concurrently(self, domains):
+        # Even a single lookup goes through the pool, so it gets the same timeout
+        executor = ThreadPoolExecutor(max_workers=min(self.workers, len(domains)),
+                                      thread_name_prefix='email-verify')
+        try:
+            futures = {executor.submit(self._lookup, domain): domain for domain in domains}
+            # Budget for the whole batch: one timeout per wave of parallel lookups, plus slack
+            waves = -(-len(domains) // self.workers)
+            done, _ = wait(futures, timeout=self.timeout * waves + 1)
+            return {domain: future.result() if future in done else None for future, domain in futures.items()}
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
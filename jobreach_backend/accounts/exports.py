@@ -0,0 +1,96 @@
+import csv
+import json
+
+from django.conf import settings
+
+# Columns in export order
+EXPORT_FIELDS = [
+    'id', 'recipient_name', 'recipient_email', 'recipient_company', 'recipient_position',
+    'email_subject', 'email_body', 'status', 'address_check', 'generated_at', 'sent_at',
+    'scheduled_for', 'resume_id', 'contact_list_id',
+]
+DATETIME_FIELDS = {'generated_at', 'sent_at', 'scheduled_for'}
+
+# Rows joined into each chunk handed to the server
+ROWS_PER_WRITE = 100
+
+# Spreadsheet apps treat cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def _format_datetime(value):
+    """ISO 8601 with a 'Z' suffix for UTC, matching DRF's DateTimeField output."""
+    if value is None:
+        return None
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def _rows(queryset):
+    chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    datetime_positions = [i for i, field in enumerate(EXPORT_FIELDS) if field in DATETIME_FIELDS]
+    for row in queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size):
+        row = list(row)
+        for i in datetime_positions:
+            row[i] = _format_datetime(row[i])
+        yield row
+
+
+def _batched(lines, size):
+    """Join lines into larger chunks so the server writes a few KB at a time, not one row."""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+class _Echo:
+    """File-like object whose write() returns the line, so csv.writer can feed a generator."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _csv_lines(queryset):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in _rows(queryset):
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+
+def _ndjson_lines(queryset):
+    for row in _rows(queryset):
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + '\n'
+
+
+def stream_csv(queryset):
+    """Yield the queryset as CSV, header first, reading the database one chunk at a time."""
+    return _batched(_csv_lines(queryset), ROWS_PER_WRITE)
+
+
+def stream_ndjson(queryset):
+    """Yield the queryset as newline-delimited JSON objects."""
+    return _batched(_ndjson_lines(queryset), ROWS_PER_WRITE)
+
+
+STREAMERS = {
+    'csv': stream_csv,
+    'ndjson': stream_ndjson,
+}
@@ -0,0 +1,129 @@
+from datetime import timezone as dt_timezone
+
+from django.db import models
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+# Model fields whose DRF representation isn't the raw column value
+UNSUPPORTED_FIELDS = (
+    models.FileField, models.DecimalField, models.DateField, models.TimeField,
+    models.DurationField, models.UUIDField, models.ManyToManyField,
+)
+
+_datetime_field = serializers.DateTimeField()
+
+
+def _datetime(value):
+    """DRF's DateTimeField output (current time zone, ISO 8601 with 'Z' for UTC)."""
+    return None if value is None else _datetime_field.to_representation(value)
+
+
+def _utc_datetime(value):
+    """_datetime() for when the output time zone is UTC: database values need no conversion."""
+    if value is None:
+        return None
+    if value.tzinfo is not dt_timezone.utc:
+        return _datetime_field.to_representation(value)
+    return value.isoformat()[:-6] + 'Z'
+
+
+def _outputs_utc_iso():
+    output_format = api_settings.DATETIME_FORMAT
+    return (
+        output_format is not None and output_format.lower() == ISO_8601
+        and timezone.get_current_timezone_name() in ('UTC', 'Etc/UTC')
+    )
+
+
+class RowSerializer:
+    """
+    Read-only fast path producing the same dicts as a ModelSerializer's `.data`.
+
+    Each dict is built by a function compiled once from the serializer's field
+    list, reading values_list() tuples (or already loaded instances) directly
+    instead of going through DRF's per-field machinery. Supports plain columns,
+    foreign keys (as ids), datetimes, and `computed` fields derived from one
+    column: {name: (column, function)}.
+    """
+
+    def __init__(self, serializer_class, computed=None):
+        model = serializer_class.Meta.model
+        computed = computed or {}
+        self.name = serializer_class.__name__
+        self.fields = list(serializer_class.Meta.fields)
+        self.columns = []  # attnames read per row, in values_list() order
+        self._specs = []  # (output name, column, helper name or None)
+        self._helpers = {}
+
+        for name in self.fields:
+            if name in computed:
+                column, function = computed[name]
+                self._helpers[f'_{name}'] = function
+                self._specs.append((name, column, f'_{name}'))
+            else:
+                field = model._meta.get_field(name)
+                is_datetime = isinstance(field, models.DateTimeField)
+                if not is_datetime and isinstance(field, UNSUPPORTED_FIELDS):
+                    raise TypeError(f"{self.name}.{name}: {type(field).__name__} is not supported by RowSerializer")
+                column = field.attname
+                helper = '_datetime' if is_datetime else None
+                self._specs.append((name, column, helper))
+            if column not in self.columns:
+                self.columns.append(column)
+
+        # Builders keyed by whether datetimes can take the UTC shortcut
+        self._row_builders = {
+            utc: self._compile(lambda column: f'row[{self.columns.index(column)}]', utc) for utc in (True, False)
+        }
+        self._instance_builders = {
+            utc: self._compile(lambda column: f'row.{column}', utc) for utc in (True, False)
+        }
+
+    def _compile(self, access, utc):
+        items = []
+        for name, column, helper in self._specs:
+            value = access(column)
+            items.append(f'{name!r}: {helper}({value})' if helper else f'{name!r}: {value}')
+        source = f"def build(row):\n    return {{{', '.join(items)}}}\n"
+        namespace = dict(self._helpers, _datetime=_utc_datetime if utc else _datetime)
+        exec(compile(source, f'<{self.name} row builder>', 'exec'), namespace)
+        return namespace['build']
+
+    def serialize(self, queryset):
+        """Serialize a queryset, fetching only the columns the output needs."""
+        build = self._row_builders[_outputs_utc_iso()]
+        return [build(row) for row in queryset.values_list(*self.columns)]
+
+    def serialize_instances(self, instances):
+        """Serialize model instances that are already in memory."""
+        build = self._instance_builders[_outputs_utc_iso()]
+        return [build(instance) for instance in instances]
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed. Anything orjson
+    wouldn't encode exactly as DRF does (datetimes, lazy strings, decimals, ...)
+    falls back to the standard renderer, so the output is the same either way.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            return orjson.dumps(data, default=_not_native,
+                                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+def _not_native(value):
+    raise TypeError
@@ -0,0 +1,350 @@
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .cleanup import bulk_delete
+from .email_generation import CSVParser, EmailGenerationService
+from .models import GeneratedEmail, GenerationRun, GenerationTask, Resume
+from .tracing import span
+from .user_cache import EMAIL_COUNTS, invalidate
+
+logger = logging.getLogger(__name__)
+
+# Task rows inserted per statement when a run is started
+TASK_INSERT_BATCH = 1000
+
+UNFINISHED_TASK_STATUSES = (GenerationTask.STATUS_PENDING, GenerationTask.STATUS_LEASED)
+
+# Times start_inline_run() looks again after losing a race to create or replace a run
+START_ATTEMPTS = 3
+
+
+def start_run(user, resume, contact_list, generation_mode, template=None):
+    """
+    Create a GenerationRun with one pending task per contact in the list, for
+    generation workers to pick up. The CSV is read a row at a time, so lists
+    of any size use constant memory. Raises ValueError if the list has no
+    usable contacts.
+    """
+    with transaction.atomic():
+        run = GenerationRun.objects.create(
+            user=user, resume=resume, contact_list=contact_list,
+            generation_mode=generation_mode, template=template
+        )
+        batch, total = [], 0
+        for contact in CSVParser.iter_csv_contacts(contact_list.file.path):
+            row_number = contact.pop('row_number')
+            batch.append(GenerationTask(run=run, row_number=row_number, contact=contact))
+            if len(batch) >= TASK_INSERT_BATCH:
+                GenerationTask.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        GenerationTask.objects.bulk_create(batch)
+        total += len(batch)
+
+        if not total:
+            raise ValueError("No valid contacts found in CSV file")  # Rolls the run back
+        run.total_contacts = total
+        run.save(update_fields=['total_contacts'])
+    return run
+
+
+def start_inline_run(user, resume, contact_list, generation_mode, template=None):
+    """
+    The run for generating a list within a request. A resume and contact list
+    have at most one unfinished inline run, enforced by a unique constraint, so
+    requests racing to start one end up contending for the same run. An
+    unfinished run with the same mode and template is resumed from its
+    checkpoint; one with another mode or template is cancelled once abandoned
+    and replaced, since both would write the same emails.
+
+    Returns (run, acquired). `acquired` is False when another request is
+    still working on the run: its lease hasn't expired. An acquired run
+    carries a fresh lease_token that identifies this request as its holder.
+    """
+    lease = timedelta(seconds=getattr(settings, 'GENERATION_CHECKPOINT_TIMEOUT', 300))
+    template_id = template.id if template else None
+    runs = GenerationRun.objects.filter(user=user, resume=resume, contact_list=contact_list, inline=True)
+
+    run = None
+    for _ in range(START_ATTEMPTS):
+        now = timezone.now()
+        token = uuid.uuid4().hex
+        run = runs.filter(status=GenerationRun.STATUS_RUNNING).first()
+        if run is None:
+            total = sum(1 for _ in CSVParser.iter_csv_contacts(contact_list.file.path))
+            if not total:
+                raise ValueError("No valid contacts found in CSV file")
+            try:
+                with transaction.atomic():
+                    return GenerationRun.objects.create(
+                        user=user, resume=resume, contact_list=contact_list, generation_mode=generation_mode,
+                        template=template, inline=True, total_contacts=total,
+                        lease_token=token, lease_expires_at=now + lease
+                    ), True
+            except IntegrityError:
+                continue  # Another request created it first: contend for its lease instead
+
+        unheld = GenerationRun.objects.filter(id=run.id, status=GenerationRun.STATUS_RUNNING).filter(
+            Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lt=now)
+        )
+        if (run.generation_mode, run.template_id) != (generation_mode, template_id):
+            if not unheld.update(status=GenerationRun.STATUS_CANCELLED, finished_at=now,
+                                 lease_token='', lease_expires_at=None):
+                return run, False
+            continue
+
+        acquired = unheld.update(lease_token=token, lease_expires_at=now + lease)
+        run.refresh_from_db()
+        return run, bool(acquired)
+
+    # Runs keep being created and finished under us; report the latest as busy
+    return run or runs.order_by('-id').first(), False
+
+
+class LeaseLost(Exception):
+    """
+    The request no longer holds its inline run: the run was cancelled, or the
+    lease expired and another request took the run over.
+    """
+
+
+class RunCheckpoint:
+    """
+    on_result callback for EmailGenerationService.generate_emails_for_contact_list()
+    that saves each email of an inline run as soon as it is generated and moves
+    the run's checkpoint past its contact in the same transaction. Whatever the
+    request gets through is kept, and a retry starts after it instead of paying
+    for those completions again.
+
+    Every update is conditional on the lease token the run was acquired with,
+    so a request that stalled past its lease can't overwrite the progress of
+    the request that took the run over; it gets LeaseLost instead.
+    """
+
+    def __init__(self, run):
+        self.run = run
+        self.token = run.lease_token
+        self.lease = timedelta(seconds=getattr(settings, 'GENERATION_CHECKPOINT_TIMEOUT', 300))
+        # Counted here rather than with F() expressions: only the token holder's updates match
+        self.processed = run.processed_contacts
+        self.failed = run.failed_contacts
+
+    def _held(self):
+        return GenerationRun.objects.filter(
+            id=self.run.id, status=GenerationRun.STATUS_RUNNING, lease_token=self.token
+        )
+
+    def __call__(self, result):
+        with span('persistence'), transaction.atomic():
+            save_email(self.run, result)
+            saved = self._held().update(
+                checkpoint_row=result['contact']['row_number'],
+                processed_contacts=self.processed + 1,
+                failed_contacts=self.failed + (0 if result['success'] else 1),
+                lease_expires_at=timezone.now() + self.lease,
+            )
+            if not saved:
+                raise LeaseLost("Generation run was cancelled or taken over")  # Also discards this email
+        self.processed += 1
+        if not result['success']:
+            self.failed += 1
+
+    def complete(self):
+        completed = self._held().update(
+            status=GenerationRun.STATUS_COMPLETE, finished_at=timezone.now(), lease_token='', lease_expires_at=None
+        )
+        if not completed:
+            raise LeaseLost("Generation run was cancelled or taken over")
+        self.run.refresh_from_db()
+
+    def release(self):
+        """Let a retry resume the run straight away instead of waiting for the lease to expire."""
+        GenerationRun.objects.filter(id=self.run.id, lease_token=self.token).update(
+            lease_token='', lease_expires_at=None
+        )
+
+
+def run_progress(run):
+    """Contacts of the run per task status, e.g. {'pending': 10, 'leased': 4, 'done': 86, 'failed': 0}."""
+    counts = dict.fromkeys(dict(GenerationTask.STATUS_CHOICES), 0)
+    if run.inline:
+        unprocessed = max(run.total_contacts - run.processed_contacts, 0)
+        counts.update(
+            pending=unprocessed if run.status == GenerationRun.STATUS_RUNNING else 0,
+            done=run.processed_contacts - run.failed_contacts,
+            failed=run.failed_contacts,
+        )
+        return counts
+    counts.update(run.tasks.order_by().values_list('status').annotate(count=Count('id')))
+    return counts
+
+
+def cancel_run(run):
+    """Stop a running run. Contacts already leased finish; the rest are dropped. Returns False if it wasn't running."""
+    cancelled = GenerationRun.objects.filter(id=run.id, status=GenerationRun.STATUS_RUNNING).update(
+        status=GenerationRun.STATUS_CANCELLED, finished_at=timezone.now()
+    )
+    if cancelled:
+        bulk_delete(run.tasks.filter(status=GenerationTask.STATUS_PENDING))
+    return bool(cancelled)
+
+
+def complete_finished_runs(run_ids=None):
+    """Mark running runs with no pending or leased tasks left as complete. Returns the number completed."""
+    runs = GenerationRun.objects.filter(status=GenerationRun.STATUS_RUNNING, inline=False)
+    if run_ids is not None:
+        runs = runs.filter(id__in=run_ids)
+    return runs.exclude(tasks__status__in=UNFINISHED_TASK_STATUSES).update(
+        status=GenerationRun.STATUS_COMPLETE, finished_at=timezone.now()
+    )
+
+
+def save_email(run, result):
+    """
+    Create or update the GeneratedEmail for one generation result. An email
+    that is past draft (verified, authorized, sending, sent or failed) has
+    been reviewed or sent, so regenerating its contact leaves it as it is.
+    """
+    contact = result['contact']
+    lookup = dict(
+        user_id=run.user_id,
+        resume_id=run.resume_id,
+        contact_list_id=run.contact_list_id,
+        recipient_email=contact['email'],
+    )
+    fields = {
+        'recipient_name': contact['name'],
+        'recipient_company': contact.get('company', ''),
+        'recipient_position': contact.get('position', ''),
+        'email_subject': result['subject'],
+        'email_body': result['body'],
+    }
+    with transaction.atomic():
+        # Locked so the email can't be verified between the status check and the write
+        email = GeneratedEmail.objects.select_for_update().filter(**lookup).first()
+        if email is None:
+            return GeneratedEmail.objects.create(**lookup, **fields)
+        if email.status == GeneratedEmail.STATUS_DRAFT:
+            for field, value in fields.items():
+                setattr(email, field, value)
+            email.save(update_fields=list(fields))
+    return email
+
+
+class GenerationWorker:
+    """
+    Generates the emails of running GenerationRuns, a leased batch of
+    contacts at a time. The database is the only shared state, so any number
+    of workers on any number of machines can work through the same run: each
+    contact is leased to one worker at a time, and a contact whose worker
+    died is claimed again once its lease expires.
+    """
+
+    def __init__(self, owner=None, batch_size=None, lease_seconds=None, max_attempts=None):
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.batch_size = batch_size or getattr(settings, 'GENERATION_WORKER_BATCH_SIZE', 10)
+        self.lease = timedelta(seconds=lease_seconds or getattr(settings, 'GENERATION_LEASE_SECONDS', 120))
+        self.max_attempts = max_attempts or getattr(settings, 'GENERATION_MAX_ATTEMPTS', 3)
+        self._contexts = {}  # run_id -> (run, service, resume_text, skill_profile)
+
+    def run_once(self):
+        """Claim a batch of contacts and generate and save their emails. Returns the number of contacts processed."""
+        GenerationTask.objects.fail_abandoned(self.max_attempts)
+        tasks = GenerationTask.objects.filter(run__status=GenerationRun.STATUS_RUNNING).claim(
+            self.owner, self.batch_size, self.lease, self.max_attempts
+        )
+        if not tasks:
+            self._contexts.clear()
+            complete_finished_runs()  # Runs whose last contacts were failed by fail_abandoned()
+            return 0
+
+        processed = 0
+        failed_runs = set()
+        renewed_at = time.monotonic()
+        for index, task in enumerate(tasks):
+            if time.monotonic() - renewed_at > self.lease.total_seconds() / 2:
+                self._renew(tasks[index:])
+                renewed_at = time.monotonic()
+            if task.run_id in failed_runs:
+                continue
+            try:
+                run, service, resume_text, skill_profile = self._context(task.run_id)
+            except (ValueError, GenerationRun.DoesNotExist) as e:
+                self._fail_run(task.run_id, str(e))
+                failed_runs.add(task.run_id)
+                continue
+
+            result = service.generate_for_contact(
+                {**task.contact, 'row_number': task.row_number}, resume_text, skill_profile
+            )
+            try:
+                with transaction.atomic():
+                    # Finishing first checks the lease is still ours; if it isn't, nothing is written
+                    finished = self._finish(task, result)
+                    if finished:
+                        save_email(run, result)
+            except Exception:
+                # The lease runs out and another attempt is made
+                logger.exception(f"Could not save generated email for task {task.id}")
+                continue
+            if not finished:
+                logger.warning(f"Lease on task {task.id} expired before it was saved; leaving it to its new holder")
+                continue
+            processed += 1
+
+        run_ids = {task.run_id for task in tasks}
+        complete_finished_runs(run_ids)
+        for run_id in run_ids:
+            run = self._contexts.get(run_id, (None,))[0]
+            if run is not None:
+                invalidate(run.user_id, EMAIL_COUNTS)
+        return processed
+
+    def _context(self, run_id):
+        """The run, its generation service and its resume's text and skills; prepared once per run."""
+        if run_id not in self._contexts:
+            run = GenerationRun.objects.select_related('user', 'resume', 'template').get(id=run_id)
+            service = EmailGenerationService(sender=run.user, template=run.template, mode=run.generation_mode)
+            resume = run.resume
+            if resume.parse_status == Resume.PARSE_READY:
+                resume_text, skill_profile = service.prepare_resume(resume.file.path, resume.extracted_text, resume.skills)
+            else:
+                resume_text, skill_profile = service.prepare_resume(resume.file.path)
+            self._contexts[run_id] = (run, service, resume_text, skill_profile)
+        return self._contexts[run_id]
+
+    def _finish(self, task, result):
+        """Mark a task this worker still holds done or failed. Returns False if the lease was lost."""
+        return bool(GenerationTask.objects.filter(
+            id=task.id, status=GenerationTask.STATUS_LEASED, lease_owner=self.owner
+        ).update(
+            status=GenerationTask.STATUS_DONE if result['success'] else GenerationTask.STATUS_FAILED,
+            error=result['error'] or '', lease_owner='', finished_at=timezone.now()
+        ))
+
+    def _renew(self, tasks):
+        """Extend the lease on tasks this worker still holds, so a long batch isn't taken over mid-way."""
+        GenerationTask.objects.filter(
+            id__in=[task.id for task in tasks], status=GenerationTask.STATUS_LEASED, lease_owner=self.owner
+        ).update(lease_expires_at=timezone.now() + self.lease)
+
+    def _fail_run(self, run_id, error):
+        """The resume can't be used, so no contact of the run can succeed; stop the run."""
+        logger.warning(f"Generation run {run_id} failed: {error}")
+        GenerationRun.objects.filter(id=run_id, status=GenerationRun.STATUS_RUNNING).update(
+            status=GenerationRun.STATUS_FAILED, error=error, finished_at=timezone.now()
+        )
+        # Tasks other workers hold are left for them to finish
+        GenerationTask.objects.filter(run_id=run_id).filter(
+            Q(status=GenerationTask.STATUS_PENDING) |
+            Q(status=GenerationTask.STATUS_LEASED, lease_owner=self.owner)
+        ).update(status=GenerationTask.STATUS_FAILED, error=error, lease_owner='', finished_at=timezone.now())
@@ -1,20 +1,22 @@
 import os
 import json
-import base64
 import logging
 import secrets
 import urllib.parse
 import requests
 
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from django.conf import settings
 from django.core.cache import cache
+from google.auth.exceptions import RefreshError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from .mime import render_raw
+from .tracing import span, increment
+from .user_cache import GMAIL_STATUS, get_or_compute, invalidate
+
 logger = logging.getLogger(__name__)
 
 
@@ -76,6 +78,7 @@ class GmailService:
 
             self._store_user_credentials(user_id, credentials)
             cache.delete(f"gmail_state_{user_id}")
+            invalidate(user_id, GMAIL_STATUS)
             return True
 
         except Exception as e:
@@ -130,38 +133,67 @@ class GmailService:
 
         return creds
 
+    def _build_service(self, creds):
+        """Build a Gmail API client, optionally against GMAIL_API_ENDPOINT (e.g. a local stub)."""
+        api_endpoint = getattr(settings, 'GMAIL_API_ENDPOINT', None)
+        client_options = {'api_endpoint': api_endpoint} if api_endpoint else None
+        return build('gmail', 'v1', credentials=creds, client_options=client_options, cache_discovery=False)
+
     def is_user_authorized(self, user_id):
         """Check if user is authorized."""
         creds = self._get_user_credentials(user_id)
         return creds is not None and creds.valid
 
-    def send_email(self, user_id, to_email, subject, body, from_name=None):
-        """Send email using Gmail API."""
+    def _status_timeout(self):
+        return getattr(settings, 'GMAIL_STATUS_CACHE_TTL', 60)
+
+    def cached_is_authorized(self, user_id):
+        """is_user_authorized(), cached for GMAIL_STATUS_CACHE_TTL seconds or until authorization changes."""
+        return get_or_compute(user_id, GMAIL_STATUS, lambda: self.is_user_authorized(user_id),
+                              key='authorized', timeout=self._status_timeout())
+
+    def cached_status(self, user_id):
+        """Authorization status and Gmail profile, cached like cached_is_authorized()."""
+        authorized = self.cached_is_authorized(user_id)
+        profile = None
+        if authorized:
+            profile = get_or_compute(user_id, GMAIL_STATUS, lambda: self.get_user_profile(user_id),
+                                     key='profile', timeout=self._status_timeout())
+        return {'authorized': authorized, 'profile': profile}
+
+    def send_email(self, user_id, to_email, subject, body, from_name=None, attachment=None):
+        """Send email using Gmail API, optionally with an EncodedAttachment."""
+        raw = render_raw(to_email, subject, body, from_name)
+        if attachment is not None:
+            raw = attachment.attach_to(raw)
+        return self.send_raw(user_id, raw, to_email=to_email)
+
+    def send_raw(self, user_id, raw, to_email=None):
+        """Send a message already rendered to Gmail's base64url `raw` format (see accounts.mime)."""
         try:
             creds = self._get_user_credentials(user_id)
             if not creds:
+                invalidate(user_id, GMAIL_STATUS)
                 raise Exception("User not authorized.")
 
-            service = build('gmail', 'v1', credentials=creds)
-
-            message = MIMEMultipart()
-            message['to'] = to_email
-            message['subject'] = subject
-            if from_name:
-                message['from'] = from_name
-
-            message.attach(MIMEText(body, 'plain'))
-            raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
+            service = self._build_service(creds)
 
-            result = service.users().messages().send(userId='me', body={'raw': raw}).execute()
+            with span('gmail_send'):
+                result = service.users().messages().send(userId='me', body={'raw': raw}).execute()
             logger.info(f"Email sent to {to_email} - ID: {result['id']}")
+            increment('jobreach_emails_sent_total', outcome='success')
             return result
 
         except HttpError as e:
             logger.error(f"Gmail API error: {e}")
+            increment('jobreach_emails_sent_total', outcome='failure')
             raise Exception("Gmail API failed.")
         except Exception as e:
             logger.error(f"Error sending email: {e}")
+            increment('jobreach_emails_sent_total', outcome='failure')
+            if isinstance(e, RefreshError):
+                # The refresh token no longer works; stop reporting the user as authorized
+                invalidate(user_id, GMAIL_STATUS)
             raise
 
     def get_user_profile(self, user_id):
@@ -171,7 +203,7 @@ class GmailService:
             if not creds:
                 return None
 
-            service = build('gmail', 'v1', credentials=creds)
+            service = self._build_service(creds)
             profile = service.users().getProfile(userId='me').execute()
 
             return {
@@ -188,6 +220,7 @@ class GmailService:
         """Revoke Gmail access (delete credentials)."""
         try:
             cache.delete(f"gmail_credentials_{user_id}")
+            invalidate(user_id, GMAIL_STATUS)
             return True
         except Exception as e:
             logger.error(f"Revoke failed: {e}")
@@ -5,6 +5,8 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.http import HttpResponseRedirect
 from django.conf import settings
 from .gmail_service import GmailService
+from .quota import SendQuota
+from .user_cache import GMAIL_STATUS, invalidate
 import logging
 
 logger = logging.getLogger(__name__)
@@ -71,16 +73,12 @@ class GmailAuthStatusView(APIView):
     
     def get(self, request):
         try:
-            gmail_service = GmailService()
-            is_authorized = gmail_service.is_user_authorized(request.user.id)
-            
-            profile = None
-            if is_authorized:
-                profile = gmail_service.get_user_profile(request.user.id)
+            # Cached per user, so dashboard polling doesn't call Google on every request
+            gmail_status = GmailService().cached_status(request.user.id)
             
             return Response({
-                'authorized': is_authorized,
-                'profile': profile
+                'authorized': gmail_status['authorized'],
+                'profile': gmail_status['profile']
             }, status=status.HTTP_200_OK)
             
         except Exception as e:
@@ -109,22 +107,34 @@ class GmailSendEmailView(APIView):
             
             gmail_service = GmailService()
             
-            if not gmail_service.is_user_authorized(request.user.id):
+            if not gmail_service.cached_is_authorized(request.user.id):
                 return Response({
                     'error': 'Gmail not authorized. Please authorize first.'
                 }, status=status.HTTP_401_UNAUTHORIZED)
             
-            result = gmail_service.send_email(
-                user_id=request.user.id,
-                to_email=to_email,
-                subject=subject,
-                body=body,
-                from_name=from_name
-            )
+            quota = SendQuota(request.user)
+            if not quota.reserve(1):
+                return Response({
+                    'error': 'Daily email limit reached. Please try again tomorrow.',
+                    **quota.status()
+                }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+            
+            try:
+                result = gmail_service.send_email(
+                    user_id=request.user.id,
+                    to_email=to_email,
+                    subject=subject,
+                    body=body,
+                    from_name=from_name
+                )
+            except Exception:
+                quota.release(1)
+                raise
             
             return Response({
                 'message': 'Email sent successfully',
-                'message_id': result.get('id')
+                'message_id': result.get('id'),
+                **quota.status()
             }, status=status.HTTP_200_OK)
             
         except Exception as e:
@@ -172,6 +182,7 @@ class MockGmailAuthView(APIView):
                 'email': request.user.email,
                 'authorized': True
             }, timeout=3600*24)  # 1 day
+            invalidate(request.user.id, GMAIL_STATUS)
             
             return Response({
                 'message': 'Mock Gmail authorization successful',
@@ -0,0 +1,135 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from accounts.benchmarks.stats import compare, load_baseline, save_baseline
+from accounts.benchmarks.suites import SUITES, BenchmarkContext
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+                                'benchmarks', 'baseline.json')
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark resume parsing, CSV parsing, email generation and sending "
+        "against a throwaway test database and local fake OpenAI/Gmail servers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--suite', action='append', choices=list(SUITES),
+                            help="Suite to run (repeatable). Defaults to all suites.")
+        parser.add_argument('--iterations', type=int, default=5, help="Samples per benchmark case.")
+        parser.add_argument('--csv-rows', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help="Contact list sizes for the CSV suite (e.g. 1000 500000).")
+        parser.add_argument('--contacts', type=int, default=50, help="Contacts per generation run.")
+        parser.add_argument('--send-batch', type=int, default=50, help="Emails per send request.")
+        parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 8],
+                            help="Parallel client (and worker) counts for the concurrency and "
+                                 "generation_workers suites.")
+        parser.add_argument('--latency-ms', type=float, default=50,
+                            help="Simulated latency of the fake OpenAI and Gmail servers.")
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline JSON to compare against.")
+        parser.add_argument('--save-baseline', action='store_true', help="Write these results as the new baseline.")
+        parser.add_argument('--tolerance', type=float, default=0.10,
+                            help="Allowed fractional slowdown before a case counts as a regression.")
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help="Exit with an error if any case regressed against the baseline.")
+        parser.add_argument('--json', dest='json_output', help="Also write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        suites = options['suite'] or list(SUITES)
+        baseline = load_baseline(options['baseline'])
+        if options['fail_on_regression'] and not options['save_baseline'] and not baseline:
+            # Checked up front so a CI run doesn't benchmark for minutes and then compare with nothing
+            raise CommandError(
+                f"No baseline at {options['baseline']}. Record one on this machine first with "
+                f"'python manage.py benchmark --save-baseline' (same options), or pass --baseline."
+            )
+        workdir = tempfile.mkdtemp(prefix='jobreach-bench-')
+
+        setup_test_environment()
+        if {'concurrency', 'generation_workers'} & set(suites) and connection.vendor == 'sqlite':
+            # Parallel clients need a real file; an in-memory test database has no journal to compare
+            connection.settings_dict['TEST']['NAME'] = os.path.join(workdir, 'benchmark.sqlite3')
+        old_db_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # A private cache, so nothing cached for the throwaway database outlives it
+            with override_settings(MEDIA_ROOT=os.path.join(workdir, 'media'), BACKGROUND_TASKS_ASYNC=False,
+                                   CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+                user = get_user_model().objects.create_user(
+                    username='benchmark', email='benchmark@example.com',
+                    password='benchmark-password', full_name='Benchmark User'
+                )
+                ctx = BenchmarkContext(
+                    user=user,
+                    workdir=workdir,
+                    iterations=options['iterations'],
+                    csv_rows=options['csv_rows'],
+                    contacts=options['contacts'],
+                    latency_ms=options['latency_ms'],
+                    send_batch=options['send_batch'],
+                    clients=options['clients'],
+                    log=self.stdout.write,
+                )
+
+                summaries = {}
+                for name in suites:
+                    self.stdout.write(self.style.MIGRATE_HEADING(f"Suite: {name}"))
+                    for result in SUITES[name](ctx):
+                        summaries[result.name] = result.summary()
+                        self.stdout.write(f"  {result.name}: done")
+        finally:
+            connection.creation.destroy_test_db(old_db_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        regressions = self._report(summaries, baseline, options['tolerance'])
+        if not baseline:
+            self.stdout.write(f"No baseline at {options['baseline']}; record one with --save-baseline.")
+        missing = [name for name in summaries if name not in baseline]
+
+        if options['json_output']:
+            with open(options['json_output'], 'w') as f:
+                json.dump(summaries, f, indent=2, sort_keys=True)
+
+        if options['save_baseline']:
+            os.makedirs(os.path.dirname(os.path.abspath(options['baseline'])), exist_ok=True)
+            save_baseline(options['baseline'], {**baseline, **summaries})
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {options['baseline']}"))
+
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f"{len(regressions)} benchmark case(s) regressed: {', '.join(regressions)}")
+        if missing and options['fail_on_regression'] and not options['save_baseline']:
+            raise CommandError(f"{len(missing)} benchmark case(s) have no baseline to compare with: "
+                               f"{', '.join(missing)}. Record them with --save-baseline.")
+
+    def _report(self, summaries, baseline, tolerance):
+        header = f"{'case':<58} {'throughput':>16} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}  vs baseline"
+        self.stdout.write("")
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+
+        regressions = []
+        for name, summary in summaries.items():
+            comparison = compare(summary, baseline.get(name), tolerance)
+            if comparison['status'] == 'new':
+                delta = "no baseline"
+            else:
+                delta = (f"p50 {comparison['p50_change']:+.1%}, "
+                         f"throughput {comparison['throughput_change']:+.1%}")
+                if comparison['status'] == 'regressed':
+                    regressions.append(name)
+                    delta = self.style.ERROR(delta + " REGRESSED")
+
+            throughput = f"{summary['throughput']:.1f} {summary['unit']}/s"
+            self.stdout.write(
+                f"{name:<58} {throughput:>16} {summary['p50_ms']:>10.2f} "
+                f"{summary['p95_ms']:>10.2f} {summary['p99_ms']:>10.2f}  {delta}"
+            )
+        return regressions
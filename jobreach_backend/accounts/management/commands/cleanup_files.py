@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from accounts.cleanup import (
+    expire_upload_sessions, purge_send_requests, release_unreferenced_blobs, sweep_orphan_files,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove expired chunked uploads and send results, blobs nothing references any more, "
+        "and files in the upload directories that no row points to. Safe to run from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age-hours', type=float, default=1,
+                            help="Leave files and blobs younger than this alone; they may belong to "
+                                 "an upload in progress (default: 1).")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be removed without removing it.")
+
+    def handle(self, *args, **options):
+        min_age = timedelta(hours=options['min_age_hours'])
+        dry_run = options['dry_run']
+        verb = "Would remove" if dry_run else "Removed"
+
+        # Sessions and blobs first, so the sweep sees their files as unreferenced
+        counts = [
+            ("expired chunked uploads", expire_upload_sessions(dry_run=dry_run)),
+            ("expired send results", purge_send_requests(dry_run=dry_run)),
+            ("unreferenced blobs", release_unreferenced_blobs(min_age, dry_run=dry_run)),
+            ("orphaned files", sweep_orphan_files(min_age, dry_run=dry_run)),
+        ]
+        for label, count in counts:
+            self.stdout.write(f"{verb} {count} {label}")
@@ -0,0 +1,90 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from accounts.generation_runs import GenerationWorker
+from accounts.tracing import registry
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the emails of queued generation runs, leasing contacts in batches. "
+        "Run as many workers on as many machines as the database and the LLM rate limit allow."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=None,
+                            help="Worker processes to run on this machine (default: GENERATION_WORKER_PROCESSES).")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Contacts leased per claim (default: GENERATION_WORKER_BATCH_SIZE).")
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help="Seconds to sleep when there was nothing to do (default: GENERATION_WORKER_POLL_SECONDS).")
+        parser.add_argument('--once', action='store_true', help="Process one batch per process and exit.")
+
+    def handle(self, *args, **options):
+        from django.conf import settings
+
+        processes = options['processes'] or getattr(settings, 'GENERATION_WORKER_PROCESSES', 1)
+        if options['poll_interval'] is None:
+            options['poll_interval'] = getattr(settings, 'GENERATION_WORKER_POLL_SECONDS', 2)
+
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        if processes == 1:
+            self._work(options)
+            return
+
+        # Forked children must not share the parent's database connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        children = [context.Process(target=self._work, args=(options,), name=f'generation-worker-{n}')
+                    for n in range(processes)]
+        for child in children:
+            child.start()
+        self.stdout.write(f"Started {processes} generation worker processes")
+
+        terminated = False
+        while any(child.is_alive() for child in children):
+            if self._stopping and not terminated:
+                for child in children:
+                    child.terminate()  # SIGTERM: each finishes its batch and stops
+                terminated = True
+            for child in children:
+                child.join(0.5)
+
+    def _work(self, options):
+        worker = GenerationWorker(batch_size=options['batch_size'])
+        self.stdout.write(f"Generation worker {worker.owner} started (batch size {worker.batch_size})")
+
+        while not self._stopping:
+            close_old_connections()
+            try:
+                processed = worker.run_once()
+            except Exception as e:
+                self.stderr.write(f"Generation worker error: {e}")
+                processed = 0
+            if processed:
+                self.stdout.write(f"{worker.owner}: generated {processed} emails")
+            registry.flush()  # Picked up by /metrics when METRICS_DIR is set
+            if options['once']:
+                break
+            if not processed:
+                self._sleep(options['poll_interval'])
+
+        registry.flush(force=True)
+        connections.close_all()
+        self.stdout.write(f"Generation worker {worker.owner} stopped")
+
+    def _stop(self, signum, frame):
+        self._stopping = True
+
+    def _sleep(self, seconds):
+        # Sleep in short steps so a stop signal is honoured promptly
+        deadline = time.monotonic() + seconds
+        while not self._stopping and time.monotonic() < deadline:
+            time.sleep(min(0.5, deadline - time.monotonic()))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import Resume
+from accounts.skills import extract_skill_profile
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-extract the skill profile of every parsed resume from its stored text. "
+        "Run after changing SKILLS_TAXONOMY."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Resumes updated per query (default: 500).")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        resumes = Resume.objects.filter(parse_status=Resume.PARSE_READY).only('id', 'extracted_text').order_by('id')
+
+        batch, rebuilt = [], 0
+        for resume in resumes.iterator(chunk_size=batch_size):
+            resume.skills = extract_skill_profile(resume.extracted_text)
+            batch.append(resume)
+            if len(batch) >= batch_size:
+                rebuilt += Resume.objects.bulk_update(batch, ['skills'])
+                batch = []
+        rebuilt += Resume.objects.bulk_update(batch, ['skills'])
+        self.stdout.write(f"Rebuilt the skill profiles of {rebuilt} resumes")
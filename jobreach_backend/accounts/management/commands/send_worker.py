@@ -0,0 +1,61 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from accounts.sending import SendScheduler
+from accounts.tracing import registry
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the scheduled send queue: deliver queued emails as their send times come up, "
+        "paced per user and per recipient domain. Safe to run several workers at once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help="Seconds to sleep when nothing was sent (default: SEND_WORKER_POLL_SECONDS).")
+        parser.add_argument('--once', action='store_true', help="Process the queue once and exit.")
+
+    def handle(self, *args, **options):
+        from django.conf import settings
+
+        poll_interval = options['poll_interval']
+        if poll_interval is None:
+            poll_interval = getattr(settings, 'SEND_WORKER_POLL_SECONDS', 5)
+
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        scheduler = SendScheduler()
+        self.stdout.write(f"Send worker started (poll interval {poll_interval:g}s)")
+
+        while not self._stopping:
+            close_old_connections()
+            try:
+                sent = scheduler.run_once()
+            except Exception as e:
+                self.stderr.write(f"Send worker error: {e}")
+                sent = 0
+            if sent:
+                self.stdout.write(f"Sent {sent} scheduled emails")
+            registry.flush()  # Picked up by /metrics when METRICS_DIR is set
+            if options['once']:
+                break
+            if not sent:
+                self._sleep(poll_interval)
+
+        registry.flush(force=True)
+        self.stdout.write("Send worker stopped")
+
+    def _stop(self, signum, frame):
+        self._stopping = True
+
+    def _sleep(self, seconds):
+        # Sleep in short steps so a stop signal is honoured promptly
+        deadline = time.monotonic() + seconds
+        while not self._stopping and time.monotonic() < deadline:
+            time.sleep(min(0.5, deadline - time.monotonic()))
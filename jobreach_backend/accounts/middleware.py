@@ -0,0 +1,135 @@
+import cProfile
+import logging
+import os
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class _QueryRecorder:
+    """DB execute wrapper that records every query's SQL, parameters and duration."""
+
+    def __init__(self):
+        self.queries = []  # (sql, params, seconds)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, params, time.perf_counter() - start))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        return sum(duration for _, _, duration in self.queries)
+
+    def duplicates(self):
+        """Identical queries (same SQL and parameters) run more than once."""
+        counts = Counter((sql, repr(params)) for sql, params, _ in self.queries)
+        return {sql: count for (sql, _), count in counts.items() if count > 1}
+
+    def similar(self):
+        """Same SQL with different parameters run more than once: the usual N+1 signature."""
+        counts = Counter(sql for sql, _, _ in self.queries)
+        return {sql: count for sql, count in counts.items() if count > 1}
+
+
+class QueryProfilingMiddleware:
+    """
+    Record SQL query count and time, duplicate queries and view time per request.
+
+    Enabled for every request with PROFILING_ENABLED, or per request with an
+    "X-Profile: 1" header when PROFILING_ALLOW_HEADER is on. Slow requests are
+    logged, and a sample of profiled requests can be dumped as cProfile stats.
+    """
+
+    HEADER = 'X-Profile'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _should_profile(self, request):
+        if getattr(settings, 'PROFILING_ENABLED', False):
+            return True
+        return (
+            getattr(settings, 'PROFILING_ALLOW_HEADER', False)
+            and request.headers.get(self.HEADER) == '1'
+        )
+
+    def _should_dump(self):
+        return (
+            getattr(settings, 'PROFILING_CPROFILE_DIR', '')
+            and random.random() < getattr(settings, 'PROFILING_CPROFILE_SAMPLE_RATE', 0.0)
+        )
+
+    def __call__(self, request):
+        if not self._should_profile(request):
+            return self.get_response(request)
+
+        recorder = _QueryRecorder()
+        profiler = cProfile.Profile() if self._should_dump() else None
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+
+            start = time.perf_counter()
+            if profiler:
+                profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler:
+                    profiler.disable()
+            view_time = time.perf_counter() - start
+
+        # Executions beyond the first of each identical query
+        duplicate_count = sum(count - 1 for count in recorder.duplicates().values())
+
+        response['X-Query-Count'] = str(recorder.count)
+        response['X-Query-Time-Ms'] = f"{recorder.total_time * 1000:.1f}"
+        response['X-Duplicate-Queries'] = str(duplicate_count)
+        response['X-View-Time-Ms'] = f"{view_time * 1000:.1f}"
+
+        self._log(request, response, recorder, view_time, duplicate_count)
+        if profiler:
+            self._dump(request, profiler)
+
+        return response
+
+    def _log(self, request, response, recorder, view_time, duplicate_count):
+        summary = (
+            f"{request.method} {request.path} -> {response.status_code}: "
+            f"{view_time * 1000:.1f}ms, {recorder.count} queries "
+            f"({recorder.total_time * 1000:.1f}ms), {duplicate_count} duplicates"
+        )
+
+        slow_ms = getattr(settings, 'PROFILING_SLOW_REQUEST_MS', 500)
+        if view_time * 1000 >= slow_ms:
+            logger.warning(f"Slow request {summary}")
+        else:
+            logger.info(summary)
+
+        repeat_threshold = getattr(settings, 'PROFILING_REPEATED_QUERY_THRESHOLD', 5)
+        for sql, count in sorted(recorder.similar().items(), key=lambda item: -item[1]):
+            if count >= repeat_threshold:
+                logger.warning(f"Query repeated {count}x in {request.method} {request.path}: {sql[:300]}")
+
+    def _dump(self, request, profiler):
+        directory = settings.PROFILING_CPROFILE_DIR
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', request.path).strip('_') or 'root'
+        path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}_{request.method}_{slug}_{os.getpid()}.prof")
+        profiler.dump_stats(path)
+        logger.info(f"cProfile stats written to {path}")
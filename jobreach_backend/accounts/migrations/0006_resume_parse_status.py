@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-19 12:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_generatedemail_is_authorized_generatedemail_is_sent_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='extracted_text',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='parse_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='parse_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='skills',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
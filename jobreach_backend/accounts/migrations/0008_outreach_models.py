@@ -0,0 +1,79 @@
+# Generated by Django 5.2.3 on 2026-10-19 12:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_resume_parse_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('template_type', models.CharField(choices=[('software', 'Software Development'), ('marketing', 'Marketing'), ('sales', 'Sales'), ('design', 'Design'), ('general', 'General')], max_length=20)),
+                ('subject_template', models.CharField(max_length=255)),
+                ('body_template', models.TextField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HRContact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('email', models.EmailField(max_length=254)),
+                ('company', models.CharField(max_length=255)),
+                ('position', models.CharField(blank=True, max_length=255)),
+                ('linkedin_url', models.URLField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hr_contacts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'email')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ColdEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255)),
+                ('body', models.TextField()),
+                ('status', models.CharField(choices=[('draft', 'Draft'), ('pending_approval', 'Pending Approval'), ('approved', 'Approved'), ('sent', 'Sent'), ('failed', 'Failed'), ('deleted', 'Deleted')], default='draft', max_length=20)),
+                ('ai_generated', models.BooleanField(default=False)),
+                ('generation_prompt', models.TextField(blank=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('gmail_message_id', models.CharField(blank=True, max_length=255)),
+                ('opened', models.BooleanField(default=False)),
+                ('replied', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cold_emails', to=settings.AUTH_USER_MODEL)),
+                ('template', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='accounts.emailtemplate')),
+                ('hr_contact', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.hrcontact')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resume_file', models.FileField(blank=True, null=True, upload_to='resumes/')),
+                ('hr_contacts_file', models.FileField(blank=True, null=True, upload_to='hr_contacts/')),
+                ('daily_email_limit', models.IntegerField(default=50)),
+                ('emails_sent_today', models.IntegerField(default=0)),
+                ('last_email_date', models.DateField(blank=True, null=True)),
+                ('gmail_refresh_token', models.TextField(blank=True, null=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='profile', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,57 @@
+from django.db import migrations, models
+
+
+def booleans_to_status(apps, schema_editor):
+    """Derive the status column from the old boolean flags, most advanced state first."""
+    GeneratedEmail = apps.get_model('accounts', 'GeneratedEmail')
+    GeneratedEmail.objects.filter(is_sent=True).update(status='sent')
+    GeneratedEmail.objects.filter(is_sent=False, is_authorized=True).update(status='authorized')
+    GeneratedEmail.objects.filter(is_sent=False, is_authorized=False, is_verified=True).update(status='verified')
+
+
+def status_to_booleans(apps, schema_editor):
+    GeneratedEmail = apps.get_model('accounts', 'GeneratedEmail')
+    GeneratedEmail.objects.exclude(status='draft').update(is_verified=True)
+    GeneratedEmail.objects.filter(status__in=['authorized', 'sending', 'sent', 'failed']).update(is_authorized=True)
+    GeneratedEmail.objects.filter(status='sent').update(is_sent=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_outreach_models'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generatedemail',
+            name='status',
+            field=models.CharField(choices=[('draft', 'Draft'), ('verified', 'Verified'), ('authorized', 'Authorized'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='draft', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='generatedemail',
+            name='send_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(booleans_to_status, status_to_booleans),
+        migrations.RemoveField(
+            model_name='generatedemail',
+            name='is_authorized',
+        ),
+        migrations.RemoveField(
+            model_name='generatedemail',
+            name='is_sent',
+        ),
+        migrations.RemoveField(
+            model_name='generatedemail',
+            name='is_verified',
+        ),
+        migrations.AddIndex(
+            model_name='generatedemail',
+            index=models.Index(fields=['user', 'status'], name='generatedemail_user_status'),
+        ),
+        migrations.AddIndex(
+            model_name='generatedemail',
+            index=models.Index(fields=['status', 'generated_at'], name='generatedemail_status_queue'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:03
+
+from django.db import migrations, models
+
+
+def fill_recipient_domains(apps, schema_editor):
+    GeneratedEmail = apps.get_model('accounts', 'GeneratedEmail')
+    batch = []
+    for email in GeneratedEmail.objects.only('id', 'recipient_email').iterator():
+        email.recipient_domain = email.recipient_email.rpartition('@')[2].strip().lower()
+        batch.append(email)
+        if len(batch) >= 1000:
+            GeneratedEmail.objects.bulk_update(batch, ['recipient_domain'])
+            batch = []
+    GeneratedEmail.objects.bulk_update(batch, ['recipient_domain'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_send_claims'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generatedemail',
+            name='recipient_domain',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='generatedemail',
+            name='scheduled_for',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_recipient_domains, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='generatedemail',
+            index=models.Index(fields=['status', 'scheduled_for'], name='generatedemail_send_queue'),
+        ),
+        migrations.AddIndex(
+            model_name='generatedemail',
+            index=models.Index(fields=['user', 'sent_at'], name='generatedemail_user_sent_at'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_send_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generatedemail',
+            name='address_check',
+            field=models.CharField(blank=True, choices=[('valid', 'Valid'), ('invalid_syntax', 'Invalid syntax'), ('disposable', 'Disposable domain'), ('no_mx', 'No mail server'), ('unknown', 'Unknown')], default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='generatedemail',
+            name='address_checked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_address_check'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generatedemail',
+            name='rendered_message',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
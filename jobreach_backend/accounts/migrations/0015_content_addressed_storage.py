@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:32
+
+import accounts.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_upload_session'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('size', models.BigIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='contactlist',
+            name='file',
+            field=models.FileField(storage=accounts.storage.upload_storage, upload_to='csv_files/'),
+        ),
+        migrations.AlterField(
+            model_name='resume',
+            name='file',
+            field=models.FileField(storage=accounts.storage.upload_storage, upload_to='resumes/'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_generation_runs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationrun',
+            name='checkpoint_row',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='generationrun',
+            name='failed_contacts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='generationrun',
+            name='inline',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='generationrun',
+            name='lease_token',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='generationrun',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='generationrun',
+            name='processed_contacts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='generationrun',
+            constraint=models.UniqueConstraint(condition=models.Q(('inline', True), ('status', 'running')), fields=('user', 'resume', 'contact_list'), name='generationrun_one_running_inline'),
+        ),
+    ]
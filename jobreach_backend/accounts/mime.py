@@ -0,0 +1,106 @@
+import base64
+import hashlib
+import mmap
+import os
+from email.message import EmailMessage
+from email.policy import SMTP
+from email.utils import encode_rfc2231
+
+CRLF = b'\r\n'
+
+
+def render_message(to_email, subject, body, from_name=None):
+    """
+    RFC 5322 bytes for a plain-text email: one text/plain part, no multipart
+    wrapper. Headers are RFC 2047-encoded where needed, and the body uses
+    7bit, quoted-printable or base64, whichever is most compact.
+    """
+    message = EmailMessage(policy=SMTP)
+    message['To'] = to_email
+    message['Subject'] = subject
+    if from_name:
+        message['From'] = from_name  # Gmail fills in the sending address
+    message.set_content(body)
+    return message.as_bytes()
+
+
+def encode_raw(message):
+    """The base64url form of a message that the Gmail API takes as `raw`."""
+    return base64.urlsafe_b64encode(message).decode('ascii')
+
+
+def render_raw(to_email, subject, body, from_name=None):
+    return encode_raw(render_message(to_email, subject, body, from_name))
+
+
+def _quoted_param(name, value):
+    try:
+        value.encode('ascii')
+    except UnicodeEncodeError:
+        return f"{name}*={encode_rfc2231(value, 'utf-8')}"
+    return f'{name}="{value.replace(chr(92), "").replace(chr(34), "")}"'
+
+
+class EncodedAttachment:
+    """
+    An attachment encoded once and shared by every message it is added to.
+
+    The MIME part (headers, base64 body and closing boundary) is stored already
+    in the base64url form the Gmail API takes, so adding it to a message only
+    encodes that message's own headers and text. The message part is padded to
+    a multiple of 3 bytes, so the two base64 encodings concatenate cleanly.
+    """
+
+    def __init__(self, content, filename, content_type='application/octet-stream'):
+        self.filename = filename
+        self.content_type = content_type
+        self.size = len(content)
+        # Derived from the content: base64 and the headers below can't contain it
+        self.boundary = f"=_jobreach_{hashlib.sha256(content).hexdigest()[:32]}".encode('ascii')
+
+        headers = (
+            f"Content-Type: {content_type}; {_quoted_param('name', filename)}\r\n"
+            f"Content-Disposition: attachment; {_quoted_param('filename', filename)}\r\n"
+            "Content-Transfer-Encoding: base64\r\n\r\n"
+        ).encode('ascii')
+        part = b''.join([
+            headers,
+            base64.encodebytes(content).replace(b'\n', CRLF),  # 76-character lines, as MIME requires
+            b'--', self.boundary, b'--', CRLF,
+        ])
+        self.encoded = encode_raw(part)
+
+    @classmethod
+    def from_file(cls, path, filename=None, content_type='application/octet-stream'):
+        """Encode a file through a read-only memory map instead of reading it into memory first."""
+        filename = filename or os.path.basename(path)
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return cls(b'', filename, content_type)  # Empty files can't be mapped
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                return cls(content, filename, content_type)
+
+    def attach_to(self, raw):
+        """Return `raw` (a base64url message from render_raw) as multipart/mixed with this attachment."""
+        head, _, body = base64.urlsafe_b64decode(raw).partition(CRLF + CRLF)
+
+        # Content-* headers move to the text part; the rest stay on the message
+        message_headers, part_headers = [], []
+        target = message_headers
+        for line in head.split(CRLF):
+            if line[:1] not in (b' ', b'\t'):  # A new header rather than a folded continuation
+                target = part_headers if line.lower().startswith(b'content-') else message_headers
+            target.append(line)
+
+        boundary = b'--' + self.boundary
+        prefix = b''.join([
+            CRLF.join(message_headers), CRLF,
+            b'Content-Type: multipart/mixed; boundary="', self.boundary, b'"', CRLF, CRLF,
+            boundary, CRLF,
+            CRLF.join(part_headers), CRLF, CRLF,
+            body, CRLF,
+            boundary,
+        ])
+        # Transport padding (whitespace after a boundary) is allowed by RFC 2046
+        padding = b' ' * (-(len(prefix) + len(CRLF)) % 3)
+        return encode_raw(prefix + padding + CRLF) + self.encoded
@@ -1,5 +1,13 @@
+import uuid
+from contextlib import nullcontext
+from datetime import timedelta
+
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.utils import timezone
+
+from .email_verification import ADDRESS_CHECK_CHOICES
+from .storage import upload_storage
 
 class CustomUser(AbstractUser):
     full_name = models.CharField(max_length=255, blank=True, null=True)
@@ -9,18 +17,35 @@ class CustomUser(AbstractUser):
 
 
 class Resume(models.Model):
+    PARSE_PENDING = 'pending'
+    PARSE_PROCESSING = 'processing'
+    PARSE_READY = 'ready'
+    PARSE_FAILED = 'failed'
+    PARSE_STATUS_CHOICES = [
+        (PARSE_PENDING, 'Pending'),
+        (PARSE_PROCESSING, 'Processing'),
+        (PARSE_READY, 'Ready'),
+        (PARSE_FAILED, 'Failed'),
+    ]
+
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
-    file = models.FileField(upload_to='resumes/')
+    file = models.FileField(upload_to='resumes/', storage=upload_storage)
     original_filename = models.CharField(max_length=255)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
+    # Text extraction results, filled in by the background parse task
+    parse_status = models.CharField(max_length=20, choices=PARSE_STATUS_CHOICES, default=PARSE_PENDING)
+    parse_error = models.TextField(blank=True, default='')
+    extracted_text = models.TextField(blank=True, default='')
+    skills = models.JSONField(default=list, blank=True)
+    
     def __str__(self):
         return f"{self.user.username} - {self.original_filename}"
 
 
 class ContactList(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
-    file = models.FileField(upload_to='csv_files/')
+    file = models.FileField(upload_to='csv_files/', storage=upload_storage)
     original_filename = models.CharField(max_length=255)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     is_validated = models.BooleanField(default=False)
@@ -30,26 +55,453 @@ class ContactList(models.Model):
         return f"{self.user.username} - {self.original_filename}"
 
 
+class FileBlob(models.Model):
+    """A file in content-addressed storage and how many uploads currently refer to it."""
+    name = models.CharField(max_length=255, unique=True)  # Storage name, derived from the hash
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} references)"
+
+
+class UploadSession(models.Model):
+    """A chunked upload in progress: chunks are appended to a temporary file until the client completes it."""
+    KIND_RESUME = 'resume'
+    KIND_CONTACT_LIST = 'contact_list'
+    KIND_CHOICES = [
+        (KIND_RESUME, 'Resume'),
+        (KIND_CONTACT_LIST, 'Contact list'),
+    ]
+
+    STATUS_OPEN = 'open'
+    STATUS_COMPLETING = 'completing'
+    STATUS_COMPLETE = 'complete'
+    STATUS_CHOICES = [
+        (STATUS_OPEN, 'Open'),
+        (STATUS_COMPLETING, 'Completing'),
+        (STATUS_COMPLETE, 'Complete'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    received_size = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True, default='')  # Expected digest, checked on completion
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_OPEN)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # What the completed upload created, so a retried completion returns it again
+    resume = models.ForeignKey(Resume, on_delete=models.SET_NULL, null=True, blank=True)
+    contact_list = models.ForeignKey(ContactList, on_delete=models.SET_NULL, null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.filename} ({self.received_size}/{self.total_size})"
+
+
+class InvalidTransition(ValueError):
+    """Raised when an email is moved to a status its current status can't reach."""
+
+
+class GeneratedEmailQuerySet(models.QuerySet):
+    CLAIM_ATTEMPTS = 5
+
+    def with_status(self, *statuses):
+        return self.filter(status__in=statuses)
+
+    # Filters accepted by apply_filters(), as used by the bulk and export endpoints
+    FILTER_FIELDS = {
+        'status': 'status__in',
+        'resume_id': 'resume_id',
+        'contact_list_id': 'contact_list_id',
+        'recipient_domain': 'recipient_domain__iexact',
+        'recipient_company': 'recipient_company__iexact',
+        'generated_after': 'generated_at__gte',
+        'generated_before': 'generated_at__lt',
+    }
+
+    def apply_filters(self, filters):
+        """Narrow the queryset by a dict of FILTER_FIELDS; raises ValueError on unknown filters."""
+        unknown = set(filters) - set(self.FILTER_FIELDS)
+        if unknown:
+            raise ValueError(f"Unsupported filters: {', '.join(sorted(unknown))}")
+        lookups = {}
+        for name, value in filters.items():
+            if name == 'status':
+                value = [value] if isinstance(value, str) else list(value)
+                invalid = set(value) - set(GeneratedEmail.TRANSITIONS)
+                if invalid:
+                    raise ValueError(f"Unknown status: {', '.join(sorted(invalid))}")
+            lookups[self.FILTER_FIELDS[name]] = value
+        return self.filter(**lookups)
+
+    def transition(self, target, from_statuses=None, **extra):
+        """
+        Move every email in the queryset that may legally reach `target` to it,
+        as a single UPDATE. Emails in any other status are left untouched.
+        `from_statuses` narrows the allowed sources further.
+        Returns the number of emails updated.
+        """
+        sources = GeneratedEmail.sources_for(target)
+        if from_statuses is not None:
+            sources = [source for source in sources if source in from_statuses]
+        if not sources:
+            raise InvalidTransition(f"No allowed status can transition to '{target}'")
+        return self.filter(status__in=sources).update(status=target, **extra)
+
+    def claim(self, limit=None, token=None):
+        """
+        Atomically move sendable emails in the queryset to 'sending' and return
+        the ones this caller now owns, tagged with a fresh claim token.
+
+        Uses SELECT ... FOR UPDATE SKIP LOCKED where the database supports it, so
+        concurrent claimers split the rows between them instead of blocking;
+        elsewhere (SQLite) a conditional UPDATE decides ownership. Either way an
+        email is claimed by at most one caller, however many run in parallel.
+        """
+        token = token or uuid.uuid4().hex
+        candidates = self.filter(status__in=GeneratedEmail.SENDABLE_STATUSES).order_by('id')
+        db = router.db_for_write(GeneratedEmail)
+
+        skip_locked = connections[db].features.has_select_for_update_skip_locked
+        if skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+
+        for _ in range(self.CLAIM_ATTEMPTS):
+            # Row locks need a transaction. Without them, autocommit statements avoid
+            # SQLite failing to upgrade a read lock to a write lock under contention.
+            with transaction.atomic(using=db) if skip_locked else nullcontext():
+                ids = list((candidates[:limit] if limit else candidates).values_list('id', flat=True))
+                if not ids:
+                    return []
+                # Re-checking the status in the UPDATE is what makes the SQLite path safe
+                claimed = GeneratedEmail.objects.using(db).filter(
+                    id__in=ids, status__in=GeneratedEmail.SENDABLE_STATUSES
+                ).update(status=GeneratedEmail.STATUS_SENDING, claim_token=token, claimed_at=timezone.now())
+            if claimed:
+                break
+            # Every row we saw was claimed concurrently between the SELECT and UPDATE; look again
+
+        return list(GeneratedEmail.objects.using(db).filter(id__in=ids, claim_token=token).order_by('id'))
+
+    def stale_claims(self, older_than=None):
+        """Emails stuck in 'sending' for longer than SEND_CLAIM_TIMEOUT: their sender crashed or timed out."""
+        from django.conf import settings
+
+        if older_than is None:
+            older_than = timedelta(seconds=getattr(settings, 'SEND_CLAIM_TIMEOUT', 600))
+        return self.filter(status=GeneratedEmail.STATUS_SENDING, claimed_at__lt=timezone.now() - older_than)
+
+    def release_stale_claims(self, older_than=None):
+        """
+        Mark emails stuck in 'sending' as failed, so they can be retried
+        deliberately rather than sent twice by accident.
+        """
+        return self.stale_claims(older_than).transition(
+            GeneratedEmail.STATUS_FAILED, send_error="Send was interrupted; it may or may not have been delivered"
+        )
+
+
 class GeneratedEmail(models.Model):
+    STATUS_DRAFT = 'draft'
+    STATUS_VERIFIED = 'verified'
+    STATUS_AUTHORIZED = 'authorized'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_DRAFT, 'Draft'),
+        (STATUS_VERIFIED, 'Verified'),
+        (STATUS_AUTHORIZED, 'Authorized'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    # Allowed transitions: status -> statuses it may move to.
+    # Verified emails may be sent without a separate authorize step, and failed sends may be retried.
+    # authorized -> verified is the bulk "revoke" action only; verifying never demotes an email.
+    TRANSITIONS = {
+        STATUS_DRAFT: {STATUS_VERIFIED},
+        STATUS_VERIFIED: {STATUS_DRAFT, STATUS_AUTHORIZED, STATUS_SENDING},
+        STATUS_AUTHORIZED: {STATUS_VERIFIED, STATUS_SENDING},
+        STATUS_SENDING: {STATUS_SENT, STATUS_FAILED},
+        STATUS_SENT: set(),
+        STATUS_FAILED: {STATUS_SENDING},
+    }
+    SENDABLE_STATUSES = (STATUS_VERIFIED, STATUS_AUTHORIZED, STATUS_FAILED)
+    # Statuses behind the legacy boolean flags (is_verified, ...)
+    VERIFIED_STATUSES = frozenset({STATUS_VERIFIED, STATUS_AUTHORIZED, STATUS_SENDING, STATUS_SENT, STATUS_FAILED})
+    AUTHORIZED_STATUSES = frozenset({STATUS_AUTHORIZED, STATUS_SENDING, STATUS_SENT, STATUS_FAILED})
+    # Fields the pre-rendered message is built from; saving any of them discards it
+    MESSAGE_FIELDS = ('recipient_email', 'email_subject', 'email_body')
+
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     resume = models.ForeignKey(Resume, on_delete=models.CASCADE)
     contact_list = models.ForeignKey(ContactList, on_delete=models.CASCADE)
     recipient_name = models.CharField(max_length=255)
     recipient_email = models.EmailField()
+    # Lower-cased domain of recipient_email, kept in sync on save; the send queue paces deliveries per domain
+    recipient_domain = models.CharField(max_length=255, blank=True, default='')
     recipient_company = models.CharField(max_length=255, blank=True, null=True)
     recipient_position = models.CharField(max_length=255, blank=True, null=True)
     email_subject = models.CharField(max_length=255)
     email_body = models.TextField()
     generated_at = models.DateTimeField(auto_now_add=True)
     
-    # Status fields
-    is_verified = models.BooleanField(default=False)
-    is_authorized = models.BooleanField(default=False)
-    is_sent = models.BooleanField(default=False)
+    # Lifecycle state; change it through transition_to() / GeneratedEmail.objects.transition()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_DRAFT)
     sent_at = models.DateTimeField(null=True, blank=True)
+    send_error = models.TextField(blank=True, default='')
+    
+    # Set when a sender claims the email; only the claim holder may mark it sent or failed
+    claim_token = models.CharField(max_length=32, blank=True, default='')
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    
+    # Outcome of the last recipient address check (syntax, disposable domain, mail server)
+    address_check = models.CharField(max_length=20, choices=ADDRESS_CHECK_CHOICES, blank=True, default='')
+    address_checked_at = models.DateTimeField(null=True, blank=True)
+    
+    # Set when an authorized email is queued for the send worker; it goes out at or after this time
+    scheduled_for = models.DateTimeField(null=True, blank=True)
+    
+    # Ready-to-send message (Gmail `raw` format) rendered when the email is authorized
+    rendered_message = models.TextField(blank=True, default='')
+    
+    objects = GeneratedEmailQuerySet.as_manager()
     
     class Meta:
         unique_together = ['user', 'resume', 'contact_list', 'recipient_email']
+        indexes = [
+            models.Index(fields=['user', 'status'], name='generatedemail_user_status'),
+            models.Index(fields=['status', 'generated_at'], name='generatedemail_status_queue'),
+            models.Index(fields=['status', 'scheduled_for'], name='generatedemail_send_queue'),
+            models.Index(fields=['user', 'sent_at'], name='generatedemail_user_sent_at'),
+        ]
     
     def __str__(self):
         return f"Email to {self.recipient_name} ({self.recipient_email})"
+
+    def save(self, *args, **kwargs):
+        self.recipient_domain = self.domain_of(self.recipient_email)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.rendered_message = ''
+        else:
+            derived = set()
+            if 'recipient_email' in update_fields:
+                derived.add('recipient_domain')
+            if any(field in update_fields for field in self.MESSAGE_FIELDS):
+                self.rendered_message = ''
+                derived.add('rendered_message')
+            if derived:
+                kwargs['update_fields'] = {*update_fields, *derived}
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def domain_of(email):
+        return email.rpartition('@')[2].strip().lower() if email else ''
+
+    @classmethod
+    def sources_for(cls, target):
+        """Statuses that may transition to `target`."""
+        return [source for source, targets in cls.TRANSITIONS.items() if target in targets]
+
+    def can_transition_to(self, target):
+        return target in self.TRANSITIONS.get(self.status, ())
+
+    def transition_to(self, target, save=True, **extra):
+        """Move this email to `target`, raising InvalidTransition if that isn't allowed."""
+        if not self.can_transition_to(target):
+            raise InvalidTransition(f"Cannot move email from '{self.status}' to '{target}'")
+        self.status = target
+        for field, value in extra.items():
+            setattr(self, field, value)
+        if save:
+            self.save(update_fields=['status', *extra])
+
+    # Read-only views of the status for code written against the old boolean fields
+    @property
+    def is_verified(self):
+        return self.status in self.VERIFIED_STATUSES
+
+    @property
+    def is_authorized(self):
+        return self.status in self.AUTHORIZED_STATUSES
+
+    @property
+    def is_sent(self):
+        return self.status == self.STATUS_SENT
+
+
+class SendRequest(models.Model):
+    """The stored result of an email send request, replayed when a client retries with the same idempotency key."""
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    idempotency_key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)  # EmailSendSerializer.fingerprint() of the request body
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)  # Null while the request is in progress
+    response = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['user', 'idempotency_key']
+
+    def __str__(self):
+        return f"{self.user.username} - {self.idempotency_key}"
+
+    @property
+    def is_complete(self):
+        return self.status_code is not None
+
+
+class GenerationRun(models.Model):
+    """
+    Email generation for a whole contact list. Runs carried out by generation
+    workers have a GenerationTask per contact that workers claim in batches.
+    Inline runs are generated by the request itself and checkpointed after
+    every contact, so a retried request carries on where the last one stopped.
+    """
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETE = 'complete'
+    STATUS_FAILED = 'failed'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETE, 'Complete'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_CANCELLED, 'Cancelled'),
+    ]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    resume = models.ForeignKey(Resume, on_delete=models.CASCADE)
+    contact_list = models.ForeignKey(ContactList, on_delete=models.CASCADE)
+    generation_mode = models.CharField(max_length=20)
+    template = models.ForeignKey('accounts.EmailTemplate', on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+    error = models.TextField(blank=True, default='')  # Why the run failed, when it did
+    total_contacts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # Inline runs only: the CSV row of the last contact whose email is saved, and the request
+    # working on the run (lease_token), which holds it until lease_expires_at unless it checkpoints again
+    inline = models.BooleanField(default=False)
+    checkpoint_row = models.PositiveIntegerField(default=0)
+    processed_contacts = models.PositiveIntegerField(default=0)
+    failed_contacts = models.PositiveIntegerField(default=0)
+    lease_token = models.CharField(max_length=32, blank=True, default='')
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Two requests starting the same list at once can't both create (and pay for) a run
+            models.UniqueConstraint(
+                fields=['user', 'resume', 'contact_list'],
+                condition=models.Q(inline=True, status='running'),
+                name='generationrun_one_running_inline',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - run {self.id} ({self.status})"
+
+
+class GenerationTaskQuerySet(models.QuerySet):
+    CLAIM_ATTEMPTS = 5
+
+    def claimable(self, now=None):
+        """Tasks nobody is working on: never claimed, or whose lease ran out (the worker died or stalled)."""
+        now = now or timezone.now()
+        return self.filter(
+            models.Q(status=GenerationTask.STATUS_PENDING) |
+            models.Q(status=GenerationTask.STATUS_LEASED, lease_expires_at__lt=now)
+        )
+
+    def claim(self, owner, limit, lease, max_attempts=None):
+        """
+        Lease up to `limit` claimable tasks in the queryset to `owner` for
+        `lease` (a timedelta) and return them. Same approach as
+        GeneratedEmailQuerySet.claim(): SKIP LOCKED where supported, a
+        conditional UPDATE elsewhere, so each task has one owner at a time
+        however many workers claim at once.
+        """
+        now = timezone.now()
+        candidates = self.claimable(now)
+        if max_attempts:
+            candidates = candidates.filter(attempts__lt=max_attempts)
+        candidates = candidates.order_by('id')
+        db = router.db_for_write(GenerationTask)
+
+        skip_locked = connections[db].features.has_select_for_update_skip_locked
+        if skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+
+        for _ in range(self.CLAIM_ATTEMPTS):
+            with transaction.atomic(using=db) if skip_locked else nullcontext():
+                ids = list(candidates[:limit].values_list('id', flat=True))
+                if not ids:
+                    return []
+                # The claimable() check is repeated in the UPDATE; that's what makes the SQLite path safe
+                claimed = GenerationTask.objects.using(db).filter(id__in=ids).claimable(now).update(
+                    status=GenerationTask.STATUS_LEASED, lease_owner=owner,
+                    lease_expires_at=now + lease, attempts=models.F('attempts') + 1
+                )
+            if claimed:
+                break
+
+        return list(GenerationTask.objects.using(db).filter(
+            id__in=ids, status=GenerationTask.STATUS_LEASED, lease_owner=owner
+        ).order_by('id'))
+
+    def fail_abandoned(self, max_attempts):
+        """Fail tasks whose lease expired `max_attempts` times, so one poisonous contact can't stall a run."""
+        return self.filter(
+            status=GenerationTask.STATUS_LEASED, lease_expires_at__lt=timezone.now(), attempts__gte=max_attempts
+        ).update(status=GenerationTask.STATUS_FAILED, lease_owner='',
+                 error=f"Abandoned after {max_attempts} attempts")
+
+
+class GenerationTask(models.Model):
+    """One contact of a GenerationRun; a worker leases it, generates the email and marks it done."""
+    STATUS_PENDING = 'pending'
+    STATUS_LEASED = 'leased'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_LEASED, 'Leased'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    FINISHED_STATUSES = (STATUS_DONE, STATUS_FAILED)
+
+    run = models.ForeignKey(GenerationRun, on_delete=models.CASCADE, related_name='tasks')
+    row_number = models.PositiveIntegerField()
+    contact = models.JSONField()  # As parsed from the CSV: name, email, company, position
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # The worker holding the task, until lease_expires_at; after that any worker may claim it again
+    lease_owner = models.CharField(max_length=255, blank=True, default='')
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    objects = GenerationTaskQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ['run', 'row_number']
+        indexes = [
+            models.Index(fields=['status', 'lease_expires_at'], name='generationtask_queue'),
+        ]
+
+    def __str__(self):
+        return f"Run {self.run_id} row {self.row_number} ({self.status})"
+
+
+# Outreach models live in their own module; importing them here registers them with the app
+from .email_models import UserProfile, HRContact, EmailTemplate, ColdEmail  # noqa: E402,F401
@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .email_models import UserProfile
+
+
+class SendQuota:
+    """
+    Per-user daily send quota backed by atomic counters on UserProfile.
+
+    Every change is a single conditional UPDATE with F() expressions, so the
+    counter stays correct across concurrent requests and worker processes
+    without holding row locks for the duration of a send.
+    """
+
+    # Bound on retries when concurrent reservations race for the last slots
+    MAX_RESERVE_ATTEMPTS = 5
+
+    def __init__(self, user):
+        self.user = user
+        self._profile_id = None
+
+    @property
+    def profile_id(self):
+        if self._profile_id is None:
+            profile, _ = UserProfile.objects.get_or_create(
+                user=self.user,
+                defaults={'daily_email_limit': getattr(settings, 'EMAIL_DAILY_LIMIT', 50)}
+            )
+            self._profile_id = profile.id
+        return self._profile_id
+
+    def _profile(self):
+        return UserProfile.objects.filter(id=self.profile_id)
+
+    def _roll_over(self, today):
+        """Reset the counter on the first use of a new day (idempotent)."""
+        self._profile().exclude(last_email_date=today).update(emails_sent_today=0, last_email_date=today)
+
+    def status(self):
+        """Return the current usage as a dictionary for API responses."""
+        today = timezone.localdate()
+        self._roll_over(today)
+        sent_today, limit = self._profile().values_list('emails_sent_today', 'daily_email_limit').get()
+        return {
+            'daily_limit': limit,
+            'sent_today': sent_today,
+            'remaining_quota': max(limit - sent_today, 0),
+        }
+
+    def remaining(self):
+        return self.status()['remaining_quota']
+
+    def reserve(self, count):
+        """
+        Reserve up to `count` sends for today.
+        Returns the number actually granted, which may be less than requested.
+        """
+        if count <= 0:
+            return 0
+
+        today = timezone.localdate()
+        self._roll_over(today)
+
+        wanted = count
+        for _ in range(self.MAX_RESERVE_ATTEMPTS):
+            # The capacity check and the increment happen in the same statement
+            granted = self._profile().filter(
+                last_email_date=today,
+                emails_sent_today__lte=F('daily_email_limit') - wanted,
+            ).update(emails_sent_today=F('emails_sent_today') + wanted)
+            if granted:
+                return wanted
+
+            remaining = self.remaining()
+            if remaining <= 0:
+                return 0
+            wanted = min(count, remaining)
+        return 0
+
+    def release(self, count):
+        """Return unused reservations (failed or skipped sends) to today's quota."""
+        if count <= 0:
+            return
+        self._profile().filter(
+            last_email_date=timezone.localdate(),
+            emails_sent_today__gte=count,
+        ).update(emails_sent_today=F('emails_sent_today') - count)
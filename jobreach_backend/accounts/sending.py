@@ -0,0 +1,315 @@
+import logging
+import os
+from collections import OrderedDict
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .mime import EncodedAttachment, render_raw
+from .models import CustomUser, GeneratedEmail, Resume
+from .quota import SendQuota
+from .tasks import enqueue
+from .user_cache import EMAIL_COUNTS, invalidate
+
+logger = logging.getLogger(__name__)
+
+
+def prerender(emails, from_name=None, batch_size=500):
+    """
+    Render and store the ready-to-send message of each email that doesn't have
+    one yet, so sending is only I/O. Runs in batches; returns the number rendered.
+    An email that can't be rendered (e.g. a header with a line break in it) is
+    logged and left without a message, so deliver() reports the error for it alone.
+    """
+    rendered = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            batch = list(emails.filter(rendered_message='', id__gt=last_id).order_by('id').select_for_update()
+                         .only('id', *GeneratedEmail.MESSAGE_FIELDS)[:batch_size])
+            if not batch:
+                return rendered
+            last_id = batch[-1].id
+            ready = []
+            for email in batch:
+                try:
+                    email.rendered_message = render_raw(
+                        email.recipient_email, email.email_subject, email.email_body, from_name
+                    )
+                except Exception as e:
+                    logger.warning(f"Email {email.id} can't be pre-rendered: {e}")
+                    continue
+                ready.append(email)
+            GeneratedEmail.objects.bulk_update(ready, ['rendered_message'])
+        rendered += len(ready)
+
+
+def prerender_authorized(ids, user):
+    """Queue prerender() for whichever of the emails `ids` ended up authorized."""
+    emails = GeneratedEmail.objects.filter(id__in=ids, status=GeneratedEmail.STATUS_AUTHORIZED)
+    enqueue(prerender, emails, from_name=user.full_name)
+
+
+# Attachment content types for the resume formats uploads accept
+RESUME_CONTENT_TYPES = {
+    '.pdf': 'application/pdf',
+    '.doc': 'application/msword',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+}
+
+
+@lru_cache(maxsize=16)
+def _encoded_file(path, mtime_ns, size, filename):
+    # mtime and size are part of the key so a replaced file is encoded afresh
+    content_type = RESUME_CONTENT_TYPES.get(os.path.splitext(filename)[1].lower(), 'application/octet-stream')
+    return EncodedAttachment.from_file(path, filename, content_type)
+
+
+def resume_attachments(emails):
+    """
+    {resume_id: EncodedAttachment} for the resumes these emails go out with.
+    Each file is memory-mapped and encoded once, then shared by every email
+    attaching it, and by later sends from this process while it is unchanged.
+    Resumes whose file is missing are left out.
+    """
+    attachments = {}
+    for resume in Resume.objects.filter(id__in={email.resume_id for email in emails}).only('id', 'file', 'original_filename'):
+        try:
+            path = resume.file.path
+            stat = os.stat(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Resume {resume.id} can't be attached: {e}")
+            continue
+        filename = resume.original_filename or os.path.basename(path)
+        attachments[resume.id] = _encoded_file(path, stat.st_mtime_ns, stat.st_size, filename)
+    return attachments
+
+
+def deliver(email, gmail_service, from_name=None, attachment=None):
+    """
+    Send one claimed email through Gmail and record the outcome on it, using
+    its pre-rendered message when there is one. `attachment` is an optional
+    EncodedAttachment shared by every email it goes out with.
+    Returns None on success, or the error message if the send failed or the
+    email was no longer ours to send.
+    """
+    if not _renew_claim(email):
+        # Released as stale (it may now be 'failed' and claimed again): sending would risk a duplicate
+        logger.warning(f"Email {email.id} lost its claim before it was sent; skipping it")
+        return "Email was released before it could be sent"
+
+    try:
+        raw = email.rendered_message or render_raw(
+            email.recipient_email, email.email_subject, email.email_body, from_name
+        )
+        if attachment is not None:
+            raw = attachment.attach_to(raw)
+        gmail_service.send_raw(email.user_id, raw, to_email=email.recipient_email)
+    except Exception as e:
+        _record_outcome(email, GeneratedEmail.STATUS_FAILED, send_error=str(e))
+        return str(e)
+
+    _record_outcome(email, GeneratedEmail.STATUS_SENT, sent_at=timezone.now(), send_error='', scheduled_for=None)
+    return None
+
+
+def _renew_claim(email):
+    """
+    Confirm the email is still claimed by us, restarting its claim timeout so
+    release_stale_claims() leaves it alone while it is being sent.
+    Emails of a batch wait their turn, so the claim taken with the batch may have gone stale.
+    """
+    return bool(GeneratedEmail.objects.filter(
+        id=email.id, claim_token=email.claim_token, status=GeneratedEmail.STATUS_SENDING
+    ).update(claimed_at=timezone.now()))
+
+
+def _record_outcome(email, target, **extra):
+    """
+    Move a claimed email from 'sending' to `target`, but only while the claim
+    is still ours. If the claim went stale and the email was released (and
+    perhaps claimed again), the current owner's record is left alone.
+    Returns whether the outcome was recorded.
+    """
+    recorded = GeneratedEmail.objects.filter(
+        id=email.id, claim_token=email.claim_token, status=GeneratedEmail.STATUS_SENDING
+    ).update(status=target, **extra)
+    invalidate(email.user_id, EMAIL_COUNTS)
+    if not recorded:
+        logger.warning(f"Email {email.id} lost its claim before its '{target}' outcome could be recorded")
+        return False
+    email.status = target
+    for field, value in extra.items():
+        setattr(email, field, value)
+    return True
+
+
+def interleave_domains(emails):
+    """Reorder emails round-robin by recipient domain so contacts at one company aren't sent back to back."""
+    by_domain = OrderedDict()
+    for email in emails:
+        by_domain.setdefault(email.recipient_domain, []).append(email)
+
+    ordered = []
+    queues = [list(reversed(group)) for group in by_domain.values()]
+    while queues:
+        for queue in queues:
+            ordered.append(queue.pop())
+        queues = [queue for queue in queues if queue]
+    return ordered
+
+
+def plan_schedule(emails, start, spread_hours, remaining_today, daily_limit, min_interval_seconds=0):
+    """
+    Assign a send time to every email, returning a list of (email, send_at).
+
+    Each day's share is spread evenly over `spread_hours` from the start time,
+    but never closer together than `min_interval_seconds`. Today only takes
+    what is left of the daily quota; the rest rolls over to the following days
+    at the same time of day.
+    """
+    ordered = interleave_domains(emails)
+    window = max(spread_hours, 0) * 3600
+    plan = []
+    day = 0
+    capacity = max(remaining_today, 0)
+
+    while len(plan) < len(ordered):
+        count = min(capacity, len(ordered) - len(plan))
+        if count:
+            spacing = max(window / count, min_interval_seconds)
+            day_start = start + timedelta(days=day)
+            for slot in range(count):
+                plan.append((ordered[len(plan)], day_start + timedelta(seconds=slot * spacing)))
+        day += 1
+        capacity = daily_limit
+        if daily_limit <= 0:
+            break
+
+    return plan
+
+
+class SendScheduler:
+    """
+    Drains the queue of scheduled, authorized emails at a controlled pace.
+
+    Per user, at most one email goes out per SEND_USER_INTERVAL_SECONDS and
+    EMAIL_RATE_LIMIT_PER_HOUR per hour; per recipient domain, at most one per
+    SEND_DOMAIN_INTERVAL_SECONDS; and the daily quota still applies. The
+    database is the only store, so any number of workers can run side by side:
+    emails are claimed before sending.
+    """
+
+    # Seconds to leave a user alone after their Gmail authorization is missing
+    UNAUTHORIZED_BACKOFF = 300
+
+    def __init__(self, gmail_service=None):
+        if gmail_service is None:
+            from .gmail_service import GmailService
+            gmail_service = GmailService()
+        self.gmail_service = gmail_service
+        self.user_interval = timedelta(seconds=getattr(settings, 'SEND_USER_INTERVAL_SECONDS', 30))
+        self.domain_interval = timedelta(seconds=getattr(settings, 'SEND_DOMAIN_INTERVAL_SECONDS', 300))
+        self.hourly_limit = getattr(settings, 'EMAIL_RATE_LIMIT_PER_HOUR', 10)
+        self._paused_until = {}  # user_id -> datetime
+
+    def due(self, now):
+        return GeneratedEmail.objects.filter(status=GeneratedEmail.STATUS_AUTHORIZED, scheduled_for__lte=now)
+
+    def run_once(self, now=None):
+        """Send whatever the pacing rules allow right now. Returns the number of emails sent."""
+        now = now or timezone.now()
+        self.release_stale_claims()
+
+        sent = 0
+        user_ids = self.due(now).values_list('user_id', flat=True).distinct()
+        for user_id in list(user_ids):
+            if self._paused_until.get(user_id, now) > now:
+                continue
+            sent += self._send_for_user(user_id, now)
+        return sent
+
+    @staticmethod
+    def release_stale_claims():
+        """Fail emails whose sender died mid-send, and drop their users' cached counts."""
+        user_ids = set(GeneratedEmail.objects.stale_claims().values_list('user_id', flat=True))
+        if not user_ids:
+            return 0
+        released = GeneratedEmail.objects.filter(user_id__in=user_ids).release_stale_claims()
+        for user_id in user_ids:
+            invalidate(user_id, EMAIL_COUNTS)
+        return released
+
+    def _allowance(self, user_id, now):
+        """How many emails this user may send right now under the per-user limits."""
+        recent = GeneratedEmail.objects.filter(
+            user_id=user_id, status=GeneratedEmail.STATUS_SENT, sent_at__gte=now - timedelta(hours=1)
+        ).aggregate(last_sent=Max('sent_at'), count=Count('id'))
+        if recent['last_sent'] and now - recent['last_sent'] < self.user_interval:
+            return 0
+        remaining = max(self.hourly_limit - recent['count'], 0)
+        return min(remaining, 1) if self.user_interval else remaining
+
+    def _busy_domains(self, user_id, now):
+        """Domains this user sent to (or is sending to) within the domain interval."""
+        if not self.domain_interval:
+            return set()
+        return set(GeneratedEmail.objects.filter(user_id=user_id).filter(
+            Q(status=GeneratedEmail.STATUS_SENT, sent_at__gte=now - self.domain_interval) |
+            Q(status=GeneratedEmail.STATUS_SENDING)
+        ).values_list('recipient_domain', flat=True).distinct())
+
+    def _pick(self, user_id, now, allowance):
+        """Due emails to send now: oldest first, at most one per free domain."""
+        busy = self._busy_domains(user_id, now)
+        picked = []
+        domains = set()
+        candidates = self.due(now).filter(user_id=user_id).exclude(recipient_domain__in=busy) \
+            .order_by('scheduled_for', 'id').values_list('id', 'recipient_domain')
+        for email_id, domain in candidates[:allowance * 10]:
+            if domain not in domains:
+                domains.add(domain)
+                picked.append(email_id)
+                if len(picked) >= allowance:
+                    break
+        return picked
+
+    def _send_for_user(self, user_id, now):
+        allowance = self._allowance(user_id, now)
+        if not allowance:
+            return 0
+        email_ids = self._pick(user_id, now, allowance)
+        if not email_ids:
+            return 0
+
+        if not self.gmail_service.is_user_authorized(user_id):
+            logger.warning(f"User {user_id} has queued emails but Gmail is not authorized")
+            self._paused_until[user_id] = now + timedelta(seconds=self.UNAUTHORIZED_BACKOFF)
+            return 0
+
+        user = CustomUser.objects.get(id=user_id)
+        quota = SendQuota(user)
+        granted = quota.reserve(len(email_ids))
+        if not granted:
+            # Nothing more goes out today; look again after midnight
+            tomorrow = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+            self._paused_until[user_id] = tomorrow
+            return 0
+
+        # Emails unscheduled since they were picked drop out here
+        claimed = GeneratedEmail.objects.filter(id__in=email_ids, scheduled_for__lte=now).claim(limit=granted)
+        attachments = resume_attachments(claimed) if getattr(settings, 'EMAIL_ATTACH_RESUME', True) else {}
+        sent = 0
+        for email in claimed:
+            error = deliver(email, self.gmail_service, from_name=user.full_name,
+                            attachment=attachments.get(email.resume_id))
+            if error:
+                logger.error(f"Scheduled email {email.id} failed: {error}")
+            else:
+                sent += 1
+        quota.release(granted - sent)
+        return sent
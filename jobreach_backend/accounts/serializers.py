@@ -1,6 +1,13 @@
+import hashlib
+import json
+
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Resume, ContactList, GeneratedEmail
+from django.core.exceptions import ValidationError as DjangoValidationError
+from .models import Resume, ContactList, GeneratedEmail, EmailTemplate, GenerationRun, UploadSession
+from .email_generation import GENERATION_MODE_AI, GENERATION_MODE_TEMPLATE
+from .email_templates import TemplateEngine
+from .fast_serializers import RowSerializer
 
 User = get_user_model()
 
@@ -30,10 +37,18 @@ class RegisterSerializer(serializers.ModelSerializer):
 
 
 class ResumeSerializer(serializers.ModelSerializer):
+    # Leading bytes of each supported format, checked before the file is queued for parsing
+    FILE_SIGNATURES = {
+        'pdf': [b'%PDF'],
+        'docx': [b'PK\x03\x04'],
+        'doc': [b'\xd0\xcf\x11\xe0'],
+    }
+    MAX_SIZE = 5 * 1024 * 1024
+
     class Meta:
         model = Resume
-        fields = ['id', 'file', 'original_filename', 'uploaded_at']
-        read_only_fields = ['id', 'uploaded_at', 'original_filename']
+        fields = ['id', 'file', 'original_filename', 'uploaded_at', 'parse_status', 'parse_error', 'skills']
+        read_only_fields = ['id', 'uploaded_at', 'original_filename', 'parse_status', 'parse_error', 'skills']
 
     def validate_file(self, value):
         # Validate file extension
@@ -45,13 +60,21 @@ class ResumeSerializer(serializers.ModelSerializer):
             )
         
         # Validate file size (5MB limit)
-        if value.size > 5 * 1024 * 1024:
+        if value.size > self.MAX_SIZE:
             raise serializers.ValidationError("File size cannot exceed 5MB")
         
+        # Reject files whose content doesn't match their extension
+        header = value.read(8)
+        value.seek(0)
+        if not any(header.startswith(signature) for signature in self.FILE_SIGNATURES[file_extension]):
+            raise serializers.ValidationError(f"File content is not a valid .{file_extension} document")
+        
         return value
 
 
 class ContactListSerializer(serializers.ModelSerializer):
+    MAX_SIZE = 2 * 1024 * 1024  # Chunked uploads pass a larger limit as context['max_size']
+
     class Meta:
         model = ContactList
         fields = ['id', 'file', 'original_filename', 'uploaded_at', 'is_validated', 'validation_errors']
@@ -62,46 +85,149 @@ class ContactListSerializer(serializers.ModelSerializer):
         if not value.name.lower().endswith('.csv'):
             raise serializers.ValidationError("Only CSV files are allowed")
         
-        # Validate file size (2MB limit)
-        if value.size > 2 * 1024 * 1024:
-            raise serializers.ValidationError("CSV file size cannot exceed 2MB")
+        # Validate file size (2MB limit unless the caller allows more)
+        max_size = self.context.get('max_size', self.MAX_SIZE)
+        if value.size > max_size:
+            raise serializers.ValidationError(f"CSV file size cannot exceed {max_size // (1024 * 1024)}MB")
         
         return value
 
 
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id', 'kind', 'filename', 'total_size', 'received_size', 'sha256', 'status',
+            'created_at', 'updated_at', 'resume', 'contact_list'
+        ]
+        read_only_fields = fields
+
+
+class GenerationRunSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = GenerationRun
+        fields = [
+            'id', 'resume', 'contact_list', 'generation_mode', 'template', 'status', 'error',
+            'total_contacts', 'inline', 'checkpoint_row', 'created_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+
 class GeneratedEmailSerializer(serializers.ModelSerializer):
-    status = serializers.SerializerMethodField()
+    # Derived from status; kept for API clients that read the old boolean fields
+    is_verified = serializers.BooleanField(read_only=True)
+    is_authorized = serializers.BooleanField(read_only=True)
+    is_sent = serializers.BooleanField(read_only=True)
     
     class Meta:
         model = GeneratedEmail
         fields = [
             'id', 'recipient_name', 'recipient_email', 'recipient_company', 
             'recipient_position', 'email_subject', 'email_body', 'generated_at',
-            'is_verified', 'is_authorized', 'is_sent', 'sent_at', 'status'
+            'is_verified', 'is_authorized', 'is_sent', 'sent_at', 'status', 'send_error',
+            'address_check', 'address_checked_at'
         ]
-        read_only_fields = ['id', 'generated_at', 'status']
-    
-    def get_status(self, obj):
-        """Return the status of the email based on its state."""
-        if obj.is_sent:
-            return 'sent'
-        elif obj.is_authorized:
-            return 'authorized'
-        elif obj.is_verified:
-            return 'verified'
-        else:
-            return 'draft'
+        read_only_fields = [
+            'id', 'generated_at', 'sent_at', 'status', 'send_error', 'address_check', 'address_checked_at'
+        ]
+
+    def changed_message_fields(self, data):
+        """The message fields in `data` that differ from the email being updated."""
+        return [field for field in GeneratedEmail.MESSAGE_FIELDS
+                if field in data and data[field] != getattr(self.instance, field)]
+
+    def update(self, instance, validated_data):
+        changed = self.changed_message_fields(validated_data)
+        if changed and instance.status != GeneratedEmail.STATUS_DRAFT:
+            # What was verified and authorized is no longer what would be sent
+            validated_data.update(status=GeneratedEmail.STATUS_DRAFT, scheduled_for=None)
+        if 'recipient_email' in changed:
+            validated_data.update(address_check='', address_checked_at=None)
+        return super().update(instance, validated_data)
+
+
+# Same output as GeneratedEmailSerializer(..., many=True).data for the hot list responses
+generated_email_rows = RowSerializer(GeneratedEmailSerializer, computed={
+    'is_verified': ('status', GeneratedEmail.VERIFIED_STATUSES.__contains__),
+    'is_authorized': ('status', GeneratedEmail.AUTHORIZED_STATUSES.__contains__),
+    'is_sent': ('status', GeneratedEmail.STATUS_SENT.__eq__),
+})
+
+
+class EmailSelectionSerializer(serializers.Serializer):
+    """Selects the current user's emails by an id list or a filter (see GeneratedEmailQuerySet.FILTER_FIELDS)."""
+    email_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    filter = serializers.DictField(required=False, allow_empty=False)
+
+    def validate_filter(self, value):
+        """Validate filter names and values by building the query they describe."""
+        try:
+            GeneratedEmail.objects.apply_filters(value)
+        except (ValueError, TypeError, DjangoValidationError) as e:
+            message = '; '.join(e.messages) if isinstance(e, DjangoValidationError) else str(e)
+            raise serializers.ValidationError(message)
+        return value
+
+    def validate(self, data):
+        if ('email_ids' in data) == ('filter' in data):
+            raise serializers.ValidationError("Provide either email_ids or filter")
+        return data
+
+    def select(self, user):
+        """The validated selection as a queryset of the user's emails."""
+        emails = GeneratedEmail.objects.filter(user=user)
+        if 'email_ids' in self.validated_data:
+            return emails.filter(id__in=self.validated_data['email_ids'])
+        return emails.apply_filters(self.validated_data['filter'])
+
+
+class EmailBulkActionSerializer(EmailSelectionSerializer):
+    ACTIONS = ['verify', 'unverify', 'authorize', 'revoke', 'delete']
+
+    action = serializers.ChoiceField(choices=ACTIONS)
+
+
+class EmailSendSerializer(serializers.Serializer):
+    email_ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    # None falls back to EMAIL_ATTACH_RESUME; parsed, so "false" from a form really means false
+    attach_resume = serializers.BooleanField(required=False, allow_null=True, default=None)
+
+    def fingerprint(self):
+        """Digest of what the request asks for, so an idempotency key can't be reused for another send."""
+        data = self.validated_data
+        payload = json.dumps({'email_ids': sorted(set(data['email_ids'])), 'attach_resume': data['attach_resume']})
+        return hashlib.sha256(payload.encode()).hexdigest()
 
 
 class EmailGenerationRequestSerializer(serializers.Serializer):
     resume_id = serializers.IntegerField()
     contact_list_id = serializers.IntegerField()
+    generation_mode = serializers.ChoiceField(
+        choices=[GENERATION_MODE_AI, GENERATION_MODE_TEMPLATE], default=GENERATION_MODE_AI
+    )
+    template_id = serializers.IntegerField(required=False, allow_null=True)
+
+    def validate_template_id(self, value):
+        """Validate that the template exists, is active and compiles."""
+        if value is None:
+            return value
+        try:
+            template = EmailTemplate.objects.get(id=value, is_active=True)
+        except EmailTemplate.DoesNotExist:
+            raise serializers.ValidationError("Email template not found or inactive")
+        try:
+            TemplateEngine(template)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return value
 
     def validate_resume_id(self, value):
         """Validate that the resume exists and belongs to the user."""
         user = self.context['request'].user
         try:
             resume = Resume.objects.get(id=value, user=user)
+            if resume.parse_status == Resume.PARSE_FAILED:
+                raise serializers.ValidationError(f"Resume could not be parsed: {resume.parse_error}")
             return value
         except Resume.DoesNotExist:
             raise serializers.ValidationError("Resume not found or doesn't belong to user")
@@ -0,0 +1,96 @@
+import re
+from functools import lru_cache
+from typing import Dict, List
+
+from django.conf import settings
+
+
+# Default skills taxonomy: (display name, category, aliases matched in resume text).
+# Override with the SKILLS_TAXONOMY setting using the same shape.
+DEFAULT_SKILLS_TAXONOMY = [
+    ('Python', 'language', ['python']),
+    ('JavaScript/React', 'frontend', ['javascript', 'react', 'reactjs', 'react.js']),
+    ('TypeScript', 'language', ['typescript']),
+    ('Java', 'language', ['java']),
+    ('Go', 'language', ['golang']),
+    ('C++', 'language', ['c++']),
+    ('C#', 'language', ['c#', '.net']),
+    ('Django', 'framework', ['django']),
+    ('Flask', 'framework', ['flask']),
+    ('Node.js', 'framework', ['node.js', 'nodejs', 'express.js', 'expressjs']),
+    ('SQL', 'data', ['sql', 'postgresql', 'postgres', 'mysql']),
+    ('MongoDB', 'data', ['mongodb']),
+    ('machine learning', 'data', ['machine learning', 'tensorflow', 'pytorch', 'scikit-learn']),
+    ('cloud technologies', 'cloud', ['aws', 'cloud', 'azure', 'gcp', 'google cloud']),
+    ('Docker/Kubernetes', 'devops', ['docker', 'kubernetes', 'k8s']),
+    ('CI/CD', 'devops', ['ci/cd', 'jenkins', 'github actions']),
+]
+
+
+class SkillMatcher:
+    """
+    Single-pass skill extractor over a skills taxonomy.
+
+    All aliases are compiled into one alternation so a resume is scanned once,
+    no matter how many skills the taxonomy contains.
+    """
+
+    def __init__(self, taxonomy):
+        self.skills = []
+        self._alias_to_index = {}
+
+        for index, (name, category, aliases) in enumerate(taxonomy):
+            self.skills.append((name, category))
+            for alias in aliases:
+                self._alias_to_index.setdefault(alias.lower(), index)
+
+        # Longest aliases first so "react.js" wins over "react"
+        aliases = sorted(self._alias_to_index, key=len, reverse=True)
+        self._pattern = re.compile(
+            r'(?<![\w+#.])(' + '|'.join(re.escape(alias) for alias in aliases) + r')(?![\w+#])',
+            re.IGNORECASE
+        )
+
+    def extract(self, text: str) -> List[Dict]:
+        """
+        Return the skill profile for a resume: one entry per skill found,
+        most-mentioned first, ties broken by taxonomy order.
+        """
+        mentions = {}
+        for match in self._pattern.finditer(text):
+            index = self._alias_to_index[match.group(0).lower()]
+            mentions[index] = mentions.get(index, 0) + 1
+
+        ordered = sorted(mentions.items(), key=lambda item: (-item[1], item[0]))
+        return [
+            {
+                'name': self.skills[index][0],
+                'category': self.skills[index][1],
+                'mentions': count,
+            }
+            for index, count in ordered
+        ]
+
+
+@lru_cache(maxsize=1)
+def _build_matcher(taxonomy):
+    return SkillMatcher(taxonomy)
+
+
+def get_skill_matcher() -> SkillMatcher:
+    """Return the compiled matcher for the configured taxonomy."""
+    taxonomy = getattr(settings, 'SKILLS_TAXONOMY', None) or DEFAULT_SKILLS_TAXONOMY
+    # Freeze so the compiled matcher can be cached per taxonomy
+    frozen = tuple((name, category, tuple(aliases)) for name, category, aliases in taxonomy)
+    return _build_matcher(frozen)
+
+
+def extract_skill_profile(resume_text: str) -> List[Dict]:
+    """Extract the structured skill profile for a resume."""
+    return get_skill_matcher().extract(resume_text or '')
+
+
+def top_skill_names(skill_profile: List[Dict], limit: int = None) -> List[str]:
+    """Return the names of the most prominent skills in a profile."""
+    names = [skill['name'] for skill in skill_profile or []]
+    return names[:limit] if limit else names
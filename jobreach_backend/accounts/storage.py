@@ -0,0 +1,90 @@
+import hashlib
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+
+def _sha256(content):
+    # Chunked uploads hash the file while verifying it; don't read it twice
+    sha256 = getattr(content, 'sha256', None)
+    if sha256:
+        return sha256
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores each distinct file once, named by the sha256 of its content
+    (blobs/ab/ab12...ef.pdf) whatever name it was uploaded under, so identical
+    uploads share one file and anything keyed by the file name is shared too.
+
+    A FileBlob row counts the references to each blob, and delete() removes
+    the file only when the last one goes. Files saved before this storage was
+    in use keep their names and are deleted as before.
+    """
+
+    BLOB_DIR = 'blobs'
+
+    def blob_name(self, sha256, name):
+        extension = os.path.splitext(name)[1].lower()  # Kept: parsers pick a format by extension
+        return f"{self.BLOB_DIR}/{sha256[:2]}/{sha256}{extension}"
+
+    def is_blob(self, name):
+        return name.startswith(f"{self.BLOB_DIR}/")
+
+    def _save(self, name, content):
+        from .models import FileBlob
+
+        sha256 = _sha256(content)
+        blob = self.blob_name(sha256, name)
+        with transaction.atomic():
+            # Taking the reference first locks the row against a concurrent delete of the last one
+            if not FileBlob.objects.filter(name=blob).update(ref_count=F('ref_count') + 1):
+                try:
+                    with transaction.atomic():
+                        FileBlob.objects.create(name=blob, sha256=sha256, size=content.size, ref_count=1)
+                except IntegrityError:
+                    FileBlob.objects.filter(name=blob).update(ref_count=F('ref_count') + 1)
+
+            if not self.exists(blob):
+                # Written under a temporary name and renamed, so readers never see a partial blob
+                staged = super()._save(f"{self.BLOB_DIR}/tmp/{uuid.uuid4().hex}", content)
+                os.makedirs(os.path.dirname(self.path(blob)), exist_ok=True)
+                os.replace(self.path(staged), self.path(blob))
+        return blob
+
+    def delete(self, name):
+        from .models import FileBlob
+
+        if not name or not self.is_blob(name):
+            return super().delete(name)
+        with transaction.atomic():
+            FileBlob.objects.filter(name=name, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+            unreferenced, _ = FileBlob.objects.filter(name=name, ref_count=0).delete()
+            if unreferenced:
+                super().delete(name)
+
+    def purge(self, name):
+        """Delete a blob and its FileBlob row whatever its reference count (for repairing leaked references)."""
+        from .models import FileBlob
+
+        with transaction.atomic():
+            FileBlob.objects.filter(name=name).delete()
+            super().delete(name)
+
+
+content_addressed_storage = ContentAddressedStorage()
+
+
+def upload_storage():
+    """Storage for resume and contact list files; CONTENT_ADDRESSED_UPLOADS=False keeps one file per upload."""
+    if getattr(settings, 'CONTENT_ADDRESSED_UPLOADS', True):
+        return content_addressed_storage
+    return default_storage
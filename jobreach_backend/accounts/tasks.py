@@ -0,0 +1,91 @@
+import atexit
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BACKGROUND_TASK_WORKERS', 2),
+                thread_name_prefix='jobreach-task',
+            )
+            atexit.register(_executor.shutdown, wait=False)
+        return _executor
+
+
+def _run_task(func, args, kwargs):
+    close_old_connections()
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception(f"Background task {func.__name__} failed")
+    finally:
+        close_old_connections()
+
+
+def enqueue(func, *args, **kwargs):
+    """
+    Run a task in the background once the current transaction commits.
+    With BACKGROUND_TASKS_ASYNC disabled the task runs inline instead.
+    """
+    if not getattr(settings, 'BACKGROUND_TASKS_ASYNC', True):
+        transaction.on_commit(lambda: func(*args, **kwargs))
+        return
+
+    transaction.on_commit(lambda: _get_executor().submit(_run_task, func, args, kwargs))
+
+
+def parse_resume(resume_id):
+    """Extract and persist text and skills for an uploaded resume."""
+    from .document_worker import parse_document, PARSE_OK
+    from .models import Resume
+    from .skills import extract_skill_profile
+    from .tracing import span
+    from .user_cache import RESUMES, invalidate
+
+    try:
+        resume = Resume.objects.get(id=resume_id)
+    except Resume.DoesNotExist:
+        return  # Deleted before the task ran
+
+    # Identical uploads share a stored file, so its text may already have been extracted
+    parsed = (
+        Resume.objects.filter(file=resume.file.name, parse_status=Resume.PARSE_READY)
+        .exclude(id=resume_id).values('extracted_text', 'skills').first()
+    )
+    if parsed:
+        Resume.objects.filter(id=resume_id).update(parse_status=Resume.PARSE_READY, parse_error='', **parsed)
+        invalidate(resume.user_id, RESUMES)
+        return
+
+    Resume.objects.filter(id=resume_id).update(parse_status=Resume.PARSE_PROCESSING)
+    invalidate(resume.user_id, RESUMES)
+
+    with span('resume_parse', background=True):
+        result = parse_document(resume.file.path)
+    if result['status'] == PARSE_OK:
+        Resume.objects.filter(id=resume_id).update(
+            parse_status=Resume.PARSE_READY,
+            extracted_text=result['text'],
+            skills=extract_skill_profile(result['text']),
+            parse_error='',
+        )
+    else:
+        logger.warning(f"Resume {resume_id} failed to parse: {result['error']}")
+        Resume.objects.filter(id=resume_id).update(
+            parse_status=Resume.PARSE_FAILED,
+            parse_error=result['error'] or '',
+        )
+    invalidate(resume.user_id, RESUMES)
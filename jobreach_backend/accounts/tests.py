@@ -1,3 +1,1188 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import json
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+import unittest
+from datetime import timedelta
+from email import message_from_bytes
+from email.policy import default
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from google.auth.exceptions import RefreshError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from .document_worker import (
+    PARSE_ERROR, PARSE_MEMORY_EXCEEDED, PARSE_TIMEOUT, DocumentParserPool, _CPULimitExceeded, _parse_in_worker,
+)
+from .email_generation import EmailGenerationService
+from .email_templates import CompiledTemplate, TemplateEngine
+from .email_verification import (
+    ADDRESS_DISPOSABLE, ADDRESS_INVALID_SYNTAX, ADDRESS_NO_MX, ADDRESS_UNKNOWN, ADDRESS_VALID, DNSPythonResolver,
+    DomainLookupError, EmailVerifier, SocketResolver, StaticResolver,
+)
+from .fast_serializers import FastJSONRenderer, RowSerializer
+from .generation_runs import GenerationWorker, LeaseLost, RunCheckpoint, start_inline_run, start_run
+from .gmail_service import GmailService
+from .middleware import _QueryRecorder
+from .mime import EncodedAttachment, render_raw
+from .models import (
+    ContactList, CustomUser, EmailTemplate, FileBlob, GeneratedEmail, GenerationRun, GenerationTask, InvalidTransition,
+    Resume, SendRequest, UploadSession,
+)
+from .quota import SendQuota
+from .serializers import GeneratedEmailSerializer, ResumeSerializer, generated_email_rows
+from .sending import SendScheduler, deliver, plan_schedule, resume_attachments
+from .skills import DEFAULT_SKILLS_TAXONOMY, SkillMatcher
+from .storage import ContentAddressedStorage
+from .tracing import DEFAULT_BUCKETS, NOOP_SPAN, MetricsRegistry, MetricsTracer, span
+from .user_cache import EMAIL_COUNTS, get_or_compute
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    BACKGROUND_TASKS_ASYNC=False,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    GOOGLE_CLIENT_ID='test-client-id',
+    GOOGLE_CLIENT_SECRET='test-client-secret',
+    EMAIL_DAILY_LIMIT=5,
+    CHUNKED_UPLOAD_DIR=None,
+)
+class AccountsTestCase(TestCase):
+    CONTACTS = 6
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='alice', password='secret', full_name='Alice')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.resume = Resume.objects.create(
+            user=self.user, file=ContentFile(b'%PDF resume', name='resume.pdf'), original_filename='resume.pdf',
+            parse_status=Resume.PARSE_READY, extracted_text='Python and Django developer', skills=[]
+        )
+        rows = "name,email,company,position\n" + "".join(
+            f"Person {i},person{i}@company{i}.com,Company {i},Engineer\n" for i in range(self.CONTACTS)
+        )
+        self.contact_list = ContactList.objects.create(
+            user=self.user, file=ContentFile(rows.encode(), name='contacts.csv'),
+            original_filename='contacts.csv', is_validated=True
+        )
+
+    def create_email(self, status=GeneratedEmail.STATUS_DRAFT, recipient='hr@example.com'):
+        return GeneratedEmail.objects.create(
+            user=self.user, resume=self.resume, contact_list=self.contact_list,
+            recipient_email=recipient, recipient_name='HR', email_subject='Hello', email_body='Body',
+            status=status
+        )
+
+
+class EmailStatusTests(AccountsTestCase):
+    def test_transition_moves_only_allowed_sources(self):
+        draft = self.create_email(GeneratedEmail.STATUS_DRAFT, 'a@example.com')
+        verified = self.create_email(GeneratedEmail.STATUS_VERIFIED, 'b@example.com')
+
+        moved = GeneratedEmail.objects.all().transition(GeneratedEmail.STATUS_AUTHORIZED)
+
+        self.assertEqual(moved, 1)
+        draft.refresh_from_db()
+        verified.refresh_from_db()
+        self.assertEqual(draft.status, GeneratedEmail.STATUS_DRAFT)
+        self.assertEqual(verified.status, GeneratedEmail.STATUS_AUTHORIZED)
+
+    def test_transition_without_allowed_sources_raises(self):
+        with self.assertRaises(InvalidTransition):
+            GeneratedEmail.objects.all().transition(
+                GeneratedEmail.STATUS_SENT, from_statuses=[GeneratedEmail.STATUS_DRAFT]
+            )
+        with self.assertRaises(InvalidTransition):
+            self.create_email().transition_to(GeneratedEmail.STATUS_SENT)
+
+    def test_boolean_properties_follow_status(self):
+        email = self.create_email(GeneratedEmail.STATUS_AUTHORIZED)
+
+        self.assertEqual((email.is_verified, email.is_authorized, email.is_sent), (True, True, False))
+        email.transition_to(GeneratedEmail.STATUS_VERIFIED)
+        self.assertEqual((email.is_verified, email.is_authorized, email.is_sent), (True, False, False))
+
+    def test_verify_leaves_authorized_email_authorized(self):
+        email = self.create_email(GeneratedEmail.STATUS_AUTHORIZED)
+
+        response = self.client.post(f'/api/accounts/verify-email/{email.id}/')
+
+        self.assertEqual(response.status_code, 200)
+        email.refresh_from_db()
+        self.assertEqual(email.status, GeneratedEmail.STATUS_AUTHORIZED)
+
+
+    def test_editing_verified_email_moves_it_back_to_draft(self):
+        email = self.create_email(GeneratedEmail.STATUS_AUTHORIZED)
+        GeneratedEmail.objects.filter(id=email.id).update(address_check='valid', scheduled_for=timezone.now())
+
+        response = self.client.put(f'/api/accounts/generated-emails/{email.id}/',
+                                   {'recipient_email': 'other@example.com'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.address_check, email.scheduled_for),
+                         (GeneratedEmail.STATUS_DRAFT, '', None))
+
+    def test_editing_sent_email_is_rejected(self):
+        email = self.create_email(GeneratedEmail.STATUS_SENT)
+
+        response = self.client.put(f'/api/accounts/generated-emails/{email.id}/',
+                                   {'email_subject': 'Changed'}, format='json')
+
+        self.assertEqual(response.status_code, 409)
+        email.refresh_from_db()
+        self.assertEqual(email.email_subject, 'Hello')
+
+
+
+class EmailBulkActionTests(AccountsTestCase):
+    def bulk(self, **data):
+        return self.client.post('/api/accounts/generated-emails/bulk/', data, format='json')
+
+    def test_actions_only_move_allowed_statuses(self):
+        emails = {status: self.create_email(status, f'{status}@example.com') for status in [
+            GeneratedEmail.STATUS_DRAFT, GeneratedEmail.STATUS_VERIFIED, GeneratedEmail.STATUS_AUTHORIZED,
+            GeneratedEmail.STATUS_SENT,
+        ]}
+        ids = [email.id for email in emails.values()]
+
+        self.assertEqual(self.bulk(action='revoke', email_ids=ids).data['updated_count'], 1)
+        self.assertEqual(self.bulk(action='unverify', email_ids=ids).data['updated_count'], 2)
+
+        self.assertEqual(dict(GeneratedEmail.objects.values_list('id', 'status')), {
+            emails[GeneratedEmail.STATUS_DRAFT].id: GeneratedEmail.STATUS_DRAFT,
+            emails[GeneratedEmail.STATUS_VERIFIED].id: GeneratedEmail.STATUS_DRAFT,
+            emails[GeneratedEmail.STATUS_AUTHORIZED].id: GeneratedEmail.STATUS_DRAFT,
+            emails[GeneratedEmail.STATUS_SENT].id: GeneratedEmail.STATUS_SENT,
+        })
+
+    def test_filter_selects_only_the_users_emails(self):
+        mine = self.create_email(GeneratedEmail.STATUS_VERIFIED)
+        other = CustomUser.objects.create_user(username='bob', password='secret')
+        theirs = GeneratedEmail.objects.create(
+            user=other, resume=self.resume, contact_list=self.contact_list, recipient_email='hr@example.com',
+            recipient_name='HR', email_subject='Hello', email_body='Body', status=GeneratedEmail.STATUS_VERIFIED
+        )
+
+        response = self.bulk(action='authorize', filter={'status': GeneratedEmail.STATUS_VERIFIED})
+
+        self.assertEqual(response.data['updated_count'], 1)
+        mine.refresh_from_db()
+        theirs.refresh_from_db()
+        self.assertEqual(mine.status, GeneratedEmail.STATUS_AUTHORIZED)
+        self.assertEqual(theirs.status, GeneratedEmail.STATUS_VERIFIED)
+
+    def test_delete_leaves_emails_being_sent(self):
+        self.create_email(GeneratedEmail.STATUS_DRAFT, 'draft@example.com')
+        sending = self.create_email(GeneratedEmail.STATUS_SENDING, 'sending@example.com')
+
+        response = self.bulk(action='delete', filter={'contact_list_id': self.contact_list.id})
+
+        self.assertEqual(response.data['updated_count'], 1)
+        self.assertEqual(list(GeneratedEmail.objects.values_list('id', flat=True)), [sending.id])
+
+    def test_selection_must_be_ids_or_filter(self):
+        self.assertEqual(self.bulk(action='revoke').status_code, 400)
+        self.assertEqual(self.bulk(action='revoke', filter={'colour': 'red'}).status_code, 400)
+
+@mock.patch('accounts.email_verification.get_resolver', lambda: StaticResolver({'nomail.example': False}))
+class EmailVerificationTests(AccountsTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()  # Domain answers are cached across tests
+
+    def test_bulk_verify_checks_addresses(self):
+        good = self.create_email(recipient='hr@example.com')
+        disposable = self.create_email(recipient='hr@mailinator.com')
+        no_mx = self.create_email(recipient='hr@nomail.example')
+
+        response = self.client.post('/api/accounts/generated-emails/bulk/', {
+            'action': 'verify', 'email_ids': [good.id, disposable.id, no_mx.id]
+        }, format='json')
+
+        self.assertEqual(response.data['updated_count'], 1)
+        for email, check, status in [(good, ADDRESS_VALID, GeneratedEmail.STATUS_VERIFIED),
+                                     (disposable, ADDRESS_DISPOSABLE, GeneratedEmail.STATUS_DRAFT),
+                                     (no_mx, ADDRESS_NO_MX, GeneratedEmail.STATUS_DRAFT)]:
+            email.refresh_from_db()
+            self.assertEqual((email.address_check, email.status), (check, status))
+
+    def test_each_domain_is_looked_up_once_and_cached(self):
+        resolver = StaticResolver({'nomail.example': False})
+        verifier = EmailVerifier(resolver=resolver)
+
+        results = verifier.verify_many(['a@example.com', 'b@example.com', 'c@nomail.example', 'not-an-address'])
+        verifier.verify_many(['d@example.com'])
+
+        self.assertEqual(resolver.lookup_count, 2)
+        self.assertEqual({email: result['status'] for email, result in results.items()}, {
+            'a@example.com': ADDRESS_VALID, 'b@example.com': ADDRESS_VALID,
+            'c@nomail.example': ADDRESS_NO_MX, 'not-an-address': ADDRESS_INVALID_SYNTAX,
+        })
+
+    def test_failed_lookup_is_unknown_and_not_cached(self):
+        resolver = StaticResolver({'down.example': DomainLookupError('SERVFAIL')})
+        verifier = EmailVerifier(resolver=resolver)
+
+        self.assertEqual(verifier.verify('hr@down.example')['status'], ADDRESS_UNKNOWN)
+        verifier.verify('hr@down.example')
+        self.assertEqual(resolver.lookup_count, 2)
+
+    def test_single_lookup_is_bounded_by_timeout(self):
+        verifier = EmailVerifier(resolver=StaticResolver(latency_ms=3000), timeout=0.05)
+
+        started = time.monotonic()
+        self.assertEqual(verifier.verify('hr@slow.example')['status'], ADDRESS_UNKNOWN)
+        self.assertLess(time.monotonic() - started, 2)
+
+    def test_socket_resolver_times_out(self):
+        with mock.patch('accounts.email_verification.socket.getaddrinfo', lambda *args, **kwargs: time.sleep(1)):
+            with self.assertRaises(DomainLookupError):
+                SocketResolver(timeout=0.05).accepts_mail('slow.example')
+
+    def test_null_mx_does_not_accept_mail(self):
+        import dns.name
+
+        resolver = DNSPythonResolver()
+        with mock.patch.object(resolver.resolver, 'resolve', return_value=[mock.Mock(exchange=dns.name.root)]):
+            self.assertFalse(resolver.accepts_mail('nomail.example'))
+        mail_server = dns.name.from_text('mx.example.com')
+        with mock.patch.object(resolver.resolver, 'resolve', return_value=[mock.Mock(exchange=mail_server)]):
+            self.assertTrue(resolver.accepts_mail('example.com'))
+
+class SendClaimTests(AccountsTestCase):
+    def test_claim_hands_each_email_to_one_claimer(self):
+        self.create_email(GeneratedEmail.STATUS_DRAFT, 'draft@example.com')
+        for i in range(3):
+            self.create_email(GeneratedEmail.STATUS_AUTHORIZED, f'hr{i}@example.com')
+
+        first = GeneratedEmail.objects.all().claim(limit=2)
+        second = GeneratedEmail.objects.all().claim()
+        third = GeneratedEmail.objects.all().claim()
+
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertEqual(third, [])
+        self.assertFalse({email.id for email in first} & {email.id for email in second})
+        self.assertEqual(len({email.claim_token for email in first}), 1)
+        self.assertNotEqual(first[0].claim_token, second[0].claim_token)
+        self.assertEqual(GeneratedEmail.objects.filter(status=GeneratedEmail.STATUS_SENDING).count(), 3)
+
+    def test_release_stale_claims_fails_only_old_claims(self):
+        stale, fresh = [self.create_email(GeneratedEmail.STATUS_AUTHORIZED, f'hr{i}@example.com') for i in range(2)]
+        GeneratedEmail.objects.all().claim()
+        GeneratedEmail.objects.filter(id=stale.id).update(claimed_at=timezone.now() - timedelta(hours=1))
+
+        released = GeneratedEmail.objects.release_stale_claims(older_than=timedelta(minutes=10))
+
+        self.assertEqual(released, 1)
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual(stale.status, GeneratedEmail.STATUS_FAILED)
+        self.assertTrue(stale.send_error)
+        self.assertEqual(fresh.status, GeneratedEmail.STATUS_SENDING)
+
+    def test_deliver_does_not_send_a_lost_claim(self):
+        email = self.create_email(GeneratedEmail.STATUS_AUTHORIZED)
+        [claimed] = GeneratedEmail.objects.filter(id=email.id).claim()
+        GeneratedEmail.objects.release_stale_claims(older_than=timedelta(seconds=-1))
+        gmail = mock.Mock()
+
+        self.assertIsNotNone(deliver(claimed, gmail))
+
+        gmail.send_raw.assert_not_called()
+        email.refresh_from_db()
+        self.assertEqual(email.status, GeneratedEmail.STATUS_FAILED)
+
+    def test_deliver_renews_the_claim_before_sending(self):
+        email = self.create_email(GeneratedEmail.STATUS_AUTHORIZED)
+        [claimed] = GeneratedEmail.objects.filter(id=email.id).claim()
+        GeneratedEmail.objects.filter(id=email.id).update(claimed_at=timezone.now() - timedelta(hours=1))
+
+        def send_raw(*args, **kwargs):
+            # Another process looking for stale claims while this send is in flight
+            self.assertEqual(GeneratedEmail.objects.release_stale_claims(older_than=timedelta(minutes=10)), 0)
+
+        self.assertIsNone(deliver(claimed, mock.Mock(send_raw=send_raw)))
+        email.refresh_from_db()
+        self.assertEqual(email.status, GeneratedEmail.STATUS_SENT)
+
+
+@mock.patch.object(GmailService, 'cached_is_authorized', return_value=True)
+@mock.patch.object(GmailService, 'send_raw')
+class EmailSendViewTests(AccountsTestCase):
+    def send(self, email_ids, key=None):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return self.client.post('/api/accounts/send-emails/', {'email_ids': email_ids}, format='json', **headers)
+
+    def test_retry_with_same_key_replays_response(self, send_raw, authorized):
+        email = self.create_email(GeneratedEmail.STATUS_AUTHORIZED)
+
+        first = self.send([email.id], key='retry-1')
+        second = self.send([email.id], key='retry-1')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(send_raw.call_count, 1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, GeneratedEmail.STATUS_SENT)
+
+    def test_failed_request_is_not_replayed(self, send_raw, authorized):
+        draft = self.create_email(GeneratedEmail.STATUS_DRAFT)
+
+        first = self.send([draft.id], key='retry-2')
+        draft.transition_to(GeneratedEmail.STATUS_VERIFIED)
+        second = self.send([draft.id], key='retry-2')
+
+        self.assertEqual(first.status_code, 400)
+        self.assertEqual(second.status_code, 200)
+        self.assertFalse(second.has_header('Idempotent-Replayed'))
+        self.assertEqual(send_raw.call_count, 1)
+
+
+    def test_key_reused_for_other_emails_is_rejected(self, send_raw, authorized):
+        first, second = [self.create_email(GeneratedEmail.STATUS_AUTHORIZED, f'hr{i}@example.com') for i in range(2)]
+
+        self.assertEqual(self.send([first.id], key='retry-3').status_code, 200)
+        response = self.send([second.id], key='retry-3')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(send_raw.call_count, 1)
+        second.refresh_from_db()
+        self.assertEqual(second.status, GeneratedEmail.STATUS_AUTHORIZED)
+
+    def test_abandoned_request_frees_its_key(self, send_raw, authorized):
+        email = self.create_email(GeneratedEmail.STATUS_AUTHORIZED)
+        self.send([email.id], key='retry-4')
+        SendRequest.objects.update(status_code=None, response=None)  # As if it crashed before storing its response
+
+        self.assertEqual(self.send([email.id], key='retry-4').status_code, 409)
+        SendRequest.objects.update(created_at=timezone.now() - timedelta(hours=1))
+        response = self.send([email.id], key='retry-4')
+
+        self.assertEqual(response.status_code, 400)  # Ran again; the email was already sent
+        self.assertEqual(send_raw.call_count, 1)
+
+    @mock.patch('accounts.views.resume_attachments', return_value={})
+    def test_attach_resume_false_from_form_data(self, attachments, send_raw, authorized):
+        email = self.create_email(GeneratedEmail.STATUS_AUTHORIZED)
+
+        response = self.client.post('/api/accounts/send-emails/', {'email_ids': [email.id], 'attach_resume': 'false'})
+
+        self.assertEqual(response.status_code, 200)
+        attachments.assert_not_called()
+
+
+@override_settings(SEND_USER_INTERVAL_SECONDS=0, SEND_DOMAIN_INTERVAL_SECONDS=300, EMAIL_RATE_LIMIT_PER_HOUR=10,
+                   EMAIL_ATTACH_RESUME=False)
+class SendSchedulerTests(AccountsTestCase):
+    def queue(self, *recipients):
+        for recipient in recipients:
+            email = self.create_email(GeneratedEmail.STATUS_AUTHORIZED, recipient)
+            GeneratedEmail.objects.filter(id=email.id).update(scheduled_for=timezone.now() - timedelta(minutes=1))
+
+    def scheduler(self, authorized=True):
+        gmail = mock.Mock()
+        gmail.is_user_authorized.return_value = authorized
+        return SendScheduler(gmail_service=gmail)
+
+    def test_plan_spreads_each_day_and_rolls_over_the_quota(self):
+        emails = [mock.Mock(recipient_domain=domain) for domain in ['a.com', 'a.com', 'a.com', 'b.com', 'b.com']]
+        start = timezone.now()
+
+        plan = plan_schedule(emails, start, spread_hours=2, remaining_today=2, daily_limit=2)
+
+        self.assertEqual([email.recipient_domain for email, _ in plan], ['a.com', 'b.com', 'a.com', 'b.com', 'a.com'])
+        self.assertEqual([send_at - start for _, send_at in plan], [
+            timedelta(0), timedelta(hours=1), timedelta(days=1), timedelta(days=1, hours=1), timedelta(days=2),
+        ])
+
+    def test_plan_keeps_the_minimum_interval(self):
+        emails = [mock.Mock(recipient_domain=f'{i}.com') for i in range(3)]
+        start = timezone.now()
+
+        plan = plan_schedule(emails, start, spread_hours=0, remaining_today=5, daily_limit=5, min_interval_seconds=60)
+
+        self.assertEqual([send_at - start for _, send_at in plan], [timedelta(seconds=s) for s in (0, 60, 120)])
+
+    def test_one_email_per_domain_within_the_domain_interval(self):
+        self.queue('a@one.com', 'b@one.com', 'c@two.com')
+        scheduler = self.scheduler()
+
+        self.assertEqual(scheduler.run_once(), 2)
+        self.assertEqual(scheduler.run_once(), 0)
+        self.assertEqual(sorted(call.kwargs['to_email'] for call in scheduler.gmail_service.send_raw.call_args_list),
+                         ['a@one.com', 'c@two.com'])
+
+    @override_settings(SEND_USER_INTERVAL_SECONDS=30)
+    def test_one_email_per_user_interval(self):
+        self.queue('a@one.com', 'c@two.com')
+        scheduler = self.scheduler()
+
+        self.assertEqual(scheduler.run_once(), 1)
+        self.assertEqual(scheduler.run_once(), 0)
+
+    def test_unauthorized_user_is_paused(self):
+        self.queue('a@one.com')
+        scheduler = self.scheduler(authorized=False)
+
+        self.assertEqual(scheduler.run_once(), 0)
+        scheduler.run_once()
+        scheduler.gmail_service.is_user_authorized.assert_called_once()
+        self.assertEqual(GeneratedEmail.objects.get().status, GeneratedEmail.STATUS_AUTHORIZED)
+    def test_releasing_stale_claims_invalidates_counts(self):
+        email = self.create_email(GeneratedEmail.STATUS_SENDING)
+        GeneratedEmail.objects.filter(id=email.id).update(claimed_at=timezone.now() - timedelta(hours=1))
+        get_or_compute(self.user.id, EMAIL_COUNTS, lambda: 'before')
+
+        SendScheduler(gmail_service=mock.Mock()).run_once()
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, GeneratedEmail.STATUS_FAILED)
+        self.assertEqual(get_or_compute(self.user.id, EMAIL_COUNTS, lambda: 'after'), 'after')
+
+class SendQuotaTests(AccountsTestCase):
+    def test_reserve_grants_what_is_left(self):
+        quota = SendQuota(self.user)
+
+        self.assertEqual(quota.reserve(3), 3)
+        self.assertEqual(quota.reserve(3), 2)
+        self.assertEqual(quota.reserve(1), 0)
+        self.assertEqual(quota.status()['sent_today'], 5)
+
+    def test_release_returns_reservations(self):
+        quota = SendQuota(self.user)
+        quota.reserve(4)
+
+        quota.release(3)
+
+        self.assertEqual(quota.remaining(), 4)
+        quota.release(10)  # More than was reserved is ignored
+        self.assertEqual(quota.remaining(), 4)
+
+    def test_counter_rolls_over_on_a_new_day(self):
+        quota = SendQuota(self.user)
+        quota.reserve(5)
+        quota._profile().update(last_email_date=timezone.localdate() - timedelta(days=1))
+
+        self.assertEqual(quota.reserve(2), 2)
+        self.assertEqual(quota.status()['sent_today'], 2)
+
+
+class RunCheckpointTests(AccountsTestCase):
+    GENERATION_MODE = 'template'
+
+    def generate(self):
+        return self.client.post('/api/accounts/generate-emails/', {
+            'resume_id': self.resume.id, 'contact_list_id': self.contact_list.id,
+            'generation_mode': self.GENERATION_MODE,
+        }, format='json')
+
+    def test_retry_resumes_after_checkpoint(self):
+        generate_for_contact = EmailGenerationService.generate_for_contact
+        generated_rows = []
+
+        def failing_on_fourth(service, contact, *args):
+            if len(generated_rows) == 3:
+                raise RuntimeError("worker died")
+            generated_rows.append(contact['row_number'])
+            return generate_for_contact(service, contact, *args)
+
+        with mock.patch.object(EmailGenerationService, 'generate_for_contact', failing_on_fourth):
+            self.assertEqual(self.generate().status_code, 500)
+
+        run = GenerationRun.objects.get()
+        self.assertEqual(run.status, GenerationRun.STATUS_RUNNING)
+        self.assertEqual(run.processed_contacts, 3)
+        self.assertEqual(run.checkpoint_row, generated_rows[-1])
+        self.assertEqual(GeneratedEmail.objects.count(), 3)
+
+        with mock.patch.object(EmailGenerationService, 'generate_for_contact', autospec=True,
+                               side_effect=generate_for_contact) as resumed:
+            response = self.generate()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(resumed.call_count, self.CONTACTS - 3)
+        self.assertEqual(response.json()['resumed_from_row'], run.checkpoint_row)
+        self.assertEqual(len(response.json()['generated_emails']), self.CONTACTS)
+        run.refresh_from_db()
+        self.assertEqual(run.status, GenerationRun.STATUS_COMPLETE)
+        self.assertEqual(run.processed_contacts, self.CONTACTS)
+
+    def test_stale_holder_cannot_checkpoint_after_takeover(self):
+        run, acquired = start_inline_run(self.user, self.resume, self.contact_list, self.GENERATION_MODE)
+        self.assertTrue(acquired)
+        stale = RunCheckpoint(run)
+        result = {'contact': {'row_number': 2, 'name': 'A', 'email': 'a@example.com'},
+                  'subject': 'Hi', 'body': 'Body', 'success': True, 'error': None}
+
+        GenerationRun.objects.filter(id=run.id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        taken_over, acquired = start_inline_run(self.user, self.resume, self.contact_list, self.GENERATION_MODE)
+        self.assertTrue(acquired)
+        self.assertEqual(taken_over.id, run.id)
+
+        with self.assertRaises(LeaseLost):
+            stale(result)
+        with self.assertRaises(LeaseLost):
+            stale.complete()
+        stale.release()
+
+        run.refresh_from_db()
+        self.assertEqual(run.processed_contacts, 0)
+        self.assertEqual(run.lease_token, taken_over.lease_token)
+        self.assertFalse(GeneratedEmail.objects.exists())
+
+    def test_racing_start_shares_the_run(self):
+        run, acquired = start_inline_run(self.user, self.resume, self.contact_list, self.GENERATION_MODE)
+        first = QuerySet.first
+        missed = []
+
+        def miss_once(queryset):
+            # The racing request looked before the first one had created its run
+            if not missed:
+                missed.append(True)
+                return None
+            return first(queryset)
+
+        with mock.patch.object(QuerySet, 'first', miss_once):
+            raced, raced_acquired = start_inline_run(self.user, self.resume, self.contact_list, self.GENERATION_MODE)
+
+        self.assertTrue(acquired)
+        self.assertFalse(raced_acquired)
+        self.assertEqual(raced.id, run.id)
+        self.assertEqual(GenerationRun.objects.count(), 1)
+
+    def test_abandoned_run_in_another_mode_is_replaced(self):
+        run, _ = start_inline_run(self.user, self.resume, self.contact_list, self.GENERATION_MODE)
+
+        busy, acquired = start_inline_run(self.user, self.resume, self.contact_list, 'ai')
+        self.assertFalse(acquired)
+        self.assertEqual(busy.id, run.id)
+
+        GenerationRun.objects.filter(id=run.id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        replacement, acquired = start_inline_run(self.user, self.resume, self.contact_list, 'ai')
+
+        self.assertTrue(acquired)
+        self.assertNotEqual(replacement.id, run.id)
+        run.refresh_from_db()
+        self.assertEqual(run.status, GenerationRun.STATUS_CANCELLED)
+
+
+class GenerationWorkerTests(AccountsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.run = start_run(self.user, self.resume, self.contact_list, 'template')
+
+    def test_worker_that_lost_its_lease_writes_nothing(self):
+        generate_for_contact = EmailGenerationService.generate_for_contact
+
+        def taken_over(service, contact, *args):
+            # The lease expires mid-generation and another worker claims the contact
+            GenerationTask.objects.filter(run=self.run, row_number=contact['row_number']).update(lease_owner='other')
+            return generate_for_contact(service, contact, *args)
+
+        worker = GenerationWorker(owner='slow', batch_size=1)
+        with mock.patch.object(EmailGenerationService, 'generate_for_contact', taken_over):
+            self.assertEqual(worker.run_once(), 0)
+
+        self.assertFalse(GeneratedEmail.objects.exists())
+        task = GenerationTask.objects.get(run=self.run, row_number=2)
+        self.assertEqual((task.status, task.lease_owner), (GenerationTask.STATUS_LEASED, 'other'))
+
+    def test_expired_leases_are_claimed_again(self):
+        crashed = GenerationTask.objects.claim('crashed', 2, timedelta(minutes=2))
+        worker = GenerationWorker(owner='worker', batch_size=self.CONTACTS)
+
+        self.assertEqual(worker.run_once(), self.CONTACTS - 2)
+        self.assertEqual(worker.run_once(), 0)  # The crashed worker's leases still hold
+
+        expired = timezone.now() - timedelta(seconds=1)
+        GenerationTask.objects.filter(lease_owner='crashed').update(lease_expires_at=expired)
+        self.assertEqual(worker.run_once(), 2)
+
+        retried = GenerationTask.objects.filter(id__in=[task.id for task in crashed])
+        self.assertEqual(set(retried.values_list('status', 'attempts')), {(GenerationTask.STATUS_DONE, 2)})
+        self.assertEqual(GeneratedEmail.objects.count(), self.CONTACTS)
+        self.run.refresh_from_db()
+        self.assertEqual(self.run.status, GenerationRun.STATUS_COMPLETE)
+
+    def test_contact_is_abandoned_after_max_attempts(self):
+        expired = timezone.now() - timedelta(seconds=1)
+        GenerationTask.objects.filter(run=self.run, row_number=2).update(
+            status=GenerationTask.STATUS_LEASED, lease_owner='crashed', lease_expires_at=expired, attempts=2
+        )
+
+        self.assertEqual(GenerationWorker(owner='worker', batch_size=self.CONTACTS, max_attempts=2).run_once(),
+                         self.CONTACTS - 1)
+
+        task = GenerationTask.objects.get(run=self.run, row_number=2)
+        self.assertEqual((task.status, task.error), (GenerationTask.STATUS_FAILED, "Abandoned after 2 attempts"))
+        self.run.refresh_from_db()
+        self.assertEqual(self.run.status, GenerationRun.STATUS_COMPLETE)
+
+    def test_regenerating_leaves_reviewed_emails_alone(self):
+        draft = self.create_email(GeneratedEmail.STATUS_DRAFT, 'person0@company0.com')
+        authorized = self.create_email(GeneratedEmail.STATUS_AUTHORIZED, 'person1@company1.com')
+        GeneratedEmail.objects.filter(id=authorized.id).update(rendered_message='rendered')
+
+        GenerationWorker(owner='worker', batch_size=self.CONTACTS).run_once()
+
+        draft.refresh_from_db()
+        authorized.refresh_from_db()
+        self.assertNotEqual(draft.email_subject, 'Hello')
+        self.assertEqual((authorized.email_subject, authorized.rendered_message), ('Hello', 'rendered'))
+        self.assertEqual(authorized.status, GeneratedEmail.STATUS_AUTHORIZED)
+        self.assertEqual(GeneratedEmail.objects.count(), self.CONTACTS)
+
+
+class ChunkedUploadTests(AccountsTestCase):
+    CSV = b"name,email,company,position\nPerson,person@company.com,Company,Engineer\n"
+
+    def upload(self, data=CSV):
+        response = self.client.post('/api/accounts/upload/chunked/', {
+            'kind': UploadSession.KIND_CONTACT_LIST, 'filename': 'contacts.csv', 'size': len(data)
+        }, format='json')
+        upload_id = response.data['id']
+        response = self.client.generic(
+            'PUT', f'/api/accounts/upload/chunked/{upload_id}/', data,
+            content_type='application/octet-stream', HTTP_UPLOAD_OFFSET='0'
+        )
+        self.assertEqual(response.status_code, 200)
+        return UploadSession.objects.get(id=upload_id)
+
+    def complete(self, session, **data):
+        return self.client.post(f'/api/accounts/upload/chunked/{session.id}/complete/', data, format='json')
+
+    def test_complete_creates_contact_list_once(self):
+        session = self.upload()
+        first = self.complete(session)
+        self.assertEqual(first.status_code, 201)
+        retry = self.complete(session)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.data['contact_list']['id'], first.data['contact_list']['id'])
+        self.assertEqual(ContactList.objects.filter(user=self.user).count(), 2)
+
+    def test_complete_while_claimed_conflicts(self):
+        session = self.upload()
+        UploadSession.objects.filter(id=session.id).update(status=UploadSession.STATUS_COMPLETING)
+        response = self.complete(session)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(ContactList.objects.filter(user=self.user).count(), 1)
+
+    def test_checksum_mismatch_reopens_upload(self):
+        session = self.upload()
+        response = self.complete(session, sha256='0' * 64)
+        self.assertEqual(response.status_code, 400)
+        session.refresh_from_db()
+        self.assertEqual((session.status, session.received_size), (UploadSession.STATUS_OPEN, 0))
+
+
+class PrerenderTests(AccountsTestCase):
+    def test_bulk_authorize_by_status_filter_prerenders(self):
+        email = self.create_email(GeneratedEmail.STATUS_VERIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/accounts/generated-emails/bulk/', {
+                'action': 'authorize', 'filter': {'status': GeneratedEmail.STATUS_VERIFIED}
+            }, format='json')
+
+        self.assertEqual(response.data['updated_count'], 1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, GeneratedEmail.STATUS_AUTHORIZED)
+        self.assertTrue(email.rendered_message)
+
+    def test_authorize_prerenders(self):
+        email = self.create_email(GeneratedEmail.STATUS_VERIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/accounts/authorize-emails/', {'email_ids': [email.id]}, format='json')
+
+        email.refresh_from_db()
+        self.assertTrue(email.rendered_message)
+
+
+class SkillMatcherTests(SimpleTestCase):
+    def setUp(self):
+        self.matcher = SkillMatcher(DEFAULT_SKILLS_TAXONOMY)
+
+    def test_profile_counts_mentions_across_aliases(self):
+        profile = self.matcher.extract("Built React.js apps with Python; Python services on Postgres and MySQL.")
+
+        self.assertEqual(profile, [
+            {'name': 'Python', 'category': 'language', 'mentions': 2},
+            {'name': 'SQL', 'category': 'data', 'mentions': 2},
+            {'name': 'JavaScript/React', 'category': 'frontend', 'mentions': 1},
+        ])
+
+    def test_express_needs_its_library_name(self):
+        self.assertEqual(self.matcher.extract("I would like to express my interest"), [])
+        self.assertEqual([skill['name'] for skill in self.matcher.extract("REST APIs in Express.js")], ['Node.js'])
+
+
+class MetricsTests(AccountsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.metrics_dir, ignore_errors=True)
+
+    def write_snapshot(self, name, value, age=0):
+        path = os.path.join(self.metrics_dir, f'{name}.json')
+        with open(path, 'w') as f:
+            json.dump({'buckets': list(DEFAULT_BUCKETS), 'counters': [['jobs_total', [], value]], 'histograms': []}, f)
+        if age:
+            os.utime(path, (time.time() - age, time.time() - age))
+
+    @override_settings(METRICS_TOKEN='', METRICS_PUBLIC=False)
+    def test_endpoint_is_closed_without_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with self.settings(METRICS_PUBLIC=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_endpoint_checks_token(self):
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token').status_code, 200)
+
+    def test_spans_record_durations_and_errors(self):
+        metrics = MetricsRegistry()
+        tracer = MetricsTracer(metrics)
+
+        with tracer.start_span('csv_parse', {}):
+            pass
+        with self.assertRaises(ValueError):
+            with tracer.start_span('csv_parse', {}):
+                raise ValueError("bad row")
+
+        output = metrics.render()
+        self.assertIn('jobreach_stage_duration_seconds_count{stage="csv_parse"} 2', output)
+        self.assertIn('jobreach_stage_errors_total{error="ValueError",stage="csv_parse"} 1', output)
+
+    @override_settings(TRACING_ENABLED=False)
+    def test_spans_are_noops_when_disabled(self):
+        self.assertIs(span('csv_parse'), NOOP_SPAN)
+
+    def test_prune_retires_exited_processes_and_ages_out_other_hosts(self):
+        host = socket.gethostname()
+        exited = subprocess.Popen(['true'])
+        exited.wait()
+        self.write_snapshot(f'{host}-{exited.pid}-aaaaaaaa', 2)
+        self.write_snapshot(f'{host}-{os.getppid()}-bbbbbbbb', 3)  # Still running
+        self.write_snapshot('other-host-123-cccccccc', 5)
+        self.write_snapshot('gone-host-123-dddddddd', 7, age=7200)
+        registry = MetricsRegistry()
+
+        with self.settings(METRICS_DIR=self.metrics_dir, METRICS_STALE_SECONDS=3600):
+            first = registry.render()
+            second = registry.render()
+
+        self.assertIn('jobs_total 10', first)
+        self.assertEqual(first, second)
+        self.assertEqual({name for name in os.listdir(self.metrics_dir) if name.endswith('.json')}, {
+            f'{host}-{os.getppid()}-bbbbbbbb.json', f'{host}.retired.json', 'other-host-123-cccccccc.json',
+        })
+
+
+class DocumentWorkerTests(SimpleTestCase):
+    @unittest.skipUnless(hasattr(os, 'fork'), "resource limits are POSIX only")
+    def test_pool_workers_run_under_limits(self):
+        import resource
+
+        pool = DocumentParserPool(processes=1, cpu_seconds=7, memory_mb=256, timeout=30)
+        self.addCleanup(pool.close)
+        workers = pool._get_pool()
+
+        self.assertEqual(workers.apply_async(resource.getrlimit, (resource.RLIMIT_CPU,)).get(30), (7, 8))
+        self.assertEqual(workers.apply_async(resource.getrlimit, (resource.RLIMIT_AS,)).get(30),
+                         (256 * 1024 * 1024, 256 * 1024 * 1024))
+        with self.assertRaises(MemoryError):
+            workers.apply_async(bytearray, (512 * 1024 * 1024,)).get(30)
+        self.assertEqual(pool.parse('/nonexistent/resume.txt')['status'], PARSE_ERROR)
+
+    def test_limits_are_reported_through_parser_errors(self):
+        def wrapped(limit):
+            def extract(path):
+                try:
+                    raise limit
+                except type(limit):
+                    raise ValueError("Error reading PDF")
+            return extract
+
+        target = 'accounts.email_generation.DocumentParser.extract_resume_text'
+        for limit, expected in [(MemoryError(), PARSE_MEMORY_EXCEEDED), (_CPULimitExceeded(), PARSE_TIMEOUT)]:
+            with mock.patch(target, side_effect=limit):
+                self.assertEqual(_parse_in_worker('resume.pdf')['status'], expected)
+            with mock.patch(target, side_effect=wrapped(limit)):
+                self.assertEqual(_parse_in_worker('resume.pdf')['status'], expected)
+
+
+class ResumeParsingTests(AccountsTestCase):
+    def upload(self, content=b'%PDF-1.4 resume'):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/accounts/upload/resume/', {
+                'file': SimpleUploadedFile('cv.pdf', content, content_type='application/pdf')
+            }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return Resume.objects.get(id=response.data['resume']['id'])
+
+    @mock.patch('accounts.document_worker.parse_document',
+                return_value={'status': 'ok', 'text': 'Senior Django and Python engineer', 'error': None})
+    def test_upload_parses_resume_in_background(self, parse_document):
+        resume = self.upload()
+
+        parse_document.assert_called_once()
+        self.assertEqual(resume.parse_status, Resume.PARSE_READY)
+        self.assertEqual(resume.extracted_text, 'Senior Django and Python engineer')
+        self.assertEqual([skill['name'] for skill in resume.skills], ['Python', 'Django'])
+
+    @mock.patch('accounts.document_worker.parse_document',
+                return_value={'status': 'timeout', 'text': '', 'error': 'Document parsing timed out'})
+    def test_failed_parse_is_recorded(self, parse_document):
+        resume = self.upload()
+
+        self.assertEqual((resume.parse_status, resume.parse_error), (Resume.PARSE_FAILED, 'Document parsing timed out'))
+
+    @mock.patch('accounts.document_worker.parse_document',
+                return_value={'status': 'ok', 'text': 'Senior Django and Python engineer', 'error': None})
+    def test_identical_upload_reuses_earlier_parse(self, parse_document):
+        first = self.upload()
+        second = self.upload()
+
+        parse_document.assert_called_once()
+        self.assertEqual(second.file.name, first.file.name)
+        self.assertEqual(FileBlob.objects.get(name=first.file.name).ref_count, 2)
+        self.assertEqual((second.parse_status, second.extracted_text, second.skills),
+                         (Resume.PARSE_READY, first.extracted_text, first.skills))
+
+
+class TemplateEngineTests(AccountsTestCase):
+    def test_compile_rejects_unknown_placeholders_and_format_options(self):
+        with self.assertRaisesMessage(ValueError, "Unknown template placeholder '{salary}'"):
+            CompiledTemplate("Offer: {salary}")
+        with self.assertRaisesMessage(ValueError, "Format options are not supported"):
+            CompiledTemplate("Hi {name!r}")
+        self.assertEqual(CompiledTemplate("{{literal}} {company}").render({'company': 'Acme'}), "{literal} Acme")
+
+    def test_render_fills_contact_skills_and_signature(self):
+        template = EmailTemplate(
+            name='Short', template_type='software',
+            subject_template="{position} at {company}", body_template="Hi {name}, I know {skills}.\n{sender_signature}",
+        )
+        self.user.email = 'alice@example.com'
+        skills = [{'name': 'Django', 'category': 'framework', 'mentions': 3},
+                  {'name': 'Python', 'category': 'language', 'mentions': 2},
+                  {'name': 'SQL', 'category': 'data', 'mentions': 1}]
+
+        subject, body = TemplateEngine(template, sender=self.user).render(
+            {'name': 'Bob', 'company': 'Acme', 'position': ''}, skills
+        )
+
+        self.assertEqual(subject, "available positions at Acme")
+        self.assertEqual(body, "Hi Bob, I know Django, Python.\nAlice\nalice@example.com")
+
+    def test_generation_rejects_template_that_does_not_compile(self):
+        template = EmailTemplate.objects.create(
+            name='Broken', template_type='general', subject_template="Hello {nickname}", body_template="Body"
+        )
+
+        response = self.client.post('/api/accounts/generate-emails/', {
+            'resume_id': self.resume.id, 'contact_list_id': self.contact_list.id,
+            'generation_mode': 'template', 'template_id': template.id,
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("{nickname}", str(response.data))
+        self.assertFalse(GeneratedEmail.objects.exists())
+
+
+@override_settings(PROFILING_ENABLED=False, PROFILING_ALLOW_HEADER=True, PROFILING_CPROFILE_DIR='')
+class QueryProfilingTests(AccountsTestCase):
+    def test_profiled_request_reports_queries(self):
+        response = self.client.get('/api/accounts/generated-emails/', HTTP_X_PROFILE='1')
+
+        self.assertGreater(int(response['X-Query-Count']), 0)
+        for header in ('X-Query-Time-Ms', 'X-Duplicate-Queries', 'X-View-Time-Ms'):
+            self.assertIn(header, response)
+        self.assertNotIn('X-Query-Count', self.client.get('/api/accounts/generated-emails/'))
+
+    def test_sampled_request_dumps_cprofile_stats(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+
+        with self.settings(PROFILING_CPROFILE_DIR=directory, PROFILING_CPROFILE_SAMPLE_RATE=1.0):
+            self.client.get('/api/accounts/generated-emails/', HTTP_X_PROFILE='1')
+
+        self.assertEqual([name.endswith('.prof') for name in os.listdir(directory)], [True])
+
+    def test_recorder_separates_duplicate_and_similar_queries(self):
+        recorder = _QueryRecorder()
+        execute = mock.Mock()
+        for params in [(1,), (1,), (2,)]:
+            recorder(execute, 'SELECT * FROM t WHERE id = %s', params, False, {})
+
+        self.assertEqual(recorder.count, 3)
+        self.assertEqual(recorder.duplicates(), {'SELECT * FROM t WHERE id = %s': 2})
+        self.assertEqual(recorder.similar(), {'SELECT * FROM t WHERE id = %s': 3})
+
+
+class ExportTests(AccountsTestCase):
+    def export(self, export_format, query=''):
+        response = self.client.get(f'/api/accounts/generated-emails/export/{export_format}/{query}')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_escapes_formulas(self):
+        email = self.create_email()
+        GeneratedEmail.objects.filter(id=email.id).update(
+            recipient_name='=HYPERLINK("http://evil.example")', email_subject='-1+2', email_body='@SUM(A1)'
+        )
+
+        rows = list(csv.DictReader(io.StringIO(self.export('csv'))))
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['recipient_name'], '\'=HYPERLINK("http://evil.example")')
+        self.assertEqual((rows[0]['email_subject'], rows[0]['email_body']), ("'-1+2", "'@SUM(A1)"))
+        self.assertEqual(rows[0]['sent_at'], '')
+
+    def test_ndjson_keeps_values_and_applies_filters(self):
+        self.create_email(GeneratedEmail.STATUS_DRAFT, 'draft@example.com')
+        sent = self.create_email(GeneratedEmail.STATUS_SENT, 'sent@example.com')
+        GeneratedEmail.objects.filter(id=sent.id).update(email_subject='=1+1')
+
+        lines = self.export('ndjson', '?status=sent').splitlines()
+
+        self.assertEqual(len(lines), 1)
+        row = json.loads(lines[0])
+        self.assertEqual((row['id'], row['email_subject'], row['sent_at']), (sent.id, '=1+1', None))
+        self.assertTrue(row['generated_at'].endswith('Z'))
+
+    def test_unknown_format_is_rejected(self):
+        self.assertEqual(self.client.get('/api/accounts/generated-emails/export/xlsx/').status_code, 400)
+
+
+class RowSerializerTests(AccountsTestCase):
+    def setUp(self):
+        super().setUp()
+        for status in [GeneratedEmail.STATUS_DRAFT, GeneratedEmail.STATUS_AUTHORIZED, GeneratedEmail.STATUS_SENT]:
+            self.create_email(status, f'{status}@example.com')
+        GeneratedEmail.objects.filter(status=GeneratedEmail.STATUS_SENT).update(
+            sent_at=timezone.now(), address_check='valid', address_checked_at=timezone.now()
+        )
+        self.emails = GeneratedEmail.objects.order_by('id')
+
+    def test_rows_match_drf_serializer(self):
+        expected = GeneratedEmailSerializer(self.emails, many=True).data
+
+        self.assertEqual(generated_email_rows.serialize(self.emails), expected)
+        self.assertEqual(generated_email_rows.serialize_instances(list(self.emails)), expected)
+
+    def test_rows_match_drf_serializer_outside_utc(self):
+        with timezone.override('America/New_York'):
+            expected = GeneratedEmailSerializer(self.emails, many=True).data
+            self.assertEqual(generated_email_rows.serialize(self.emails), expected)
+
+    def test_fast_renderer_matches_json_renderer(self):
+        data = {'emails': generated_email_rows.serialize(self.emails), 'message': 'ok'}
+
+        self.assertEqual(json.loads(FastJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+
+    def test_unsupported_fields_are_rejected(self):
+        with self.assertRaisesMessage(TypeError, "FileField is not supported"):
+            RowSerializer(ResumeSerializer)
+
+
+class UserCacheTests(AccountsTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()  # Cached reads would otherwise carry over between tests
+
+    def resumes(self):
+        return {resume['id']: resume['parse_status'] for resume in self.client.get('/api/accounts/upload/resume/').data}
+
+    def counts(self):
+        return self.client.get('/api/accounts/generated-emails/counts/').data['by_status']
+
+    def test_reads_are_cached_until_a_write(self):
+        self.assertEqual(self.counts()[GeneratedEmail.STATUS_DRAFT], 0)
+        self.create_email()
+        self.assertEqual(self.counts()[GeneratedEmail.STATUS_DRAFT], 0)
+
+    @mock.patch('accounts.document_worker.parse_document',
+                return_value={'status': 'ok', 'text': 'Python developer', 'error': None})
+    def test_resume_writes_invalidate_resume_list(self, parse_document):
+        self.assertEqual(list(self.resumes()), [self.resume.id])
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post('/api/accounts/upload/resume/', {
+                'file': SimpleUploadedFile('cv.pdf', b'%PDF-1.4 cv', content_type='application/pdf')
+            }, format='multipart')
+        uploaded = response.data['resume']['id']
+        self.assertEqual(self.resumes()[uploaded], Resume.PARSE_PENDING)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.resumes()[uploaded], Resume.PARSE_READY)
+
+        self.client.delete(f'/api/accounts/upload/resume/{uploaded}/')
+        self.assertEqual(list(self.resumes()), [self.resume.id])
+
+    def test_contact_list_writes_invalidate_contact_lists(self):
+        def contact_lists():
+            return [item['id'] for item in self.client.get('/api/accounts/upload/csv/').data]
+
+        self.assertEqual(contact_lists(), [self.contact_list.id])
+        response = self.client.post('/api/accounts/upload/csv/', {
+            'file': SimpleUploadedFile('more.csv', b"name,email\nBob,bob@example.com\n", content_type='text/csv')
+        }, format='multipart')
+        uploaded = response.data['contact_list']['id']
+        self.assertEqual(sorted(contact_lists()), sorted([self.contact_list.id, uploaded]))
+
+        self.client.delete(f'/api/accounts/upload/csv/{uploaded}/')
+        self.assertEqual(contact_lists(), [self.contact_list.id])
+
+    def test_email_writes_invalidate_counts(self):
+        email = self.create_email(GeneratedEmail.STATUS_VERIFIED)
+        self.assertEqual(self.counts()[GeneratedEmail.STATUS_VERIFIED], 1)
+
+        self.client.post('/api/accounts/authorize-emails/', {'email_ids': [email.id]}, format='json')
+        self.assertEqual(self.counts()[GeneratedEmail.STATUS_AUTHORIZED], 1)
+
+        self.client.post('/api/accounts/generated-emails/bulk/', {'action': 'revoke', 'email_ids': [email.id]},
+                         format='json')
+        self.assertEqual(self.counts()[GeneratedEmail.STATUS_VERIFIED], 1)
+
+        self.client.put(f'/api/accounts/generated-emails/{email.id}/', {'email_subject': 'Changed'}, format='json')
+        self.assertEqual(self.counts()[GeneratedEmail.STATUS_DRAFT], 1)
+
+        self.client.delete(f'/api/accounts/generated-emails/{email.id}/')
+        self.assertEqual(self.client.get('/api/accounts/generated-emails/counts/').data['total'], 0)
+
+
+@mock.patch.object(GmailService, 'get_user_profile', return_value={'email': 'alice@gmail.com'})
+@mock.patch.object(GmailService, 'is_user_authorized', return_value=True)
+class GmailStatusCacheTests(AccountsTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def status(self):
+        return self.client.get('/api/accounts/gmail/status/').data
+
+    def test_status_is_cached_until_revoked(self, is_user_authorized, get_user_profile):
+        for _ in range(3):
+            self.assertEqual(self.status(), {'authorized': True, 'profile': {'email': 'alice@gmail.com'}})
+        self.assertEqual((is_user_authorized.call_count, get_user_profile.call_count), (1, 1))
+
+        is_user_authorized.return_value = False
+        self.client.post('/api/accounts/gmail/revoke/')
+        self.assertEqual(self.status(), {'authorized': False, 'profile': None})
+        self.assertEqual((is_user_authorized.call_count, get_user_profile.call_count), (2, 1))
+
+    def test_mock_authorization_invalidates_status(self, is_user_authorized, get_user_profile):
+        is_user_authorized.return_value = False
+        self.assertFalse(self.status()['authorized'])
+
+        is_user_authorized.return_value = True
+        self.client.post('/api/accounts/gmail/mock-auth/')
+        self.assertTrue(self.status()['authorized'])
+
+    def test_rejected_refresh_token_invalidates_status(self, is_user_authorized, get_user_profile):
+        service = GmailService()
+        self.assertTrue(service.cached_is_authorized(self.user.id))
+
+        is_user_authorized.return_value = False
+        with mock.patch.object(GmailService, '_get_user_credentials', side_effect=RefreshError('invalid_grant')):
+            with self.assertRaises(RefreshError):
+                service.send_raw(self.user.id, 'raw', to_email='hr@example.com')
+        self.assertFalse(service.cached_is_authorized(self.user.id))
+
+
+class AttachmentTests(AccountsTestCase):
+    def test_attach_to_round_trips_through_email_parser(self):
+        raw = render_raw('hr@example.com', 'Héllo from Alice', 'Hi there,\nsee my résumé.', from_name='Alice')
+        plain = message_from_bytes(base64.urlsafe_b64decode(raw), policy=default)
+        for content in [b'', b'%', b'%P', b'%PDF-1.4\n' + bytes(range(256)) * 20]:
+            attachment = EncodedAttachment(content, 'résumé.pdf', 'application/pdf')
+
+            message = message_from_bytes(base64.urlsafe_b64decode(attachment.attach_to(raw)), policy=default)
+
+            self.assertEqual(message.defects, [])
+            self.assertEqual((message['To'], message['Subject']), ('hr@example.com', 'Héllo from Alice'))
+            self.assertEqual(message.get_content_type(), 'multipart/mixed')
+            text, attached = message.iter_parts()
+            self.assertEqual(text.get_content(), plain.get_content())
+            self.assertEqual(attached.get_filename(), 'résumé.pdf')
+            self.assertEqual(attached.get_content_type(), 'application/pdf')
+            self.assertEqual(attached.get_content(), content)
+
+    def test_resume_is_encoded_once_for_every_email(self):
+        first = self.create_email(recipient='a@example.com')
+        second = self.create_email(recipient='b@example.com')
+
+        attachments = resume_attachments([first, second])
+
+        self.assertEqual(list(attachments), [self.resume.id])
+        self.assertIs(resume_attachments([second])[self.resume.id], attachments[self.resume.id])
+        os.remove(self.resume.file.path)
+        self.assertEqual(resume_attachments([first]), {})
+
+
+class ContentAddressedStorageTests(AccountsTestCase):
+    def test_blob_is_deleted_with_its_last_reference(self):
+        storage = ContentAddressedStorage()
+        first = storage.save('cv.pdf', ContentFile(b'%PDF shared'))
+        second = storage.save('other-name.PDF', ContentFile(b'%PDF shared'))
+
+        self.assertEqual(first, second)
+        self.assertTrue(storage.is_blob(first))
+        self.assertEqual(FileBlob.objects.get(name=first).ref_count, 2)
+
+        storage.delete(first)
+        self.assertTrue(storage.exists(first))
+        self.assertEqual(FileBlob.objects.get(name=first).ref_count, 1)
+
+        storage.delete(second)
+        self.assertFalse(storage.exists(first))
+        self.assertFalse(FileBlob.objects.filter(name=first).exists())
+
+    def test_deleting_upload_removes_its_emails_and_releases_the_file(self):
+        copy = Resume.objects.create(
+            user=self.user, file=ContentFile(b'%PDF resume', name='copy.pdf'), original_filename='copy.pdf'
+        )
+        self.create_email(recipient='a@example.com')
+        self.create_email(recipient='b@example.com')
+        name = self.resume.file.name
+        self.assertEqual(copy.file.name, name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/accounts/upload/resume/{self.resume.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(GeneratedEmail.objects.exists())
+        self.assertTrue(copy.file.storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/accounts/upload/resume/{copy.id}/')
+        self.assertFalse(copy.file.storage.exists(name))
+        self.assertFalse(FileBlob.objects.filter(name=name).exists())
@@ -0,0 +1,435 @@
+import atexit
+import bisect
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # pragma: no cover - OpenTelemetry is optional
+    otel_trace = None
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not on Windows
+    fcntl = None
+
+
+# Histogram buckets in seconds, from fast DB writes up to slow LLM completions
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_DURATION_METRIC = 'jobreach_stage_duration_seconds'
+STAGE_ERRORS_METRIC = 'jobreach_stage_errors_total'
+
+# Snapshot of the processes on one host that have exited, in METRICS_DIR next to the live ones
+RETIRED_SUFFIX = '.retired.json'
+
+
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters and histograms rendered in Prometheus text format.
+
+    Each process records into its own registry. With METRICS_DIR unset, render()
+    only covers the process serving /metrics, so anything recorded by other web
+    workers, send_worker or generation_worker is missing. With METRICS_DIR set,
+    every process writes a snapshot of its metrics to a file there at most every
+    METRICS_FLUSH_SECONDS (and on exit), and render() adds up all the snapshots
+    in the directory, like the Prometheus client's multiprocess mode.
+
+    Snapshot files are named <host>-<pid>-<random>.json. Before reading them,
+    collect() folds the files of processes on this host that have exited into
+    <host>.retired.json, so their counts survive without a file per process,
+    and deletes files from other hosts not written for METRICS_STALE_SECONDS.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> _Histogram
+        self._help = {}
+        self._flush_lock = threading.Lock()
+        self._flushed_at = 0.0
+        self._instance = None  # Names this process's snapshot file; new per process
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items())) if labels else ()
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def increment(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+        self.flush()
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+        self.flush()
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def _after_fork(self):
+        # A forked child starts empty, or it would report its parent's metrics a second time
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._flushed_at = 0.0
+        self._instance = None
+
+    def snapshot(self):
+        """This process's metrics as JSON-serializable data."""
+        with self._lock:
+            return {
+                'buckets': list(self.buckets),
+                'counters': [[name, labels, value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, labels, list(h.counts), h.sum, h.count]
+                               for (name, labels), h in self._histograms.items()],
+            }
+
+    def _snapshot_path(self, directory):
+        if self._instance is None:
+            self._instance = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        return os.path.join(directory, f"{self._instance}.json")
+
+    def flush(self, force=False):
+        """
+        Write this process's snapshot to METRICS_DIR, if it is set. Unless forced,
+        writes at most once every METRICS_FLUSH_SECONDS. Returns whether it wrote.
+        """
+        directory = getattr(settings, 'METRICS_DIR', '')
+        if not directory or not (self._counters or self._histograms):
+            return False
+        now = time.monotonic()
+        if not force and now - self._flushed_at < getattr(settings, 'METRICS_FLUSH_SECONDS', 10):
+            return False
+        if not self._flush_lock.acquire(blocking=force):
+            return False  # Another thread is writing it right now
+        try:
+            self._flushed_at = now
+            os.makedirs(directory, exist_ok=True)
+            path = self._snapshot_path(directory)
+            with open(path + '.tmp', 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(path + '.tmp', path)  # Readers never see a half-written file
+        finally:
+            self._flush_lock.release()
+        return True
+
+    @staticmethod
+    def _pid_alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True  # Exists, but belongs to another user
+        return True
+
+    def prune(self, directory):
+        """Retire the snapshots of exited processes on this host and drop stale ones from other hosts."""
+        host = socket.gethostname()
+        max_age = getattr(settings, 'METRICS_STALE_SECONDS', 3600)
+        now = time.time()
+        exited = []
+        for entry in os.scandir(directory):
+            if not entry.name.endswith('.json') or entry.name.endswith(RETIRED_SUFFIX):
+                continue
+            parts = entry.name[:-len('.json')].rsplit('-', 2)
+            if len(parts) != 3 or not parts[1].isdigit():
+                continue  # Not a snapshot
+            if parts[0] == host:
+                if int(parts[1]) != os.getpid() and not self._pid_alive(int(parts[1])):
+                    exited.append(entry.path)
+                continue
+            try:
+                if now - entry.stat().st_mtime > max_age:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass  # Another scrape removed it first
+        if exited and fcntl is not None:
+            self._retire(directory, host, exited)
+
+    def _retire(self, directory, host, paths):
+        """Add the snapshots at `paths` into this host's retired snapshot and delete them."""
+        retired_path = os.path.join(directory, host + RETIRED_SUFFIX)
+        with open(os.path.join(directory, host + '.lock'), 'w') as lock:
+            # Scrapes on this host take turns, so no snapshot is added twice
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            snapshots = []
+            for path in [retired_path, *paths]:
+                try:
+                    with open(path) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue  # Already retired by another scrape, or unreadable
+            counters, histograms = self._merge(snapshots)
+            retired = {
+                'buckets': list(self.buckets),
+                'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+                'histograms': [[name, labels, counts, total, count]
+                               for (name, labels), (counts, total, count) in histograms.items()],
+            }
+            with open(retired_path + '.tmp', 'w') as f:
+                json.dump(retired, f)
+            os.replace(retired_path + '.tmp', retired_path)
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def collect(self):
+        """Snapshots of this process and, with METRICS_DIR set, of every other process that flushed there."""
+        snapshots = [self.snapshot()]
+        directory = getattr(settings, 'METRICS_DIR', '')
+        if not directory or not os.path.isdir(directory):
+            return snapshots
+        self.prune(directory)
+        own = os.path.basename(self._snapshot_path(directory))
+        for entry in os.scandir(directory):
+            if not entry.name.endswith('.json') or entry.name == own:
+                continue
+            try:
+                with open(entry.path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # Removed or replaced while we were reading it
+        return snapshots
+
+    @staticmethod
+    def _format_labels(labels, extra=None):
+        pairs = list(labels) + (list(extra.items()) if extra else [])
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{key}="{_escape_label_value(value)}"' for key, value in pairs) + '}'
+
+    def _merge(self, snapshots):
+        """Add up snapshots: counters by value, histograms bucket by bucket."""
+        counters, histograms = {}, {}
+        for snapshot in snapshots:
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            if tuple(snapshot['buckets']) != self.buckets:
+                continue  # Written with other buckets; can't be added up
+            for name, labels, counts, total, count in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                merged = histograms.setdefault(key, [[0] * len(counts), 0.0, 0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+                merged[2] += count
+        return counters, histograms
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format."""
+        counters, histograms = self._merge(self.collect())
+        counters = sorted(counters.items())
+        histograms = sorted(
+            ((key, counts, total, count) for key, (counts, total, count) in histograms.items()),
+            key=lambda item: item[0]
+        )
+
+        lines = []
+        declared = set()
+
+        def declare(name, metric_type):
+            if name not in declared:
+                declared.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {metric_type}")
+
+        for (name, labels), value in counters:
+            declare(name, 'counter')
+            lines.append(f"{name}{self._format_labels(labels)} {value}")
+
+        for (name, labels), counts, total, count in histograms:
+            declare(name, 'histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{self._format_labels(labels, {'le': repr(bound)})} {cumulative}")
+            lines.append(f"{name}_bucket{self._format_labels(labels, {'le': '+Inf'})} {count}")
+            lines.append(f"{name}_sum{self._format_labels(labels)} {total}")
+            lines.append(f"{name}_count{self._format_labels(labels)} {count}")
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+registry.describe(STAGE_DURATION_METRIC, "Duration of pipeline stages in seconds.")
+registry.describe(STAGE_ERRORS_METRIC, "Pipeline stages that raised an exception.")
+os.register_at_fork(after_in_child=registry._after_fork)
+atexit.register(registry.flush, force=True)
+
+
+class _NoopSpan:
+    """Returned when tracing is disabled; every operation is a no-op."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _MetricsSpan:
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.tracer.finish(self, time.perf_counter() - self._start, exc_value)
+        return False
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+
+class MetricsTracer:
+    """Default tracer: records each span's duration into the metrics registry."""
+
+    def __init__(self, metrics=None):
+        self.metrics = metrics or registry
+
+    def start_span(self, name, attributes):
+        return _MetricsSpan(self, name, attributes)
+
+    def finish(self, span, duration, error):
+        self.metrics.observe(STAGE_DURATION_METRIC, duration, stage=span.name)
+        if error is not None:
+            self.metrics.increment(STAGE_ERRORS_METRIC, stage=span.name, error=type(error).__name__)
+
+
+class _OpenTelemetrySpan(_MetricsSpan):
+    def __enter__(self):
+        self._otel = self.tracer.otel_tracer.start_as_current_span(self.name, attributes=self.attributes)
+        self._otel_span = self._otel.__enter__()
+        return super().__enter__()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        super().__exit__(exc_type, exc_value, traceback)
+        self._otel.__exit__(exc_type, exc_value, traceback)
+        return False
+
+    def set_attribute(self, key, value):
+        super().set_attribute(key, value)
+        self._otel_span.set_attribute(key, value)
+
+
+class OpenTelemetryTracer(MetricsTracer):
+    """Emits OpenTelemetry spans (exported by the app's configured SDK) as well as metrics."""
+
+    def __init__(self, metrics=None):
+        if otel_trace is None:
+            raise ImportError("TRACING_BACKEND='opentelemetry' requires the opentelemetry-api package")
+        super().__init__(metrics)
+        self.otel_tracer = otel_trace.get_tracer('jobreach')
+
+    def start_span(self, name, attributes):
+        return _OpenTelemetrySpan(self, name, attributes)
+
+
+TRACER_BACKENDS = {
+    'metrics': MetricsTracer,
+    'opentelemetry': OpenTelemetryTracer,
+}
+
+_tracer = None
+_tracer_loaded = False
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """Return the configured tracer, or None when TRACING_ENABLED is off."""
+    global _tracer, _tracer_loaded
+    if _tracer_loaded:
+        return _tracer
+
+    with _tracer_lock:
+        if not _tracer_loaded:
+            tracer = None
+            if getattr(settings, 'TRACING_ENABLED', False):
+                backend = getattr(settings, 'TRACING_BACKEND', 'metrics')
+                tracer_class = TRACER_BACKENDS.get(backend) or import_string(backend)
+                tracer = tracer_class()
+            _tracer = tracer
+            _tracer_loaded = True
+    return _tracer
+
+
+@receiver(setting_changed)
+def _reset_tracer(setting, **kwargs):
+    global _tracer_loaded
+    if setting in ('TRACING_ENABLED', 'TRACING_BACKEND'):
+        _tracer_loaded = False
+
+
+def span(name, **attributes):
+    """
+    Time a pipeline stage:
+
+        with span('resume_parse', resume_id=resume.id):
+            ...
+
+    Returns a shared no-op span when tracing is disabled.
+    """
+    tracer = _tracer if _tracer_loaded else get_tracer()
+    if tracer is None:
+        return NOOP_SPAN
+    return tracer.start_span(name, attributes)
+
+
+def increment(name, amount=1, **labels):
+    """Increment a counter in the metrics registry when tracing is enabled."""
+    if (_tracer if _tracer_loaded else get_tracer()) is not None:
+        registry.increment(name, amount, **labels)
@@ -0,0 +1,269 @@
+import os
+import re
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import UploadSession
+from .serializers import ContactListSerializer, ResumeSerializer, UploadSessionSerializer
+from .uploads import AssembledFile, IncompleteChunk, discard, file_sha256, temp_path, write_chunk
+from .user_cache import CONTACT_LISTS, RESUMES, invalidate
+from .views import ContactListUploadView, ResumeUploadView
+
+SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+def _max_size(kind):
+    if kind == UploadSession.KIND_RESUME:
+        return ResumeSerializer.MAX_SIZE
+    return getattr(settings, 'CHUNKED_UPLOAD_CSV_MAX_SIZE', 50 * 1024 * 1024)
+
+
+def _chunk_size():
+    return getattr(settings, 'CHUNKED_UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024)
+
+
+def _describe(session):
+    return dict(UploadSessionSerializer(session).data, chunk_size=_chunk_size())
+
+
+def _get_session(request, upload_id):
+    try:
+        return UploadSession.objects.get(id=upload_id, user=request.user)
+    except UploadSession.DoesNotExist:
+        return None
+
+
+class ChunkedUploadView(APIView):
+    """
+    Start a chunked upload of a resume or contact list.
+
+    The client then PUTs the file in chunks of at most `chunk_size` bytes to
+    upload/chunked/<id>/, each with an Upload-Offset header, and finally POSTs
+    to upload/chunked/<id>/complete/. An interrupted upload resumes from the
+    `received_size` that a GET on upload/chunked/<id>/ reports.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        kind = request.data.get('kind')
+        if kind not in dict(UploadSession.KIND_CHOICES):
+            return Response({
+                "error": f"kind must be one of: {', '.join(dict(UploadSession.KIND_CHOICES))}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Only the base name is kept; storage rejects anything with a path in it
+        filename = os.path.basename(str(request.data.get('filename') or '').replace('\\', '/'))
+        if not filename:
+            return Response({"error": "filename is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            size = int(request.data.get('size'))
+        except (TypeError, ValueError):
+            return Response({"error": "size must be the file size in bytes"}, status=status.HTTP_400_BAD_REQUEST)
+        if size <= 0:
+            return Response({"error": "File is empty"}, status=status.HTTP_400_BAD_REQUEST)
+        max_size = _max_size(kind)
+        if size > max_size:
+            return Response({
+                "error": f"File size cannot exceed {max_size // (1024 * 1024)}MB"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        sha256 = str(request.data.get('sha256') or '').lower()
+        if sha256 and not SHA256_PATTERN.match(sha256):
+            return Response({"error": "sha256 must be a hex digest"}, status=status.HTTP_400_BAD_REQUEST)
+
+        session = UploadSession.objects.create(
+            user=request.user, kind=kind, filename=filename, total_size=size, sha256=sha256
+        )
+        return Response(_describe(session), status=status.HTTP_201_CREATED)
+
+
+class ChunkedUploadDetailView(APIView):
+    """Report progress on (GET), append a chunk to (PUT) or abandon (DELETE) a chunked upload."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, upload_id):
+        session = _get_session(request, upload_id)
+        if session is None:
+            return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(_describe(session), status=status.HTTP_200_OK)
+
+    def put(self, request, upload_id):
+        """
+        Append the raw request body at Upload-Offset. The body is streamed to
+        disk as it arrives; an optional X-Chunk-SHA256 header is checked
+        against what was written.
+        """
+        session = _get_session(request, upload_id)
+        if session is None:
+            return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+        if session.status != UploadSession.STATUS_OPEN:
+            return Response({"error": "Upload is already complete"}, status=status.HTTP_409_CONFLICT)
+
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers['Content-Length'])
+        except (KeyError, ValueError):
+            return Response({
+                "error": "Upload-Offset and Content-Length headers are required"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if offset != session.received_size:
+            return Response({
+                "error": "Upload-Offset does not match the bytes received so far",
+                "received_size": session.received_size
+            }, status=status.HTTP_409_CONFLICT)
+        if not 0 < length <= _chunk_size():
+            return Response({
+                "error": f"Chunks must be between 1 and {_chunk_size()} bytes"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if offset + length > session.total_size:
+            return Response({"error": "Chunk extends past the declared file size"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            digest = write_chunk(temp_path(session), offset, request.stream, length)
+        except IncompleteChunk as e:
+            return Response({"error": str(e), "received_size": offset}, status=status.HTTP_400_BAD_REQUEST)
+
+        expected = request.headers.get('X-Chunk-SHA256', '').lower()
+        if expected and expected != digest:
+            # Not counted; the next attempt at this offset overwrites it
+            return Response({
+                "error": "Chunk checksum mismatch",
+                "received_size": offset
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Only advance from the offset this chunk was written at, in case another request got there first
+        advanced = UploadSession.objects.filter(
+            id=session.id, status=UploadSession.STATUS_OPEN, received_size=offset
+        ).update(received_size=offset + length, updated_at=timezone.now())
+        if not advanced:
+            session.refresh_from_db()
+            return Response({
+                "error": "Upload changed while this chunk was being written",
+                "received_size": session.received_size
+            }, status=status.HTTP_409_CONFLICT)
+
+        return Response({
+            "received_size": offset + length,
+            "chunk_sha256": digest
+        }, status=status.HTTP_200_OK)
+
+    def delete(self, request, upload_id):
+        session = _get_session(request, upload_id)
+        if session is None:
+            return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+        discard(temp_path(session))
+        session.delete()
+        return Response({"message": "Upload cancelled"}, status=status.HTTP_200_OK)
+
+
+class ChunkedUploadCompleteView(APIView):
+    """
+    Finish a chunked upload: check its size and sha256, then validate and save
+    it exactly like a single-request upload (resumes are queued for parsing,
+    contact lists are validated as they are read).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, upload_id):
+        session = _get_session(request, upload_id)
+        if session is None:
+            return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+        if session.status == UploadSession.STATUS_COMPLETE:
+            return self.completed(session)
+        if session.received_size != session.total_size:
+            return Response({
+                "error": "Upload is incomplete",
+                "received_size": session.received_size,
+                "total_size": session.total_size
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Claim the session so a concurrent completion can't read the same temp file
+        claimed = UploadSession.objects.filter(
+            id=session.id, status=UploadSession.STATUS_OPEN, received_size=session.total_size
+        ).update(status=UploadSession.STATUS_COMPLETING, updated_at=timezone.now())
+        if not claimed:
+            session.refresh_from_db()
+            if session.status == UploadSession.STATUS_COMPLETE:
+                return self.completed(session)
+            return Response({"error": "Upload is already being completed"}, status=status.HTTP_409_CONFLICT)
+
+        path = temp_path(session)
+        try:
+            digest = file_sha256(path)
+        except FileNotFoundError:
+            self.reopen(session, received_size=0)
+            return Response({
+                "error": "Upload data is missing; upload the file again",
+                "received_size": 0
+            }, status=status.HTTP_409_CONFLICT)
+        upload = AssembledFile(path, session.filename, sha256=digest)
+
+        expected = str(request.data.get('sha256') or session.sha256).lower()
+        if expected and expected != digest:
+            # No way to tell which chunk is bad, so the upload starts over
+            upload.close()
+            discard(path)
+            self.reopen(session, received_size=0)
+            return Response({
+                "error": "File checksum mismatch; upload the file again",
+                "sha256": digest,
+                "received_size": 0
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            if session.kind == UploadSession.KIND_RESUME:
+                response = ResumeUploadView.create_resume(request.user, {'file': upload})
+                namespace = RESUMES
+            else:
+                response = ContactListUploadView().create_contact_list(
+                    request.user, {'file': upload}, max_size=_max_size(session.kind)
+                )
+                namespace = CONTACT_LISTS
+        except Exception:
+            self.reopen(session, received_size=0)
+            raise
+        finally:
+            upload.close()
+            discard(path)  # Usually already moved into storage
+
+        if response.status_code != status.HTTP_201_CREATED:
+            session.delete()  # The file itself was rejected; retrying won't change that
+            return response
+
+        created = response.data.get('resume') or response.data.get('contact_list')
+        session.status = UploadSession.STATUS_COMPLETE
+        session.sha256 = digest
+        if session.kind == UploadSession.KIND_RESUME:
+            session.resume_id = created['id']
+        else:
+            session.contact_list_id = created['id']
+        session.save()
+        invalidate(request.user.id, namespace)
+
+        response.data['upload'] = UploadSessionSerializer(session).data
+        return response
+
+    @staticmethod
+    def reopen(session, received_size):
+        """Hand a claimed session back to the client to upload again."""
+        UploadSession.objects.filter(id=session.id, status=UploadSession.STATUS_COMPLETING).update(
+            status=UploadSession.STATUS_OPEN, received_size=received_size, updated_at=timezone.now()
+        )
+
+    @staticmethod
+    def completed(session):
+        """Answer a retried completion with what the first one created."""
+        data = {"upload": UploadSessionSerializer(session).data}
+        if session.resume_id:
+            data.update(message="Resume uploaded successfully", resume=ResumeSerializer(session.resume).data)
+        elif session.contact_list_id:
+            data.update(message="Contact list uploaded successfully",
+                        contact_list=ContactListSerializer(session.contact_list).data)
+        return Response(data, status=status.HTTP_200_OK)
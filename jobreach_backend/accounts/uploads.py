@@ -0,0 +1,71 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files import File
+
+# Bytes read from the request or the disk at a time
+READ_SIZE = 64 * 1024
+
+
+class IncompleteChunk(Exception):
+    """The request body ended before the declared Content-Length was received."""
+
+
+def upload_dir():
+    """Where in-progress uploads are assembled; on the media volume, so completion can move the file."""
+    path = getattr(settings, 'CHUNKED_UPLOAD_DIR', None) or os.path.join(settings.MEDIA_ROOT, 'uploads')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def temp_path(session):
+    return os.path.join(upload_dir(), f'{session.id}.part')
+
+
+def write_chunk(path, offset, stream, length):
+    """
+    Copy `length` bytes from `stream` into the file at `offset`, READ_SIZE bytes
+    at a time, and return their sha256. Anything after the chunk is truncated,
+    so a half-written earlier attempt at the same offset is overwritten.
+    """
+    digest = hashlib.sha256()
+    remaining = length
+    with open(os.open(path, os.O_WRONLY | os.O_CREAT, 0o600), 'wb') as f:
+        f.seek(offset)
+        while remaining:
+            block = stream.read(min(READ_SIZE, remaining))
+            if not block:
+                raise IncompleteChunk(f"Expected {length} bytes, received {length - remaining}")
+            f.write(block)
+            digest.update(block)
+            remaining -= len(block)
+        f.truncate()
+    return digest.hexdigest()
+
+
+def file_sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def discard(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class AssembledFile(File):
+    """
+    A completed upload on disk. Exposing temporary_file_path() lets
+    FileSystemStorage move it into place rather than copying it.
+    """
+
+    def __init__(self, path, name, sha256=None):
+        super().__init__(open(path, 'rb'), name=name)
+        self.path = path
+        self.sha256 = sha256  # Already computed, so storage doesn't hash the file again
+
+    def temporary_file_path(self):
+        return self.path
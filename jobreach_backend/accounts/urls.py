@@ -2,12 +2,15 @@ from django.urls import path
 from .views import (
     RegisterView, CurrentUserView, ResumeUploadView, ContactListUploadView,
     EmailGenerationView, GeneratedEmailListView, GeneratedEmailDetailView,
-    EmailVerifyView, EmailAuthorizeView, EmailSendView
+    EmailVerifyView, EmailAuthorizeView, EmailSendView, EmailScheduleView,
+    EmailBulkActionView, EmailAddressCheckView, GeneratedEmailExportView, GeneratedEmailCountsView,
+    GenerationRunView, GenerationRunDetailView
 )
 from .gmail_views import (
     GmailAuthURLView, GmailAuthCallbackView, GmailAuthStatusView,
     GmailSendEmailView, GmailRevokeAuthView, MockGmailAuthView, MockGmailStatusView
 )
+from .upload_views import ChunkedUploadView, ChunkedUploadDetailView, ChunkedUploadCompleteView
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -26,16 +29,28 @@ urlpatterns = [
     path('upload/resume/<int:resume_id>/', ResumeUploadView.as_view(), name='delete-resume'),
     path('upload/csv/', ContactListUploadView.as_view(), name='upload-csv'),
     path('upload/csv/<int:csv_id>/', ContactListUploadView.as_view(), name='delete-csv'),
+    path('upload/chunked/', ChunkedUploadView.as_view(), name='chunked-upload'),
+    path('upload/chunked/<uuid:upload_id>/', ChunkedUploadDetailView.as_view(), name='chunked-upload-detail'),
+    path('upload/chunked/<uuid:upload_id>/complete/', ChunkedUploadCompleteView.as_view(),
+         name='chunked-upload-complete'),
     
     # Email Generation endpoints
     path('generate-emails/', EmailGenerationView.as_view(), name='generate-emails'),
+    path('generation-runs/', GenerationRunView.as_view(), name='generation-runs'),
+    path('generation-runs/<int:run_id>/', GenerationRunDetailView.as_view(), name='generation-run-detail'),
     path('generated-emails/', GeneratedEmailListView.as_view(), name='generated-emails'),
+    path('generated-emails/export/<str:export_format>/', GeneratedEmailExportView.as_view(),
+         name='generated-emails-export'),
+    path('generated-emails/bulk/', EmailBulkActionView.as_view(), name='generated-emails-bulk'),
+    path('generated-emails/counts/', GeneratedEmailCountsView.as_view(), name='generated-emails-counts'),
     path('generated-emails/<int:email_id>/', GeneratedEmailDetailView.as_view(), name='generated-email-detail'),
     
     # Email operations
     path('verify-email/<int:email_id>/', EmailVerifyView.as_view(), name='verify-email'),
+    path('verify-emails/', EmailAddressCheckView.as_view(), name='verify-emails'),
     path('authorize-emails/', EmailAuthorizeView.as_view(), name='authorize-emails'),
     path('send-emails/', EmailSendView.as_view(), name='send-emails'),
+    path('schedule-emails/', EmailScheduleView.as_view(), name='schedule-emails'),
     
     # Gmail Integration endpoints
     path('gmail/auth-url/', GmailAuthURLView.as_view(), name='gmail-auth-url'),
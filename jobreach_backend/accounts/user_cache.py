@@ -0,0 +1,66 @@
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Per-user read caches, invalidated as a whole whenever the user's data changes
+RESUMES = 'resumes'
+CONTACT_LISTS = 'contact_lists'
+EMAIL_COUNTS = 'email_counts'
+GMAIL_STATUS = 'gmail_status'
+
+_MISSING = object()
+
+
+def _version_key(user_id, namespace):
+    return f"user_cache:{namespace}:{user_id}:version"
+
+
+def _version(user_id, namespace):
+    """
+    Current version of a user's namespace. New versions start from a timestamp,
+    so if the version key is evicted the next one is still newer than any entry
+    stored under the old one.
+    """
+    key = _version_key(user_id, namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key, 0)
+    return version
+
+
+def get_or_compute(user_id, namespace, compute, key='', timeout=None):
+    """
+    Cache-aside read: return the cached value for this user and namespace, or
+    call `compute()` and cache its result for USER_CACHE_TIMEOUT seconds.
+    """
+    data_key = f"user_cache:{namespace}:{user_id}:{_version(user_id, namespace)}:{key}"
+    value = cache.get(data_key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        cache.set(data_key, value, timeout=timeout or getattr(settings, 'USER_CACHE_TIMEOUT', 300))
+    return value
+
+
+def invalidate(user_id, *namespaces):
+    """Drop everything cached for these namespaces of the user by moving to a new version."""
+    for namespace in namespaces:
+        try:
+            cache.incr(_version_key(user_id, namespace))
+        except ValueError:
+            pass  # Nothing cached yet; the next read starts a fresh version
+
+
+def invalidates(*namespaces):
+    """View method decorator: invalidate the request user's namespaces once the method has run."""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            try:
+                return method(view, request, *args, **kwargs)
+            finally:
+                invalidate(request.user.id, *namespaces)
+        return wrapper
+    return decorator
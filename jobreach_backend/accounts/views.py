@@ -3,16 +3,39 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.renderers import BrowsableAPIRenderer
 from .serializers import (
     RegisterSerializer, ResumeSerializer, ContactListSerializer, 
-    GeneratedEmailSerializer, EmailGenerationRequestSerializer
+    GeneratedEmailSerializer, EmailGenerationRequestSerializer, EmailBulkActionSerializer,
+    EmailSelectionSerializer, EmailSendSerializer, GenerationRunSerializer, generated_email_rows
 )
-from .models import Resume, ContactList, GeneratedEmail
-from .email_generation import EmailGenerationService
+from .fast_serializers import FastJSONRenderer
+from .models import (
+    Resume, ContactList, GeneratedEmail, GeneratedEmailQuerySet, EmailTemplate, GenerationRun,
+    SendRequest
+)
+from .email_generation import EmailGenerationService, GENERATION_MODE_AI
+from .email_verification import EmailVerifier, PASSING_CHECKS
+from .exports import EXPORT_FORMATS, STREAMERS
+from .generation_runs import LeaseLost, RunCheckpoint, cancel_run, run_progress, start_inline_run, start_run
+from .cleanup import bulk_delete, delete_upload
+from .tasks import enqueue, parse_resume
+from .quota import SendQuota
+from .sending import deliver, plan_schedule, prerender_authorized, resume_attachments
+from .tracing import span, registry
+from .user_cache import CONTACT_LISTS, EMAIL_COUNTS, RESUMES, get_or_compute, invalidates
+import codecs
 import csv
-import io
-import os
+from collections import defaultdict
+from datetime import timedelta
 from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_datetime
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import HttpResponse, StreamingHttpResponse
 
 class RegisterView(APIView):
     permission_classes = [AllowAny]  # Allow unauthenticated access
@@ -41,15 +64,23 @@ class ResumeUploadView(APIView):
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
 
+    @invalidates(RESUMES)
     def post(self, request):
-        serializer = ResumeSerializer(data=request.data)
+        return self.create_resume(request.user, request.data)
+
+    @staticmethod
+    def create_resume(user, data):
+        """Validate and save an uploaded resume, then queue it for parsing."""
+        serializer = ResumeSerializer(data=data)
         if serializer.is_valid():
             # Save the original filename
-            file = request.FILES.get('file')
+            file = serializer.validated_data['file']
             resume = serializer.save(
-                user=request.user,
+                user=user,
                 original_filename=file.name
             )
+            # Extract text now so generation doesn't have to
+            enqueue(parse_resume, resume.id)
             return Response({
                 "message": "Resume uploaded successfully",
                 "resume": ResumeSerializer(resume).data
@@ -57,10 +88,12 @@ class ResumeUploadView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def get(self, request):
-        resumes = Resume.objects.filter(user=request.user)
-        serializer = ResumeSerializer(resumes, many=True)
-        return Response(serializer.data)
+        data = get_or_compute(request.user.id, RESUMES, lambda: list(
+            ResumeSerializer(Resume.objects.filter(user=request.user), many=True).data
+        ))
+        return Response(data)
 
+    @invalidates(RESUMES, EMAIL_COUNTS)
     def delete(self, request, resume_id=None):
         """Delete a specific resume file."""
         if not resume_id:
@@ -71,12 +104,8 @@ class ResumeUploadView(APIView):
         try:
             resume = Resume.objects.get(id=resume_id, user=request.user)
             
-            # Delete the physical file
-            if resume.file and os.path.exists(resume.file.path):
-                os.remove(resume.file.path)
-            
-            # Delete the database record
-            resume.delete()
+            # Delete the record and its emails; the file is released in the background
+            delete_upload(resume)
             
             return Response({
                 "message": "Resume deleted successfully"
@@ -96,16 +125,21 @@ class ContactListUploadView(APIView):
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
 
+    @invalidates(CONTACT_LISTS)
     def post(self, request):
-        serializer = ContactListSerializer(data=request.data)
+        return self.create_contact_list(request.user, request.data)
+
+    def create_contact_list(self, user, data, max_size=None):
+        """Validate and save an uploaded contact list; `max_size` overrides the serializer's size limit."""
+        serializer = ContactListSerializer(data=data, context={'max_size': max_size} if max_size else {})
         if serializer.is_valid():
             # Validate CSV format
-            file = request.FILES.get('file')
+            file = serializer.validated_data['file']
             validation_result = self.validate_csv_format(file)
             
             # Save the file with validation results
             contact_list = serializer.save(
-                user=request.user,
+                user=user,
                 original_filename=file.name,
                 is_validated=validation_result['is_valid'],
                 validation_errors=validation_result.get('errors', '')
@@ -121,10 +155,12 @@ class ContactListUploadView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def get(self, request):
-        contact_lists = ContactList.objects.filter(user=request.user)
-        serializer = ContactListSerializer(contact_lists, many=True)
-        return Response(serializer.data)
+        data = get_or_compute(request.user.id, CONTACT_LISTS, lambda: list(
+            ContactListSerializer(ContactList.objects.filter(user=request.user), many=True).data
+        ))
+        return Response(data)
 
+    @invalidates(CONTACT_LISTS, EMAIL_COUNTS)
     def delete(self, request, csv_id=None):
         """Delete a specific CSV contact list file."""
         if not csv_id:
@@ -135,12 +171,8 @@ class ContactListUploadView(APIView):
         try:
             contact_list = ContactList.objects.get(id=csv_id, user=request.user)
             
-            # Delete the physical file
-            if contact_list.file and os.path.exists(contact_list.file.path):
-                os.remove(contact_list.file.path)
-            
-            # Delete the database record
-            contact_list.delete()
+            # Delete the record and its emails; the file is released in the background
+            delete_upload(contact_list)
             
             return Response({
                 "message": "CSV file deleted successfully"
@@ -162,10 +194,8 @@ class ContactListUploadView(APIView):
         """
         try:
             file.seek(0)  # Reset file pointer
-            content = file.read().decode('utf-8')
-            file.seek(0)  # Reset again for later use
-            
-            csv_reader = csv.DictReader(io.StringIO(content))
+            # Decode line by line so large files are never held in memory whole
+            csv_reader = csv.DictReader(codecs.iterdecode(file, 'utf-8'))
             
             # Required columns
             required_columns = ['name', 'email', 'company']
@@ -204,10 +234,13 @@ class ContactListUploadView(APIView):
                     row_errors.append(f"Missing company in row {row_num}")
                 
                 if row_errors:
-                    errors.extend(row_errors)
+                    if len(errors) < 10:  # Only the first 10 are reported
+                        errors.extend(row_errors)
                 else:
                     valid_rows += 1
             
+            file.seek(0)  # Reset again for later use
+            
             if errors:
                 return {
                     'is_valid': False,
@@ -230,7 +263,9 @@ class ContactListUploadView(APIView):
 
 class EmailGenerationView(APIView):
     permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
 
+    @invalidates(EMAIL_COUNTS)
     def post(self, request):
         """Generate personalized emails for all contacts in a CSV using a resume."""
         serializer = EmailGenerationRequestSerializer(data=request.data, context={'request': request})
@@ -240,14 +275,19 @@ class EmailGenerationView(APIView):
         
         resume_id = serializer.validated_data['resume_id']
         contact_list_id = serializer.validated_data['contact_list_id']
+        generation_mode = serializer.validated_data['generation_mode']
+        template_id = serializer.validated_data.get('template_id')
+        checkpoint = None
         
         try:
             # Get the resume and contact list
             resume = Resume.objects.get(id=resume_id, user=request.user)
             contact_list = ContactList.objects.get(id=contact_list_id, user=request.user)
             
-            # Check if OpenAI API key is configured
-            if not getattr(settings, 'OPENAI_API_KEY', None):
+            template = EmailTemplate.objects.get(id=template_id) if template_id else None
+            
+            # Check if OpenAI API key is configured (template mode doesn't need it)
+            if generation_mode == GENERATION_MODE_AI and not getattr(settings, 'OPENAI_API_KEY', None):
                 return Response({
                     "error": "OpenAI API key not configured. Please contact administrator."
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -257,48 +297,51 @@ class EmailGenerationView(APIView):
             csv_file_path = contact_list.file.path
             
             # Initialize email generation service
-            email_service = EmailGenerationService()
-            
-            # Generate emails
-            generation_results = email_service.generate_emails_for_contact_list(
-                resume_file_path, csv_file_path
+            email_service = EmailGenerationService(
+                sender=request.user, template=template, mode=generation_mode
             )
             
-            # Save generated emails to database
-            saved_emails = []
-            success_count = 0
+            # Reuse the text and skill profile extracted at upload time when ready
+            resume_text = None
+            skill_profile = None
+            if resume.parse_status == Resume.PARSE_READY:
+                resume_text = resume.extracted_text
+                skill_profile = resume.skills
             
-            for result in generation_results:
-                contact = result['contact']
-                
-                # Create or update generated email
-                generated_email, created = GeneratedEmail.objects.update_or_create(
-                    user=request.user,
-                    resume=resume,
-                    contact_list=contact_list,
-                    recipient_email=contact['email'],
-                    defaults={
-                        'recipient_name': contact['name'],
-                        'recipient_company': contact.get('company', ''),
-                        'recipient_position': contact.get('position', ''),
-                        'email_subject': result['subject'],
-                        'email_body': result['body'],
-                    }
-                )
-                
-                saved_emails.append(generated_email)
-                if result['success']:
-                    success_count += 1
+            # Pick up an interrupted run of the same list where it stopped
+            run, acquired = start_inline_run(request.user, resume, contact_list, generation_mode, template)
+            if not acquired:
+                return Response({
+                    "error": "Emails for this resume and contact list are already being generated",
+                    "generation_run": _describe_run(run)
+                }, status=status.HTTP_409_CONFLICT)
+            resumed_from_row = run.checkpoint_row
+            checkpoint = RunCheckpoint(run)
+            
+            # Generate emails; each one is saved and checkpointed as soon as it is generated
+            email_service.generate_emails_for_contact_list(
+                resume_file_path, csv_file_path,
+                resume_text=resume_text, skill_profile=skill_profile,
+                start_after_row=resumed_from_row, on_result=checkpoint
+            )
+            checkpoint.complete()
             
-            # Serialize the saved emails
-            email_serializer = GeneratedEmailSerializer(saved_emails, many=True)
+            # Serialize every email of the run, including those saved before it was resumed
+            saved_emails = GeneratedEmail.objects.filter(
+                user=request.user, resume=resume, contact_list=contact_list
+            ).order_by('id')
+            with span('serialization', emails=run.processed_contacts):
+                generated_emails_data = generated_email_rows.serialize(saved_emails)
             
+            success_count = run.processed_contacts - run.failed_contacts
             return Response({
-                "message": f"Email generation completed. {success_count}/{len(generation_results)} emails generated successfully.",
-                "total_contacts": len(generation_results),
+                "message": f"Email generation completed. {success_count}/{run.processed_contacts} emails generated successfully.",
+                "total_contacts": run.processed_contacts,
                 "successful_generations": success_count,
-                "failed_generations": len(generation_results) - success_count,
-                "generated_emails": email_serializer.data
+                "failed_generations": run.failed_contacts,
+                "generation_run": run.id,
+                "resumed_from_row": resumed_from_row,
+                "generated_emails": generated_emails_data
             }, status=status.HTTP_201_CREATED)
             
         except Resume.DoesNotExist:
@@ -310,30 +353,119 @@ class EmailGenerationView(APIView):
                 "error": "Contact list not found"
             }, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
+            if checkpoint is not None:
+                checkpoint.release()
+                checkpoint.run.refresh_from_db()
+                if checkpoint.run.status == GenerationRun.STATUS_CANCELLED:
+                    return Response({
+                        "error": "Generation run was cancelled",
+                        "generation_run": _describe_run(checkpoint.run)
+                    }, status=status.HTTP_409_CONFLICT)
+                if isinstance(e.__cause__, LeaseLost):
+                    return Response({
+                        "error": "Generation run was taken over by another request",
+                        "generation_run": _describe_run(checkpoint.run)
+                    }, status=status.HTTP_409_CONFLICT)
             return Response({
                 "error": f"Error generating emails: {str(e)}"
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _describe_run(run):
+    return dict(GenerationRunSerializer(run).data, progress=run_progress(run))
+
+
+class GenerationRunView(APIView):
+    """
+    Queue email generation for a whole contact list (POST, same payload as
+    generate-emails/) for the generation workers, or list the user's runs (GET).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        runs = GenerationRun.objects.filter(user=request.user).order_by('-created_at')
+        return Response(GenerationRunSerializer(runs, many=True).data, status=status.HTTP_200_OK)
+
+    def post(self, request):
+        serializer = EmailGenerationRequestSerializer(data=request.data, context={'request': request})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        generation_mode = serializer.validated_data['generation_mode']
+        template_id = serializer.validated_data.get('template_id')
+        if generation_mode == GENERATION_MODE_AI and not getattr(settings, 'OPENAI_API_KEY', None):
+            return Response({
+                "error": "OpenAI API key not configured. Please contact administrator."
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        try:
+            run = start_run(
+                request.user,
+                Resume.objects.get(id=serializer.validated_data['resume_id'], user=request.user),
+                ContactList.objects.get(id=serializer.validated_data['contact_list_id'], user=request.user),
+                generation_mode,
+                template=EmailTemplate.objects.get(id=template_id) if template_id else None,
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(_describe_run(run), status=status.HTTP_202_ACCEPTED)
+
+
+class GenerationRunDetailView(APIView):
+    """Progress of a generation run (GET), or cancel it (DELETE)."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, run_id):
+        try:
+            run = GenerationRun.objects.get(id=run_id, user=request.user)
+        except GenerationRun.DoesNotExist:
+            return Response({"error": "Generation run not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(_describe_run(run), status=status.HTTP_200_OK)
+
+    def delete(self, request, run_id):
+        try:
+            run = GenerationRun.objects.get(id=run_id, user=request.user)
+        except GenerationRun.DoesNotExist:
+            return Response({"error": "Generation run not found"}, status=status.HTTP_404_NOT_FOUND)
+        if not cancel_run(run):
+            return Response({"error": f"Generation run is already {run.status}"}, status=status.HTTP_409_CONFLICT)
+        run.refresh_from_db()
+        return Response(_describe_run(run), status=status.HTTP_200_OK)
+
+
+def filter_emails_from_query(request):
+    """
+    The user's emails narrowed by query parameters named after
+    GeneratedEmailQuerySet.FILTER_FIELDS (repeat `status` for several).
+    Raises ValueError for unusable values.
+    """
+    filters = {}
+    for name in GeneratedEmailQuerySet.FILTER_FIELDS:
+        values = [value for value in request.GET.getlist(name) if value]
+        if values:
+            filters[name] = values if name == 'status' else values[-1]
+    try:
+        return GeneratedEmail.objects.filter(user=request.user).apply_filters(filters)
+    except DjangoValidationError as e:
+        raise ValueError('; '.join(e.messages))
+
+
 class GeneratedEmailListView(APIView):
     permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
 
     def get(self, request):
         """Get all generated emails for the current user."""
-        emails = GeneratedEmail.objects.filter(user=request.user).order_by('-generated_at')
-        
-        # Optional filtering by resume or contact list
-        resume_id = request.GET.get('resume_id')
-        contact_list_id = request.GET.get('contact_list_id')
-        
-        if resume_id:
-            emails = emails.filter(resume_id=resume_id)
-        if contact_list_id:
-            emails = emails.filter(contact_list_id=contact_list_id)
+        # Optional filtering by resume, contact list, status, recipient domain, ...
+        try:
+            emails = filter_emails_from_query(request).order_by('-generated_at')
+        except ValueError as e:
+            return Response({"error": f"Invalid filter: {e}"}, status=status.HTTP_400_BAD_REQUEST)
         
-        serializer = GeneratedEmailSerializer(emails, many=True)
-        return Response(serializer.data)
+        return Response(generated_email_rows.serialize(emails))
 
+    @invalidates(EMAIL_COUNTS)
     def delete(self, request):
         """Delete all generated emails for a specific resume/contact list combination."""
         resume_id = request.data.get('resume_id')
@@ -345,11 +477,11 @@ class GeneratedEmailListView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            deleted_count = GeneratedEmail.objects.filter(
+            deleted_count = bulk_delete(GeneratedEmail.objects.filter(
                 user=request.user,
                 resume_id=resume_id,
                 contact_list_id=contact_list_id
-            ).delete()[0]
+            ))
             
             return Response({
                 "message": f"Deleted {deleted_count} generated emails"
@@ -361,9 +493,53 @@ class GeneratedEmailListView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class GeneratedEmailExportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, export_format):
+        """
+        Stream the user's generated emails as CSV or NDJSON, using the same
+        query parameter filters as the list endpoint. Rows are read from the
+        database in chunks and written as they arrive, so memory use stays flat.
+        """
+        if export_format not in STREAMERS:
+            return Response({
+                "error": f"Unsupported export format. Use one of: {', '.join(STREAMERS)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            emails = filter_emails_from_query(request).order_by('id')
+        except ValueError as e:
+            return Response({"error": f"Invalid filter: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        response = StreamingHttpResponse(STREAMERS[export_format](emails), content_type=EXPORT_FORMATS[export_format])
+        filename = f"generated-emails-{timezone.localdate():%Y%m%d}.{export_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class GeneratedEmailCountsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """Number of generated emails per status for the current user (cached between writes)."""
+        return Response(get_or_compute(request.user.id, EMAIL_COUNTS, lambda: self.count(request.user)))
+
+    @staticmethod
+    def count(user):
+        by_status = {value: 0 for value, _ in GeneratedEmail.STATUS_CHOICES}
+        by_status.update(
+            GeneratedEmail.objects.filter(user=user).order_by().values_list('status').annotate(Count('id'))
+        )
+        return {"total": sum(by_status.values()), "by_status": by_status}
+
+
 class GeneratedEmailDetailView(APIView):
     permission_classes = [IsAuthenticated]
 
+    # Statuses whose recipient, subject and body can still be changed
+    EDITABLE_STATUSES = (GeneratedEmail.STATUS_DRAFT, GeneratedEmail.STATUS_VERIFIED, GeneratedEmail.STATUS_AUTHORIZED)
+
     def get_email(self, email_id, user):
         """Helper method to get an email that belongs to the user."""
         try:
@@ -380,18 +556,31 @@ class GeneratedEmailDetailView(APIView):
         serializer = GeneratedEmailSerializer(email)
         return Response(serializer.data)
 
+    @invalidates(EMAIL_COUNTS)
     def put(self, request, email_id):
-        """Update a specific generated email."""
-        email = self.get_email(email_id, request.user)
-        if not email:
-            return Response({"error": "Email not found"}, status=status.HTTP_404_NOT_FOUND)
-        
-        serializer = GeneratedEmailSerializer(email, data=request.data, partial=True)
-        if serializer.is_valid():
+        """
+        Update a specific generated email. Changing the recipient, subject or body
+        of a verified or authorized email moves it back to draft; emails that are
+        being or have been sent can't be changed.
+        """
+        with transaction.atomic():
+            # Locked so a send can't claim the email between the check and the save
+            email = GeneratedEmail.objects.select_for_update().filter(id=email_id, user=request.user).first()
+            if not email:
+                return Response({"error": "Email not found"}, status=status.HTTP_404_NOT_FOUND)
+            
+            serializer = GeneratedEmailSerializer(email, data=request.data, partial=True)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            changed = serializer.changed_message_fields(serializer.validated_data)
+            if changed and email.status not in self.EDITABLE_STATUSES:
+                return Response({
+                    "error": f"Cannot edit an email that is {email.status}"
+                }, status=status.HTTP_409_CONFLICT)
             serializer.save()
-            return Response(serializer.data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(serializer.data)
 
+    @invalidates(EMAIL_COUNTS)
     def delete(self, request, email_id):
         """Delete a specific generated email."""
         email = self.get_email(email_id, request.user)
@@ -405,28 +594,111 @@ class GeneratedEmailDetailView(APIView):
 class EmailVerifyView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @invalidates(EMAIL_COUNTS)
     def post(self, request, email_id):
-        """Verify an email address."""
+        """Check the recipient address and, if it passes, mark the email verified."""
         try:
             email = GeneratedEmail.objects.get(id=email_id, user=request.user)
         except GeneratedEmail.DoesNotExist:
             return Response({"error": "Email not found"}, status=status.HTTP_404_NOT_FOUND)
         
-        # For now, we'll just mark it as verified
-        # In a real implementation, you would integrate with an email verification service
-        email.is_verified = True  # We'd need to add this field to the model
-        email.save()
+        # Every status past draft (authorized, sending, sent, failed) implies the email was
+        # verified; re-verifying leaves it exactly as it is rather than demoting or rejecting it.
+        if email.status in GeneratedEmail.VERIFIED_STATUSES:
+            return Response({
+                "message": "Email already verified",
+                "email_id": email_id,
+                "recipient_email": email.recipient_email,
+                "status": email.status
+            })
+        
+        result = EmailVerifier().verify(email.recipient_email)
+        email.address_check = result['status']
+        email.address_checked_at = timezone.now()
+        email.save(update_fields=['address_check', 'address_checked_at'])
+        
+        if result['status'] not in PASSING_CHECKS:
+            return Response({
+                "error": f"Email address failed verification: {result['reason']}",
+                "email_id": email_id,
+                "recipient_email": email.recipient_email,
+                "verification": result
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        email.transition_to(GeneratedEmail.STATUS_VERIFIED)
         
         return Response({
             "message": "Email verified successfully",
             "email_id": email_id,
-            "recipient_email": email.recipient_email
+            "recipient_email": email.recipient_email,
+            "verification": result
         })
 
 
+class EmailAddressCheckView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @invalidates(EMAIL_COUNTS)
+    def post(self, request):
+        """
+        Check the recipient addresses of many emails at once (e.g. a whole contact
+        list via {"filter": {"contact_list_id": 3}}) and verify the drafts that pass.
+        """
+        serializer = EmailSelectionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            rows = list(serializer.select(request.user).values_list('id', 'recipient_email'))
+            if not rows:
+                return Response({"error": "No emails found"}, status=status.HTTP_404_NOT_FOUND)
+            
+            results, ids_by_check, verified_count = self.check(rows)
+            
+            return Response({
+                "message": f"Checked {len(rows)} emails, verified {verified_count}",
+                "checked_count": len(rows),
+                "verified_count": verified_count,
+                "results": {check: len(ids) for check, ids in ids_by_check.items()},
+                "failed_emails": [
+                    {'id': email_id, **results[address]}
+                    for email_id, address in rows if results[address]['status'] not in PASSING_CHECKS
+                ]
+            })
+            
+        except Exception as e:
+            return Response({
+                "error": f"Error verifying emails: {str(e)}"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @staticmethod
+    def check(rows):
+        """
+        Check the addresses of (id, recipient_email) rows, record the outcome on each
+        email and verify the drafts that pass. Returns (results by address,
+        ids by outcome, number verified).
+        """
+        results = EmailVerifier().verify_many({address for _, address in rows})
+        
+        # One UPDATE per outcome rather than one per email
+        ids_by_check = defaultdict(list)
+        for email_id, address in rows:
+            ids_by_check[results[address]['status']].append(email_id)
+        checked_at = timezone.now()
+        for check, ids in ids_by_check.items():
+            GeneratedEmail.objects.filter(id__in=ids).update(address_check=check, address_checked_at=checked_at)
+        
+        passing_ids = [email_id for check in PASSING_CHECKS for email_id in ids_by_check.get(check, [])]
+        verified_count = GeneratedEmail.objects.filter(id__in=passing_ids).transition(
+            GeneratedEmail.STATUS_VERIFIED, from_statuses=[GeneratedEmail.STATUS_DRAFT]
+        ) if passing_ids else 0
+        return results, ids_by_check, verified_count
+
+
 class EmailAuthorizeView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @invalidates(EMAIL_COUNTS)
     def post(self, request):
         """Authorize multiple emails for sending."""
         email_ids = request.data.get('email_ids', [])
@@ -440,12 +712,17 @@ class EmailAuthorizeView(APIView):
             if not emails.exists():
                 return Response({"error": "No emails found"}, status=status.HTTP_404_NOT_FOUND)
             
-            # Mark emails as authorized
-            updated_count = emails.update(is_authorized=True)  # We'd need to add this field
+            ids = list(emails.values_list('id', flat=True))
+            # Only verified emails can be authorized; anything else is left as is
+            updated_count = emails.transition(GeneratedEmail.STATUS_AUTHORIZED)
+            # Render the messages ahead of time so sending them is only I/O
+            prerender_authorized(ids, request.user)
             
             return Response({
                 "message": f"Authorized {updated_count} emails",
-                "authorized_emails": list(emails.values_list('id', flat=True))
+                "authorized_emails": list(
+                    emails.with_status(GeneratedEmail.STATUS_AUTHORIZED).values_list('id', flat=True)
+                )
             })
             
         except Exception as e:
@@ -456,10 +733,72 @@ class EmailAuthorizeView(APIView):
 
 class EmailSendView(APIView):
     permission_classes = [IsAuthenticated]
+    IDEMPOTENCY_HEADER = 'Idempotency-Key'
 
+    @invalidates(EMAIL_COUNTS)
     def post(self, request):
-        """Send multiple emails."""
-        email_ids = request.data.get('email_ids', [])
+        """
+        Send multiple emails.
+
+        Clients may pass an Idempotency-Key header; retrying with the same key
+        replays the first successful response instead of sending again.
+        A key can only be retried with the same email_ids and attach_resume.
+        """
+        serializer = EmailSendSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        key = request.headers.get(self.IDEMPOTENCY_HEADER)
+        if not key:
+            return self._send(request, serializer.validated_data)
+        if len(key) > 255:
+            return Response({"error": "Idempotency key is too long"}, status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = serializer.fingerprint()
+        send_request, created = self._begin_send_request(request.user, key, fingerprint)
+        if not created:
+            if send_request.request_hash != fingerprint:
+                return Response({
+                    "error": "This idempotency key was already used for a different send request"
+                }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            if send_request.is_complete:
+                response = Response(send_request.response, status=send_request.status_code)
+                response['Idempotent-Replayed'] = 'true'
+                return response
+            return Response({
+                "error": "A send request with this idempotency key is still in progress"
+            }, status=status.HTTP_409_CONFLICT)
+
+        response = None
+        try:
+            response = self._send(request, serializer.validated_data)
+        finally:
+            if response is not None and response.status_code == status.HTTP_200_OK:
+                SendRequest.objects.filter(id=send_request.id).update(
+                    status_code=response.status_code, response=response.data
+                )
+            else:
+                # Nothing was sent, so let the client retry with the same key
+                send_request.delete()
+        return response
+
+    def _begin_send_request(self, user, key, fingerprint):
+        """Record a new send request under `key`, or return the existing one."""
+        now = timezone.now()
+        ttl = timedelta(hours=getattr(settings, 'SEND_IDEMPOTENCY_TTL_HOURS', 24))
+        lease = timedelta(seconds=getattr(settings, 'SEND_IDEMPOTENCY_LEASE_SECONDS', 600))
+        # Expired results, and requests that crashed before storing theirs: claims keep a retry from resending
+        SendRequest.objects.filter(user=user, idempotency_key=key).filter(
+            Q(created_at__lt=now - ttl) | Q(status_code__isnull=True, created_at__lt=now - lease)
+        ).delete()
+        try:
+            with transaction.atomic():
+                return SendRequest.objects.create(user=user, idempotency_key=key, request_hash=fingerprint), True
+        except IntegrityError:
+            return SendRequest.objects.get(user=user, idempotency_key=key), False
+
+    def _send(self, request, data):
+        email_ids = data['email_ids']
         
         if not email_ids:
             return Response({"error": "No email IDs provided"}, status=status.HTTP_400_BAD_REQUEST)
@@ -468,54 +807,88 @@ class EmailSendView(APIView):
             from .gmail_service import GmailService
             
             emails = GeneratedEmail.objects.filter(id__in=email_ids, user=request.user)
+            emails.release_stale_claims()
+            statuses = dict(emails.values_list('id', 'status'))
             
-            if not emails.exists():
+            if not statuses:
                 return Response({"error": "No emails found"}, status=status.HTTP_404_NOT_FOUND)
             
+            # Drafts, sent emails and emails already being sent are not sendable
+            sendable_ids = [email_id for email_id, email_status in statuses.items()
+                            if email_status in GeneratedEmail.SENDABLE_STATUSES]
+            ineligible_emails = [email_id for email_id in statuses if email_id not in sendable_ids]
+            if not sendable_ids:
+                return Response({
+                    "error": "None of the selected emails can be sent. Only verified, authorized or failed emails can be sent.",
+                    "ineligible_emails": ineligible_emails
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
             # Check if user has Gmail authorization
             gmail_service = GmailService()
-            if not gmail_service.is_user_authorized(request.user.id):
+            if not gmail_service.cached_is_authorized(request.user.id):
                 return Response({
                     "error": "Gmail not authorized. Please authorize first."
                 }, status=status.HTTP_401_UNAUTHORIZED)
             
-            from django.utils import timezone
+            # Reserve today's quota before dispatching anything
+            quota = SendQuota(request.user)
+            granted = quota.reserve(len(sendable_ids))
+            if not granted:
+                return Response({
+                    "error": "Daily email limit reached. Please try again tomorrow.",
+                    **quota.status()
+                }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+            
+            # Claim the emails so a concurrent request (double click, retry, another worker) can't send them too
+            claimed = emails.claim(limit=granted)
+            quota.release(granted - len(claimed))
+            
+            # Sendable emails left unclaimed were either over the quota or claimed concurrently
+            skipped_emails = []
+            unclaimed = set(sendable_ids) - {email.id for email in claimed}
+            if unclaimed:
+                still_sendable = set(GeneratedEmail.objects.filter(
+                    id__in=unclaimed, status__in=GeneratedEmail.SENDABLE_STATUSES
+                ).values_list('id', flat=True))
+                skipped_emails = sorted(still_sendable)
+                ineligible_emails += sorted(unclaimed - still_sendable)
+            
+            # Each resume is encoded once and shared by all the emails attaching it
+            attachments = {}
+            attach_resume = data['attach_resume']
+            if attach_resume is None:
+                attach_resume = getattr(settings, 'EMAIL_ATTACH_RESUME', True)
+            if attach_resume:
+                attachments = resume_attachments(claimed)
+            
             sent_count = 0
             failed_count = 0
             sent_emails = []
             failed_emails = []
             
-            for email in emails:
-                try:
-                    # Send email through Gmail API
-                    result = gmail_service.send_email(
-                        user_id=request.user.id,
-                        to_email=email.recipient_email,
-                        subject=email.email_subject,
-                        body=email.email_body,
-                        from_name=request.user.full_name if hasattr(request.user, 'full_name') else None
-                    )
-                    
-                    # Mark as sent
-                    email.is_sent = True
-                    email.sent_at = timezone.now()
-                    email.save()
+            for email in claimed:
+                # Send through the Gmail API and mark the email sent or failed
+                send_error = deliver(email, gmail_service, from_name=getattr(request.user, 'full_name', None),
+                                     attachment=attachments.get(email.resume_id))
+                if send_error is None:
                     sent_count += 1
                     sent_emails.append(email.id)
-                    
-                except Exception as send_error:
+                else:
                     failed_count += 1
                     failed_emails.append({
                         'id': email.id,
                         'recipient_email': email.recipient_email,
-                        'error': str(send_error)
+                        'error': send_error
                     })
-                    continue
+            
+            # Failed sends don't count against the quota
+            quota.release(failed_count)
             
             response_data = {
                 "message": f"Sent {sent_count} emails",
                 "sent_count": sent_count,
-                "sent_emails": sent_emails
+                "sent_emails": sent_emails,
+                **quota.status()
             }
             
             if failed_count > 0:
@@ -525,9 +898,191 @@ class EmailSendView(APIView):
                     "message": f"Sent {sent_count} emails, {failed_count} failed"
                 })
             
+            if skipped_emails:
+                response_data.update({
+                    "skipped_count": len(skipped_emails),
+                    "skipped_emails": skipped_emails,
+                    "message": response_data["message"] + f", {len(skipped_emails)} skipped (daily limit reached)"
+                })
+            
+            if ineligible_emails:
+                response_data.update({
+                    "ineligible_count": len(ineligible_emails),
+                    "ineligible_emails": ineligible_emails,
+                    "message": response_data["message"] + f", {len(ineligible_emails)} not sendable"
+                })
+            
             return Response(response_data)
             
         except Exception as e:
             return Response({
                 "error": f"Error sending emails: {str(e)}"
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class EmailBulkActionView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    # action -> (target status, statuses it applies to, extra fields to set). 'verify' isn't
+    # here: it goes through the same address check as a single verification.
+    TRANSITIONS = {
+        'unverify': (GeneratedEmail.STATUS_DRAFT, [GeneratedEmail.STATUS_VERIFIED], {}),
+        'authorize': (GeneratedEmail.STATUS_AUTHORIZED, [GeneratedEmail.STATUS_VERIFIED], {}),
+        'revoke': (GeneratedEmail.STATUS_VERIFIED, [GeneratedEmail.STATUS_AUTHORIZED], {'scheduled_for': None}),
+    }
+
+    @invalidates(EMAIL_COUNTS)
+    def post(self, request):
+        """
+        Apply one action to many emails, selected by `email_ids` or a `filter`
+        (e.g. {"status": "draft", "contact_list_id": 3}), as a single query.
+        Emails whose status doesn't allow the action are left unchanged.
+        """
+        serializer = EmailBulkActionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        action = serializer.validated_data['action']
+        emails = serializer.select(request.user)
+        
+        try:
+            if action == 'delete':
+                # Emails mid-send are left alone so their outcome can still be recorded
+                updated_count = emails.exclude(status=GeneratedEmail.STATUS_SENDING).delete()[0]
+            elif action == 'verify':
+                rows = list(emails.with_status(GeneratedEmail.STATUS_DRAFT).values_list('id', 'recipient_email'))
+                updated_count = EmailAddressCheckView.check(rows)[2] if rows else 0
+            else:
+                target, from_statuses, extra = self.TRANSITIONS[action]
+                # Taken first: a filter on status no longer matches the emails once they've moved
+                ids = list(emails.with_status(*from_statuses).values_list('id', flat=True))
+                updated_count = GeneratedEmail.objects.filter(id__in=ids).transition(
+                    target, from_statuses=from_statuses, **extra
+                )
+                if action == 'authorize':
+                    prerender_authorized(ids, request.user)
+            
+            return Response({
+                "message": f"{action.capitalize()}: {updated_count} emails updated",
+                "action": action,
+                "updated_count": updated_count
+            })
+            
+        except Exception as e:
+            return Response({
+                "error": f"Error applying {action}: {str(e)}"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class EmailScheduleView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        Queue verified or authorized emails for the send worker.
+
+        Optional `send_at` (ISO 8601) sets the earliest send time, and `spread_hours`
+        spreads each day's share of the campaign over that many hours.
+        """
+        email_ids = request.data.get('email_ids', [])
+        
+        if not email_ids:
+            return Response({"error": "No email IDs provided"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        send_at = timezone.now()
+        if request.data.get('send_at'):
+            send_at = parse_datetime(str(request.data['send_at']))
+            if send_at is None:
+                return Response({"error": "send_at must be an ISO 8601 datetime"}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(send_at):
+                send_at = timezone.make_aware(send_at)
+            send_at = max(send_at, timezone.now())
+        
+        try:
+            spread_hours = float(request.data.get('spread_hours', getattr(settings, 'SEND_SCHEDULE_SPREAD_HOURS', 8)))
+        except (TypeError, ValueError):
+            return Response({"error": "spread_hours must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 <= spread_hours <= 24:
+            return Response({"error": "spread_hours must be between 0 and 24"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            emails = GeneratedEmail.objects.filter(id__in=email_ids, user=request.user)
+            if not emails.exists():
+                return Response({"error": "No emails found"}, status=status.HTTP_404_NOT_FOUND)
+            
+            ids = list(emails.values_list('id', flat=True))
+            # Queued emails must be authorized; verified ones are authorized as part of scheduling
+            emails.transition(GeneratedEmail.STATUS_AUTHORIZED)
+            prerender_authorized(ids, request.user)
+            queued = list(emails.with_status(GeneratedEmail.STATUS_AUTHORIZED).order_by('id'))
+            ineligible_emails = sorted(set(emails.values_list('id', flat=True)) - {email.id for email in queued})
+            if not queued:
+                return Response({
+                    "error": "None of the selected emails can be scheduled. Verify them first.",
+                    "ineligible_emails": ineligible_emails
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Today's share is whatever quota is left; later days get the full limit
+            quota = SendQuota(request.user).status()
+            starts_today = timezone.localdate(send_at) == timezone.localdate()
+            plan = plan_schedule(
+                queued, send_at, spread_hours,
+                remaining_today=quota['remaining_quota'] if starts_today else quota['daily_limit'],
+                daily_limit=quota['daily_limit'],
+                min_interval_seconds=getattr(settings, 'SEND_USER_INTERVAL_SECONDS', 30),
+            )
+            for email, when in plan:
+                email.scheduled_for = when
+            GeneratedEmail.objects.bulk_update([email for email, _ in plan], ['scheduled_for'])
+            
+            response_data = {
+                "message": f"Scheduled {len(plan)} emails",
+                "scheduled_count": len(plan),
+                "first_send_at": plan[0][1] if plan else None,
+                "last_send_at": plan[-1][1] if plan else None,
+            }
+            if ineligible_emails:
+                response_data.update({
+                    "ineligible_count": len(ineligible_emails),
+                    "ineligible_emails": ineligible_emails,
+                })
+            return Response(response_data)
+            
+        except Exception as e:
+            return Response({
+                "error": f"Error scheduling emails: {str(e)}"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def delete(self, request):
+        """Take emails out of the send queue; they stay authorized."""
+        email_ids = request.data.get('email_ids', [])
+        
+        if not email_ids:
+            return Response({"error": "No email IDs provided"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        unscheduled_count = GeneratedEmail.objects.filter(
+            id__in=email_ids, user=request.user, status=GeneratedEmail.STATUS_AUTHORIZED, scheduled_for__isnull=False
+        ).update(scheduled_for=None)
+        
+        return Response({
+            "message": f"Unscheduled {unscheduled_count} emails",
+            "unscheduled_count": unscheduled_count
+        })
+
+
+class MetricsView(APIView):
+    """Expose pipeline timing metrics in the Prometheus text format."""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        # Scrapers authenticate with a static bearer token; without one the endpoint
+        # is closed unless METRICS_PUBLIC opens it (e.g. behind a private network)
+        token = getattr(settings, 'METRICS_TOKEN', '')
+        if not token:
+            if not getattr(settings, 'METRICS_PUBLIC', False):
+                return HttpResponse("Set METRICS_TOKEN or METRICS_PUBLIC to enable /metrics",
+                                    status=status.HTTP_403_FORBIDDEN, content_type='text/plain')
+        elif not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
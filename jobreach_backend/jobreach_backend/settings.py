@@ -14,6 +14,7 @@ from pathlib import Path
 from datetime import timedelta
 import os
 from decouple import config
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -48,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'accounts.middleware.QueryProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -84,12 +86,68 @@ WSGI_APPLICATION = 'jobreach_backend.wsgi.application'
 
 import dj_database_url
 
+# Connections persist for DB_CONN_MAX_AGE seconds and are checked before reuse, so a
+# connection the server dropped is replaced instead of failing the next request
 DATABASES = {
     'default': dj_database_url.config(
         default=config('DATABASE_URL', default='sqlite:///db.sqlite3'),
-        conn_max_age=600
+        conn_max_age=config('DB_CONN_MAX_AGE', default=600, cast=int),
+        conn_health_checks=config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
     )
 }
+DATABASES['default'].setdefault('OPTIONS', {})
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # IMMEDIATE transactions take the write lock when they begin, so concurrent writers
+    # (web workers, send_worker) queue for up to DB_SQLITE_TIMEOUT seconds instead of
+    # failing with "database is locked".
+    DATABASES['default']['OPTIONS'].update({
+        'timeout': config('DB_SQLITE_TIMEOUT', default=20, cast=int),
+        'transaction_mode': 'IMMEDIATE',
+    })
+    # WAL lets readers work while another process writes. The journal mode is stored in the
+    # database file itself, so it is only switched on when asked for.
+    if config('DB_SQLITE_WAL', default=False, cast=bool):
+        DATABASES['default']['OPTIONS']['init_command'] = 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL'
+elif DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    if config('DB_POOL', default=False, cast=bool):
+        # Django's native connection pool (needs psycopg 3: pip install "psycopg[binary,pool]").
+        # The pool keeps connections open itself, so persistent connections are turned off.
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            'timeout': config('DB_POOL_TIMEOUT', default=30, cast=int),
+        }
+    # Set when connecting through a transaction-pooling proxy such as PgBouncer, which can't
+    # keep a server-side cursor open between queries
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = config(
+        'DB_DISABLE_SERVER_SIDE_CURSORS', default=False, cast=bool
+    )
+
+# Cache shared by every process (web workers and send_worker): Gmail OAuth state and
+# credentials, per-user read caches and address verification results. Redis when
+# REDIS_URL is set (needs the redis package), otherwise CACHE_BACKEND at CACHE_LOCATION:
+# a file-based cache by default, or e.g. django.core.cache.backends.db.DatabaseCache
+# (run `python manage.py createcachetable` first).
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+            'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / '.cache')),
+        }
+    }
+CACHES['default']['KEY_PREFIX'] = 'jobreach'
+# Seconds per-user reads (resume and contact list lists, email counts) stay cached between writes
+USER_CACHE_TIMEOUT = config('USER_CACHE_TIMEOUT', default=300, cast=int)
 
 
 # Password validation
@@ -140,6 +198,31 @@ MEDIA_ROOT = BASE_DIR / 'media'
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
+# Store resumes and contact lists once per distinct content (media/blobs/), shared by identical uploads
+CONTENT_ADDRESSED_UPLOADS = config('CONTENT_ADDRESSED_UPLOADS', default=True, cast=bool)
+
+# Chunked uploads stream each chunk to disk, so they aren't bound by the limits above
+CHUNKED_UPLOAD_DIR = config('CHUNKED_UPLOAD_DIR', default='') or MEDIA_ROOT / 'uploads'
+CHUNKED_UPLOAD_CHUNK_SIZE = config('CHUNKED_UPLOAD_CHUNK_SIZE_MB', default=5, cast=int) * 1024 * 1024
+CHUNKED_UPLOAD_CSV_MAX_SIZE = config('CHUNKED_UPLOAD_CSV_MAX_SIZE_MB', default=50, cast=int) * 1024 * 1024
+# Unfinished uploads idle this long are removed by `manage.py cleanup_files`
+CHUNKED_UPLOAD_EXPIRY_HOURS = config('CHUNKED_UPLOAD_EXPIRY_HOURS', default=24, cast=int)
+
+# Resume parsing runs in sandboxed worker processes with per-job limits
+DOCUMENT_PARSER_SANDBOX = config('DOCUMENT_PARSER_SANDBOX', default=True, cast=bool)
+DOCUMENT_PARSER_WORKERS = config('DOCUMENT_PARSER_WORKERS', default=2, cast=int)
+DOCUMENT_PARSER_CPU_SECONDS = config('DOCUMENT_PARSER_CPU_SECONDS', default=10, cast=int)
+DOCUMENT_PARSER_MEMORY_MB = config('DOCUMENT_PARSER_MEMORY_MB', default=512, cast=int)
+DOCUMENT_PARSER_TIMEOUT = config('DOCUMENT_PARSER_TIMEOUT', default=30, cast=int)  # wall-clock seconds
+
+# Skills taxonomy used to build resume skill profiles: a list of
+# (display name, category, [aliases]); None uses accounts.skills.DEFAULT_SKILLS_TAXONOMY
+SKILLS_TAXONOMY = None
+
+# Background tasks (resume parsing at upload time) run in an in-process thread pool
+BACKGROUND_TASKS_ASYNC = config('BACKGROUND_TASKS_ASYNC', default=True, cast=bool)
+BACKGROUND_TASK_WORKERS = config('BACKGROUND_TASK_WORKERS', default=2, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -177,14 +260,22 @@ CORS_ALLOWED_ORIGINS = [
 # For development, you might want to allow all origins (NOT for production)
 CORS_ALLOW_ALL_ORIGINS = config('CORS_ALLOW_ALL_ORIGINS', default=False, cast=bool)
 
+# Lets browser clients send an Idempotency-Key with email send requests
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+
 # API Keys and External Services
 OPENAI_API_KEY = config('OPENAI_API_KEY', default='')
+OPENAI_BASE_URL = config('OPENAI_BASE_URL', default='')  # empty uses api.openai.com
+OPENAI_TIMEOUT = config('OPENAI_TIMEOUT', default=60, cast=float)  # Seconds per completion attempt
 GOOGLE_CLIENT_ID = config('GOOGLE_CLIENT_ID')
 GOOGLE_CLIENT_SECRET = config('GOOGLE_CLIENT_SECRET')
 
 # Gmail Integration Settings
 GMAIL_CREDENTIALS_FILE = str(BASE_DIR / 'gmail_credentials.json')
+GMAIL_API_ENDPOINT = config('GMAIL_API_ENDPOINT', default='')  # empty uses the Google endpoint
 GMAIL_REDIRECT_URI = config('GMAIL_REDIRECT_URI', default='http://localhost:8000/api/accounts/gmail/callback/')
+# Seconds a user's Gmail authorization status and profile are cached (cleared on callback/revoke)
+GMAIL_STATUS_CACHE_TTL = config('GMAIL_STATUS_CACHE_TTL', default=60, cast=int)
 FRONTEND_URL = config('FRONTEND_URL', default='http://localhost:3000')
 
 # Session Configuration for OAuth flows
@@ -194,6 +285,70 @@ SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
 SESSION_SAVE_EVERY_REQUEST = True
 
+# Tracing: per-stage timing spans, aggregated at /metrics in Prometheus format.
+# TRACING_BACKEND is 'metrics', 'opentelemetry' (needs opentelemetry-api) or a dotted tracer class path.
+TRACING_ENABLED = config('TRACING_ENABLED', default=False, cast=bool)
+TRACING_BACKEND = config('TRACING_BACKEND', default='metrics')
+METRICS_TOKEN = config('METRICS_TOKEN', default='')  # require "Authorization: Bearer <token>" when set
+METRICS_PUBLIC = config('METRICS_PUBLIC', default=False, cast=bool)  # serve /metrics without a token
+# Metrics are kept per process; /metrics only covers the process serving it unless METRICS_DIR is set.
+# Then every process (web workers, send_worker, generation_worker) writes its metrics there at most
+# every METRICS_FLUSH_SECONDS, and /metrics adds them all up. Empty the directory when redeploying.
+# Files of exited processes on the scraping host are folded into one; files from other hosts are
+# dropped once they haven't been written for METRICS_STALE_SECONDS.
+METRICS_DIR = config('METRICS_DIR', default='')
+METRICS_FLUSH_SECONDS = config('METRICS_FLUSH_SECONDS', default=10, cast=float)
+METRICS_STALE_SECONDS = config('METRICS_STALE_SECONDS', default=3600, cast=int)
+
+# Request profiling: SQL query count/time, duplicate queries and view time per request.
+# PROFILING_ENABLED profiles every request; PROFILING_ALLOW_HEADER lets a request opt in with "X-Profile: 1".
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=False, cast=bool)
+PROFILING_ALLOW_HEADER = config('PROFILING_ALLOW_HEADER', default=DEBUG, cast=bool)
+PROFILING_SLOW_REQUEST_MS = config('PROFILING_SLOW_REQUEST_MS', default=500, cast=int)
+PROFILING_REPEATED_QUERY_THRESHOLD = config('PROFILING_REPEATED_QUERY_THRESHOLD', default=5, cast=int)
+PROFILING_CPROFILE_DIR = config('PROFILING_CPROFILE_DIR', default='')  # empty disables cProfile dumps
+PROFILING_CPROFILE_SAMPLE_RATE = config('PROFILING_CPROFILE_SAMPLE_RATE', default=0.01, cast=float)
+
 # Email settings
 EMAIL_DAILY_LIMIT = config('EMAIL_DAILY_LIMIT', default=50, cast=int)
 EMAIL_RATE_LIMIT_PER_HOUR = config('EMAIL_RATE_LIMIT_PER_HOUR', default=10, cast=int)
+# Attach the email's resume to outgoing emails (a send request can override it with "attach_resume")
+EMAIL_ATTACH_RESUME = config('EMAIL_ATTACH_RESUME', default=True, cast=bool)
+# Emails stuck in 'sending' longer than this (seconds) are marked failed so they can be retried
+SEND_CLAIM_TIMEOUT = config('SEND_CLAIM_TIMEOUT', default=600, cast=int)
+# How long a send request's result is replayed for retries carrying the same Idempotency-Key
+SEND_IDEMPOTENCY_TTL_HOURS = config('SEND_IDEMPOTENCY_TTL_HOURS', default=24, cast=int)
+# A send request still unfinished after this many seconds is presumed crashed, and a retry with its key runs anew
+SEND_IDEMPOTENCY_LEASE_SECONDS = config('SEND_IDEMPOTENCY_LEASE_SECONDS', default=600, cast=int)
+
+# Rows fetched per database round trip when streaming generated-email exports
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+# Rows per DELETE statement (and transaction) when removing large sets of generated emails
+BULK_DELETE_BATCH_SIZE = config('BULK_DELETE_BATCH_SIZE', default=5000, cast=int)
+
+# Recipient address verification: syntax, disposable domains and mail server lookups.
+# EMAIL_VERIFICATION_RESOLVER: 'auto' (dnspython if installed, else socket), 'dnspython', 'socket',
+# 'off' (skip lookups) or a dotted path to a resolver class.
+EMAIL_VERIFICATION_RESOLVER = config('EMAIL_VERIFICATION_RESOLVER', default='auto')
+EMAIL_VERIFICATION_TIMEOUT = config('EMAIL_VERIFICATION_TIMEOUT', default=5.0, cast=float)  # Seconds per lookup
+EMAIL_VERIFICATION_WORKERS = config('EMAIL_VERIFICATION_WORKERS', default=16, cast=int)
+EMAIL_VERIFICATION_CACHE_TTL = config('EMAIL_VERIFICATION_CACHE_TTL', default=86400, cast=int)  # Per-domain result cache
+DISPOSABLE_EMAIL_DOMAINS = config('DISPOSABLE_EMAIL_DOMAINS', default='', cast=lambda v: [d.strip() for d in v.split(',') if d.strip()])
+
+# Scheduled send queue (python manage.py send_worker)
+SEND_WORKER_POLL_SECONDS = config('SEND_WORKER_POLL_SECONDS', default=5, cast=float)
+SEND_USER_INTERVAL_SECONDS = config('SEND_USER_INTERVAL_SECONDS', default=30, cast=int)  # Min gap between one user's sends
+SEND_DOMAIN_INTERVAL_SECONDS = config('SEND_DOMAIN_INTERVAL_SECONDS', default=300, cast=int)  # Min gap per recipient domain
+SEND_SCHEDULE_SPREAD_HOURS = config('SEND_SCHEDULE_SPREAD_HOURS', default=8, cast=float)  # Default spread of a day's share
+
+# Generation workers (python manage.py generation_worker): contacts are leased in batches, and a lease
+# not renewed within GENERATION_LEASE_SECONDS is taken over by another worker
+GENERATION_WORKER_BATCH_SIZE = config('GENERATION_WORKER_BATCH_SIZE', default=10, cast=int)
+GENERATION_WORKER_POLL_SECONDS = config('GENERATION_WORKER_POLL_SECONDS', default=2, cast=float)
+GENERATION_WORKER_PROCESSES = config('GENERATION_WORKER_PROCESSES', default=1, cast=int)  # Per node
+GENERATION_LEASE_SECONDS = config('GENERATION_LEASE_SECONDS', default=120, cast=int)
+GENERATION_MAX_ATTEMPTS = config('GENERATION_MAX_ATTEMPTS', default=3, cast=int)  # Leases per contact before it fails
+# generate-emails/ checkpoints its run after every contact; a run not checkpointed for this many seconds
+# is presumed abandoned, and retrying the request resumes it. Keep it well above one completion
+# including the client's retries (3 x OPENAI_TIMEOUT), or a slow contact costs a request its own run.
+GENERATION_CHECKPOINT_TIMEOUT = config('GENERATION_CHECKPOINT_TIMEOUT', default=300, cast=int)
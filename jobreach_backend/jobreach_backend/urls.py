@@ -19,6 +19,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.http import JsonResponse
+from accounts.views import MetricsView
 
 def health_check(request):
     return JsonResponse({'status': 'ok', 'message': 'JobReach API is running'})
@@ -27,6 +28,7 @@ urlpatterns = [
     path('', health_check, name='health_check'),
     path('admin/', admin.site.urls),
     path('api/accounts/', include('accounts.urls')),
+    path('metrics', MetricsView.as_view(), name='metrics'),
     
 ]
 